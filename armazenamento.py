@@ -0,0 +1,827 @@
+"""Armazenamento de personagens, amores, cooldowns, saldos e trocas, com implementações trocáveis.
+
+`Armazenamento` define as operações usadas pelo bot; `ArmazenamentoSQLite` as executa no banco do
+bot e `ArmazenamentoMemoria` em dicionários indexados, sem persistência (para testes, benchmarks e
+servidores temporários). As duas passam pelo mesmo roteiro de conformidade:
+    python benchmarks/conformidade_armazenamento.py
+
+Cada operação é atômica. Nomes de personagens são únicos sem diferenciar maiúsculas de minúsculas
+(só as letras ASCII, como o COLLATE NOCASE do SQLite), e as listagens seguem essa mesma ordem.
+Horários de cooldown são segundos desde a época, com 0 para "nunca". Os IDs são opacos: cada implementação
+numera personagens e trocas do seu jeito.
+"""
+import abc
+import bisect
+import time
+from datetime import datetime
+import busca
+import simulador
+from extrato import POR_PAGINA, Extrato, lancar
+from indices import chave_nome
+
+
+class Armazenamento(abc.ABC):
+    """Operações de armazenamento usadas pelo bot; veja ArmazenamentoSQLite e ArmazenamentoMemoria."""
+
+    # Personagens
+
+    @abc.abstractmethod
+    async def adicionar_personagem(self, nome, imagem):
+        """Adiciona um personagem e retorna o ID dele, ou None se o nome já existir."""
+
+    @abc.abstractmethod
+    async def adicionar_personagens(self, lote):
+        """Adiciona os personagens `(nome, imagem, vantagem)` de uma vez, ignorando os nomes que já existem;
+        retorna quantos foram adicionados."""
+
+    @abc.abstractmethod
+    async def excluir_personagem(self, nome):
+        """Exclui o personagem, com o amor e as trocas dele; retorna `(id, nome, dono_id)` do excluído, ou None."""
+
+    @abc.abstractmethod
+    async def catalogo(self):
+        """`(id, nome, indisponível)` de todos os personagens; indisponíveis são os conquistados ou com imagem quebrada."""
+
+    @abc.abstractmethod
+    async def listar_personagens(self):
+        """`(nome, conquistado)` de todos os personagens."""
+
+    @abc.abstractmethod
+    async def personagens_apos(self, ultimo_id, limite):
+        """`(id, nome, imagem, vantagem)` de até `limite` personagens com ID acima de `ultimo_id`, em ordem de ID."""
+
+    @abc.abstractmethod
+    async def personagem_disponivel(self, personagem_id):
+        """`(id, nome, imagem)` do personagem, se ele existir e puder aparecer no /paquerar; senão None."""
+
+    @abc.abstractmethod
+    async def nome_do_personagem(self, personagem_id):
+        """Nome do personagem, ou None se ele não existir."""
+
+    @abc.abstractmethod
+    async def vantagem_do_personagem(self, personagem_id):
+        """`(nome, vantagem)` do personagem, ou None se ele não existir."""
+
+    @abc.abstractmethod
+    async def vantagens(self, todos=False):
+        """Vantagens dos personagens disponíveis (ou de todos), para o simulador."""
+
+    @abc.abstractmethod
+    async def perfil_do_personagem(self, nome):
+        """`(id, nome, imagem, imagem_quebrada, dono_id)` do personagem, ou None se ele não existir."""
+
+    @abc.abstractmethod
+    async def buscar_personagens(self, texto, filtro="todos", usuario_id=None, limite=10):
+        """Até `limite` personagens `(id, nome, dono_id)` com nome parecido com `texto`; veja `busca.buscar`."""
+
+    @abc.abstractmethod
+    async def alterar_imagem(self, nome, imagem):
+        """Troca a imagem (que volta a valer até a próxima verificação); retorna `(id, conquistado)` ou None."""
+
+    @abc.abstractmethod
+    async def definir_vantagem(self, nome, vantagem):
+        """Define a vantagem do personagem; retorna False se ele não existir."""
+
+    @abc.abstractmethod
+    def listagem_personagens(self, contar=None):
+        """Listagem paginada de todos os personagens: linhas `(nome, conquistado, id)`."""
+
+    @abc.abstractmethod
+    def listagem_amores(self, usuario_id, contar=None):
+        """Listagem paginada dos amores do usuário: linhas `(nome, 1, id)`."""
+
+    # Amores
+
+    @abc.abstractmethod
+    async def casar(self, usuario_id, nome):
+        """Casa o usuário com o personagem; retorna o ID do personagem, ou None se ele não existir ou já tiver dono."""
+
+    @abc.abstractmethod
+    async def divorciar(self, usuario_id, nome):
+        """Desfaz o casamento, se o personagem for do usuário; retorna o ID do personagem ou None."""
+
+    @abc.abstractmethod
+    async def amores_de(self, usuario_id):
+        """Nomes dos personagens do usuário, em ordem alfabética."""
+
+    @abc.abstractmethod
+    async def contar_amores(self, usuario_id):
+        """Quantidade de personagens do usuário."""
+
+    @abc.abstractmethod
+    async def dono_do_personagem(self, nome):
+        """ID do usuário casado com o personagem, ou None."""
+
+    # Cooldowns
+
+    @abc.abstractmethod
+    async def carregar_cooldowns(self):
+        """Retorna `(geração, linhas)`: a geração do último reset e os cooldowns
+        `(usuario_id, tentativas, tempo, ultimo_casamento, ultimo_coletar)` que ele não vai zerar."""
+
+    @abc.abstractmethod
+    async def gravar_cooldowns(self, linhas, geracao):
+        """Grava (substituindo) os cooldowns `(usuario_id, tentativas, tempo, ultimo_casamento, ultimo_coletar)`."""
+
+    # Saldos
+
+    @abc.abstractmethod
+    async def eritos_de(self, usuario_id):
+        """Saldo de Eritos do usuário (0 para quem nunca teve saldo)."""
+
+    @abc.abstractmethod
+    async def saldos(self):
+        """`(usuario_id, eritos)` de todos os usuários com saldo registrado."""
+
+    @abc.abstractmethod
+    async def adicionar_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        """Credita `quantidade` (>= 0) com um lançamento no extrato e retorna o novo saldo."""
+
+    @abc.abstractmethod
+    async def remover_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        """Debita `quantidade` com um lançamento no extrato; retorna o novo saldo, ou None se não houver saldo suficiente."""
+
+    @abc.abstractmethod
+    async def historico_eritos(self, usuario_id, antes_de=None, limite=POR_PAGINA):
+        """Lançamentos `(id, ts, delta, motivo, referencia)` do usuário, do mais recente ao mais antigo,
+        a partir do lançamento anterior ao ID `antes_de`."""
+
+    @abc.abstractmethod
+    async def recalcular_eritos(self, usuario_id):
+        """Saldo do usuário refeito a partir dos lançamentos do extrato."""
+
+    # Trocas
+
+    @abc.abstractmethod
+    async def criar_troca(self, ofertante_id, nome, destinatario_id, quantidade_eritos, validade):
+        """Registra a proposta e retorna o ID dela (ou None se o personagem não existir), descartando as
+        propostas com mais de `validade` segundos."""
+
+    @abc.abstractmethod
+    async def destinatario_da_troca(self, troca_id, validade):
+        """ID de quem recebeu a proposta, ou None se ela não existir ou tiver mais de `validade` segundos."""
+
+    @abc.abstractmethod
+    async def confirmar_troca(self, troca_id):
+        """Passa o personagem ao destinatário e os Eritos ao ofertante e apaga a proposta, tudo ou nada.
+
+        Retorna `(ofertante_id, destinatario_id, personagem_id, quantidade_eritos, saldo do destinatário,
+        saldo do ofertante)` (saldos None sem Eritos na troca), ou None se a proposta não existir, o
+        personagem não for mais do ofertante ou faltar saldo ao destinatário."""
+
+    @abc.abstractmethod
+    async def recusar_troca(self, troca_id):
+        """Apaga a proposta, se ela ainda existir."""
+
+    # Metadados
+
+    @abc.abstractmethod
+    async def metadado(self, chave):
+        """Valor (texto) guardado em `chave`, ou None."""
+
+    @abc.abstractmethod
+    async def definir_metadado(self, chave, valor):
+        """Guarda `valor` (texto) em `chave`, substituindo o anterior."""
+
+
+def _para_epoch(texto):
+    """Converte o texto ISO salvo no banco em segundos desde a época (0 quando vazio)."""
+    return int(datetime.fromisoformat(texto).timestamp()) if texto else 0
+
+
+def _para_texto(epoch):
+    """Converte segundos desde a época no texto ISO salvo no banco (None quando vazio)."""
+    return datetime.fromtimestamp(epoch).isoformat() if epoch else None
+
+
+class Listagem:
+    """Consulta paginada por chave (keyset) sobre uma coluna de nomes única, em ordem alfabética.
+
+    Cada linha traz (nome, marcador, id); o id identifica a linha nos botões de navegação.
+    """
+    def __init__(self, banco, tabela, coluna, marcador, identificador, filtro="1", parametros=(), contar=None):
+        self.banco = banco
+        self.coluna = coluna
+        self.parametros = parametros
+        self._select = f"SELECT {coluna}, {marcador}, {identificador} FROM {tabela} WHERE {filtro}"
+        self._contar_sql = f"SELECT COUNT(*) FROM {tabela} WHERE {filtro}"
+        self._contar = contar
+
+    async def contar(self):
+        """Total de linhas da listagem (de um contador em cache, quando houver)."""
+        if self._contar:
+            return await self._contar()
+        (total,) = await self.banco.consultar_um(self._contar_sql, self.parametros)
+        return total
+
+    async def apos(self, chave, limite):
+        """Linhas seguintes a `chave` (ou as primeiras, se `chave` for None)."""
+        if chave is None:
+            return await self.banco.consultar_todos(f"{self._select} ORDER BY {self.coluna} LIMIT ?", (*self.parametros, limite))
+        return await self.banco.consultar_todos(f"{self._select} AND {self.coluna} > ? ORDER BY {self.coluna} LIMIT ?", (*self.parametros, chave, limite))
+
+    async def antes(self, chave, limite):
+        """Linhas anteriores a `chave` (ou as últimas, se `chave` for None), em ordem crescente."""
+        if chave is None:
+            linhas = await self.banco.consultar_todos(f"{self._select} ORDER BY {self.coluna} DESC LIMIT ?", (*self.parametros, limite))
+        else:
+            linhas = await self.banco.consultar_todos(f"{self._select} AND {self.coluna} < ? ORDER BY {self.coluna} DESC LIMIT ?", (*self.parametros, chave, limite))
+        return linhas[::-1]
+
+    async def na_posicao(self, inicio, limite):
+        """Linhas a partir da posição `inicio`; usado apenas nos saltos de página."""
+        return await self.banco.consultar_todos(f"{self._select} ORDER BY {self.coluna} LIMIT ? OFFSET ?", (*self.parametros, limite, inicio))
+
+    async def posicao_de(self, prefixo):
+        """Quantidade de linhas que vêm antes de `prefixo` na ordem alfabética."""
+        (posicao,) = await self.banco.consultar_um(f"{self._contar_sql} AND {self.coluna} < ?", (*self.parametros, prefixo))
+        return posicao
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    """Armazenamento no banco SQLite do bot (um BancoDeDados já aberto e migrado)."""
+
+    def __init__(self, banco):
+        self.banco = banco
+        self._extrato = Extrato(banco)  # Só as consultas; as fotografias periódicas são do bot
+
+    async def adicionar_personagem(self, nome, imagem):
+        # A coluna `nome` é COLLATE NOCASE UNIQUE, então o próprio índice detecta a repetição
+        cursor = await self.banco.executar("INSERT INTO personagens (nome, imagem) VALUES (?, ?) ON CONFLICT(nome) DO NOTHING", (nome, imagem))
+        return cursor.lastrowid if cursor.rowcount else None
+
+    async def adicionar_personagens(self, lote):
+        async with self.banco.transacao() as db:
+            cursor = await db.executemany("""
+                INSERT INTO personagens (nome, imagem, vantagem) VALUES (?, ?, ?)
+                ON CONFLICT(nome) DO NOTHING
+            """, lote)
+        return max(cursor.rowcount, 0)
+
+    async def excluir_personagem(self, nome):
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("SELECT usuario_id FROM amores WHERE personagem_id = (SELECT id FROM personagens WHERE nome = ?)", (nome,))
+            dono = await cursor.fetchone()
+            # O amor e as trocas do personagem são removidos em cascata
+            cursor = await db.execute("DELETE FROM personagens WHERE nome = ? RETURNING id, nome", (nome,))
+            removido = await cursor.fetchone()
+        return (*removido, dono[0] if dono else None) if removido else None
+
+    async def catalogo(self):
+        return await self.banco.consultar_todos("SELECT id, nome, conquistado OR imagem_quebrada FROM personagens")
+
+    async def listar_personagens(self):
+        return await self.banco.consultar_todos("SELECT nome, conquistado FROM personagens")
+
+    async def personagens_apos(self, ultimo_id, limite):
+        return await self.banco.consultar_todos(
+            "SELECT id, nome, imagem, vantagem FROM personagens WHERE id > ? ORDER BY id LIMIT ?", (ultimo_id, limite)
+        )
+
+    async def personagem_disponivel(self, personagem_id):
+        return await self.banco.consultar_um(
+            "SELECT id, nome, imagem FROM personagens WHERE id = ? AND conquistado = 0 AND imagem_quebrada = 0", (personagem_id,)
+        )
+
+    async def nome_do_personagem(self, personagem_id):
+        linha = await self.banco.consultar_um("SELECT nome FROM personagens WHERE id = ?", (personagem_id,))
+        return linha[0] if linha else None
+
+    async def vantagem_do_personagem(self, personagem_id):
+        return await self.banco.consultar_um("SELECT nome, vantagem FROM personagens WHERE id = ?", (personagem_id,))
+
+    async def vantagens(self, todos=False):
+        return await simulador.vantagens_do_catalogo(self.banco, todos)
+
+    async def perfil_do_personagem(self, nome):
+        return await self.banco.consultar_um("""
+            SELECT p.id, p.nome, p.imagem, p.imagem_quebrada, a.usuario_id
+            FROM personagens p LEFT JOIN amores a ON a.personagem_id = p.id
+            WHERE p.nome = ?
+        """, (nome,))
+
+    async def buscar_personagens(self, texto, filtro="todos", usuario_id=None, limite=10):
+        return await busca.buscar(self.banco, texto, filtro, usuario_id, limite)
+
+    async def alterar_imagem(self, nome, imagem):
+        # O gatilho `personagens_nova_imagem` desfaz a marcação de imagem quebrada
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("UPDATE personagens SET imagem = ? WHERE nome = ? RETURNING id, conquistado", (imagem, nome))
+            return await cursor.fetchone()
+
+    async def definir_vantagem(self, nome, vantagem):
+        cursor = await self.banco.executar("UPDATE personagens SET vantagem = ? WHERE nome = ?", (vantagem, nome))
+        return cursor.rowcount > 0
+
+    def listagem_personagens(self, contar=None):
+        return Listagem(self.banco, "personagens", "nome", "conquistado", "id", contar=contar)
+
+    def listagem_amores(self, usuario_id, contar=None):
+        return Listagem(self.banco, "amores a JOIN personagens p ON p.id = a.personagem_id", "p.nome", "1", "p.id",
+                        "a.usuario_id = ?", (usuario_id,), contar=contar)
+
+    async def casar(self, usuario_id, nome):
+        # O gatilho `amores_conquista` marca o personagem como conquistado
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("""
+                INSERT INTO amores (usuario_id, personagem_id)
+                SELECT ?, id FROM personagens WHERE nome = ?
+                ON CONFLICT(personagem_id) DO NOTHING
+                RETURNING personagem_id
+            """, (usuario_id, nome))
+            linha = await cursor.fetchone()
+        return linha[0] if linha else None
+
+    async def divorciar(self, usuario_id, nome):
+        # Só remove se o personagem pertencer ao usuário; o gatilho `amores_divorcio` o marca como disponível
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("""
+                DELETE FROM amores
+                WHERE usuario_id = ? AND personagem_id = (SELECT id FROM personagens WHERE nome = ?)
+                RETURNING personagem_id
+            """, (usuario_id, nome))
+            linha = await cursor.fetchone()
+        return linha[0] if linha else None
+
+    async def amores_de(self, usuario_id):
+        linhas = await self.banco.consultar_todos("""
+            SELECT p.nome FROM amores a JOIN personagens p ON p.id = a.personagem_id
+            WHERE a.usuario_id = ? ORDER BY p.nome
+        """, (usuario_id,))
+        return [nome for (nome,) in linhas]
+
+    async def contar_amores(self, usuario_id):
+        (total,) = await self.banco.consultar_um("SELECT COUNT(*) FROM amores WHERE usuario_id = ?", (usuario_id,))
+        return total
+
+    async def dono_do_personagem(self, nome):
+        dono = await self.banco.consultar_um("""
+            SELECT a.usuario_id FROM amores a JOIN personagens p ON p.id = a.personagem_id
+            WHERE p.nome = ?
+        """, (nome,))
+        return dono[0] if dono else None
+
+    async def carregar_cooldowns(self):
+        # A geração é o ID do último reset de cooldowns; as linhas que um reset ainda em andamento vai
+        # zerar (gravadas antes dele) ficam de fora
+        (geracao,) = await self.banco.consultar_um("SELECT COALESCE(MAX(id), 0) FROM tarefas WHERE tipo = 'cooldowns'")
+        pendente = await self.banco.consultar_um(
+            "SELECT id FROM tarefas WHERE tipo = 'cooldowns' AND concluida_em IS NULL ORDER BY id DESC LIMIT 1"
+        )
+        linhas = await self.banco.consultar_todos(
+            "SELECT usuario_id, tentativas, tempo, ultimo_casamento, ultimo_coletar FROM cooldowns WHERE geracao_reset >= ?",
+            (pendente[0] if pendente else 0,)
+        )
+        return geracao, [
+            (usuario_id, tentativas or 0, _para_epoch(tempo), _para_epoch(casamento), _para_epoch(coletar))
+            for usuario_id, tentativas, tempo, casamento, coletar in linhas
+        ]
+
+    async def gravar_cooldowns(self, linhas, geracao):
+        async with self.banco.transacao() as db:
+            await db.executemany("""
+                INSERT INTO cooldowns (usuario_id, tentativas, tempo, ultimo_casamento, ultimo_coletar, geracao_reset)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(usuario_id) DO UPDATE SET
+                    tentativas = excluded.tentativas,
+                    tempo = excluded.tempo,
+                    ultimo_casamento = excluded.ultimo_casamento,
+                    ultimo_coletar = excluded.ultimo_coletar,
+                    geracao_reset = excluded.geracao_reset
+            """, [
+                (usuario_id, tentativas, _para_texto(tempo), _para_texto(casamento), _para_texto(coletar), geracao)
+                for usuario_id, tentativas, tempo, casamento, coletar in linhas
+            ])
+
+    async def eritos_de(self, usuario_id):
+        linha = await self.banco.consultar_um("SELECT eritos FROM moedas WHERE usuario_id = ?", (usuario_id,))
+        return linha[0] if linha else 0
+
+    async def saldos(self):
+        return await self.banco.consultar_todos("SELECT usuario_id, eritos FROM moedas")
+
+    async def historico_eritos(self, usuario_id, antes_de=None, limite=POR_PAGINA):
+        return await self._extrato.historico(usuario_id, antes_de, limite)
+
+    async def recalcular_eritos(self, usuario_id):
+        return await self._extrato.recalcular(usuario_id)
+
+    async def adicionar_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("""
+                INSERT INTO moedas (usuario_id, eritos) VALUES (?, ?)
+                ON CONFLICT(usuario_id) DO UPDATE SET eritos = eritos + excluded.eritos
+                RETURNING eritos
+            """, (usuario_id, quantidade))
+            (eritos,) = await cursor.fetchone()
+            await lancar(db, [(usuario_id, quantidade, motivo, referencia)])
+        return eritos
+
+    async def remover_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("UPDATE moedas SET eritos = eritos - ? WHERE usuario_id = ? AND eritos >= ? RETURNING eritos",
+                                      (quantidade, usuario_id, quantidade))
+            resultado = await cursor.fetchone()
+            if not resultado:
+                # Nada a remover de quem não tem saldo
+                return None if quantidade else 0
+            await lancar(db, [(usuario_id, -quantidade, motivo, referencia)])
+        return resultado[0]
+
+    async def criar_troca(self, ofertante_id, nome, destinatario_id, quantidade_eritos, validade):
+        agora = int(time.time())
+        async with self.banco.transacao() as db:
+            # Aproveita a escrita para descartar as propostas vencidas, que ninguém respondeu
+            await db.execute("DELETE FROM trocas WHERE criada_em < ?", (agora - validade,))
+            cursor = await db.execute("""
+                INSERT INTO trocas (ofertante_id, personagem_id, destinatario_id, quantidade_eritos, criada_em)
+                SELECT ?, id, ?, ?, ? FROM personagens WHERE nome = ?
+                RETURNING id
+            """, (ofertante_id, destinatario_id, quantidade_eritos, agora, nome))
+            linha = await cursor.fetchone()
+        return linha[0] if linha else None
+
+    async def destinatario_da_troca(self, troca_id, validade):
+        linha = await self.banco.consultar_um("SELECT destinatario_id FROM trocas WHERE id = ? AND criada_em >= ?",
+                                              (troca_id, int(time.time()) - validade))
+        return linha[0] if linha else None
+
+    async def confirmar_troca(self, troca_id):
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("SELECT ofertante_id, personagem_id, destinatario_id, quantidade_eritos FROM trocas WHERE id = ?", (troca_id,))
+            troca = await cursor.fetchone()
+            if not troca:
+                return None
+            ofertante_id, personagem_id, destinatario_id, quantidade_eritos = troca
+
+            # Transfere o personagem somente se o ofertante ainda o possuir
+            cursor = await db.execute("UPDATE amores SET usuario_id = ? WHERE personagem_id = ? AND usuario_id = ?",
+                                      (destinatario_id, personagem_id, ofertante_id))
+            if cursor.rowcount != 1:
+                await db.rollback()
+                return None
+
+            debito = credito = None
+            if quantidade_eritos > 0:
+                # Debita o destinatário somente se ele tiver Eritos suficientes
+                cursor = await db.execute("UPDATE moedas SET eritos = eritos - ? WHERE usuario_id = ? AND eritos >= ? RETURNING eritos",
+                                          (quantidade_eritos, destinatario_id, quantidade_eritos))
+                linha = await cursor.fetchone()
+                if not linha:
+                    await db.rollback()
+                    return None
+                (debito,) = linha
+
+                # Credita o ofertante
+                cursor = await db.execute("""
+                    INSERT INTO moedas (usuario_id, eritos) VALUES (?, ?)
+                    ON CONFLICT(usuario_id) DO UPDATE SET eritos = eritos + excluded.eritos
+                    RETURNING eritos
+                """, (ofertante_id, quantidade_eritos))
+                (credito,) = await cursor.fetchone()
+                await lancar(db, [(destinatario_id, -quantidade_eritos, "troca", troca_id),
+                                  (ofertante_id, quantidade_eritos, "troca", troca_id)])
+
+            await db.execute("DELETE FROM trocas WHERE id = ?", (troca_id,))
+        return ofertante_id, destinatario_id, personagem_id, quantidade_eritos, debito, credito
+
+    async def recusar_troca(self, troca_id):
+        await self.banco.executar("DELETE FROM trocas WHERE id = ?", (troca_id,))
+
+    async def metadado(self, chave):
+        linha = await self.banco.consultar_um("SELECT valor FROM metadados WHERE chave = ?", (chave,))
+        return linha[0] if linha else None
+
+    async def definir_metadado(self, chave, valor):
+        await self.banco.executar("""
+            INSERT INTO metadados (chave, valor) VALUES (?, ?)
+            ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor
+        """, (chave, valor))
+
+
+class _Personagem:
+    __slots__ = ("id", "nome", "imagem", "vantagem", "imagem_quebrada")
+
+    def __init__(self, id, nome, imagem, vantagem=2, imagem_quebrada=0):
+        self.id = id
+        self.nome = nome
+        self.imagem = imagem
+        self.vantagem = vantagem
+        self.imagem_quebrada = imagem_quebrada
+
+
+class ListagemMemoria:
+    """Listagem paginada sobre uma lista de `(chave, id)` em ordem, com as mesmas operações de `Listagem`."""
+
+    def __init__(self, ordem, linha, contar=None):
+        self._ordem = ordem  # Função que retorna a lista `(chave do nome, id)` ordenada
+        self._linha = linha  # Função que monta a linha `(nome, marcador, id)` a partir do ID
+        self._contar = contar
+
+    async def contar(self):
+        if self._contar:
+            return await self._contar()
+        return len(self._ordem())
+
+    async def apos(self, chave, limite):
+        ordem = self._ordem()
+        inicio = 0 if chave is None else bisect.bisect_right(ordem, (chave_nome(chave), float("inf")))
+        return [self._linha(personagem_id) for _, personagem_id in ordem[inicio:inicio + limite]]
+
+    async def antes(self, chave, limite):
+        ordem = self._ordem()
+        fim = len(ordem) if chave is None else bisect.bisect_left(ordem, (chave_nome(chave),))
+        return [self._linha(personagem_id) for _, personagem_id in ordem[max(fim - limite, 0):fim]]
+
+    async def na_posicao(self, inicio, limite):
+        return [self._linha(personagem_id) for _, personagem_id in self._ordem()[inicio:inicio + limite]]
+
+    async def posicao_de(self, prefixo):
+        return bisect.bisect_left(self._ordem(), (chave_nome(prefixo),))
+
+
+class ArmazenamentoMemoria(Armazenamento):
+    """Armazenamento em dicionários indexados, sem persistência.
+
+    Nenhuma operação espera por nada no meio, então cada uma é atômica no loop de eventos. Os
+    lançamentos do extrato ficam em `extrato`, como `(id, ts, usuario_id, delta, motivo, referencia)`."""
+
+    def __init__(self):
+        self._personagens = {}  # id -> _Personagem
+        self._por_nome = {}  # chave do nome -> id
+        self._ordem = []  # `(chave do nome, id)` de todos os personagens, em ordem
+        self._donos = {}  # id do personagem -> id do usuário
+        self._amores = {}  # id do usuário -> {chave do nome: id do personagem}
+        self._cooldowns = {}  # id do usuário -> (tentativas, tempo, ultimo_casamento, ultimo_coletar)
+        self._geracao = 0
+        self._eritos = {}  # id do usuário -> saldo
+        self._trocas = {}  # id -> (ofertante_id, personagem_id, destinatario_id, quantidade_eritos, criada_em), em ordem de criação
+        self._trocas_do_personagem = {}  # id do personagem -> {ids das trocas}
+        self._proximo_personagem = 1
+        self._proxima_troca = 1
+        self._metadados = {}
+        self.extrato = []
+
+    def _personagem(self, nome):
+        personagem_id = self._por_nome.get(chave_nome(nome))
+        return self._personagens[personagem_id] if personagem_id is not None else None
+
+    def _lancar(self, lancamentos):
+        agora = int(time.time())
+        for usuario_id, delta, motivo, referencia in lancamentos:
+            if delta:
+                self.extrato.append((len(self.extrato) + 1, agora, usuario_id, delta, motivo, referencia))
+
+    def _apagar_troca(self, troca_id):
+        troca = self._trocas.pop(troca_id, None)
+        if troca is not None:
+            self._trocas_do_personagem[troca[1]].discard(troca_id)
+
+    def _transferir(self, personagem_id, de, para):
+        chave = chave_nome(self._personagens[personagem_id].nome)
+        del self._amores[de][chave]
+        self._amores.setdefault(para, {})[chave] = personagem_id
+        self._donos[personagem_id] = para
+
+    async def adicionar_personagem(self, nome, imagem):
+        return self._adicionar(nome, imagem)
+
+    def _adicionar(self, nome, imagem, vantagem=2):
+        chave = chave_nome(nome)
+        if chave in self._por_nome:
+            return None
+        personagem_id = self._proximo_personagem
+        self._proximo_personagem += 1
+        self._personagens[personagem_id] = _Personagem(personagem_id, nome, imagem, vantagem)
+        self._por_nome[chave] = personagem_id
+        bisect.insort(self._ordem, (chave, personagem_id))
+        return personagem_id
+
+    async def adicionar_personagens(self, lote):
+        return sum(self._adicionar(nome, imagem, vantagem) is not None for nome, imagem, vantagem in lote)
+
+    async def excluir_personagem(self, nome):
+        personagem = self._personagem(nome)
+        if personagem is None:
+            return None
+        chave = chave_nome(personagem.nome)
+        del self._personagens[personagem.id]
+        del self._por_nome[chave]
+        del self._ordem[bisect.bisect_left(self._ordem, (chave, personagem.id))]
+        dono_id = self._donos.pop(personagem.id, None)
+        if dono_id is not None:
+            del self._amores[dono_id][chave]
+        for troca_id in self._trocas_do_personagem.pop(personagem.id, ()):
+            del self._trocas[troca_id]
+        return personagem.id, personagem.nome, dono_id
+
+    async def catalogo(self):
+        return [(p.id, p.nome, int(p.id in self._donos or bool(p.imagem_quebrada))) for p in self._personagens.values()]
+
+    async def listar_personagens(self):
+        return [(p.nome, int(p.id in self._donos)) for p in self._personagens.values()]
+
+    async def personagens_apos(self, ultimo_id, limite):
+        # Os IDs só crescem, então o dicionário já está em ordem de ID
+        ids = list(self._personagens)
+        inicio = bisect.bisect_right(ids, ultimo_id)
+        return [(p.id, p.nome, p.imagem, p.vantagem) for p in map(self._personagens.get, ids[inicio:inicio + limite])]
+
+    async def personagem_disponivel(self, personagem_id):
+        personagem = self._personagens.get(personagem_id)
+        if personagem is None or personagem.imagem_quebrada or personagem_id in self._donos:
+            return None
+        return personagem.id, personagem.nome, personagem.imagem
+
+    async def nome_do_personagem(self, personagem_id):
+        personagem = self._personagens.get(personagem_id)
+        return personagem.nome if personagem else None
+
+    async def vantagem_do_personagem(self, personagem_id):
+        personagem = self._personagens.get(personagem_id)
+        return (personagem.nome, personagem.vantagem) if personagem else None
+
+    async def vantagens(self, todos=False):
+        return [p.vantagem for p in self._personagens.values()
+                if todos or not (p.id in self._donos or p.imagem_quebrada)]
+
+    async def perfil_do_personagem(self, nome):
+        personagem = self._personagem(nome)
+        if personagem is None:
+            return None
+        return personagem.id, personagem.nome, personagem.imagem, personagem.imagem_quebrada, self._donos.get(personagem.id)
+
+    async def buscar_personagens(self, texto, filtro="todos", usuario_id=None, limite=10):
+        linhas = []
+        for p in self._personagens.values():
+            dono_id = self._donos.get(p.id)
+            if (filtro == "disponiveis" and (dono_id is not None or p.imagem_quebrada)
+                    or filtro == "conquistados" and dono_id is None
+                    or filtro == "meus" and dono_id != usuario_id):
+                continue
+            linhas.append((p.id, p.nome, dono_id))
+        return busca.buscar_em(linhas, texto, limite)
+
+    async def alterar_imagem(self, nome, imagem):
+        personagem = self._personagem(nome)
+        if personagem is None:
+            return None
+        if imagem != personagem.imagem:
+            personagem.imagem = imagem
+            personagem.imagem_quebrada = 0
+        return personagem.id, int(personagem.id in self._donos)
+
+    async def definir_vantagem(self, nome, vantagem):
+        personagem = self._personagem(nome)
+        if personagem is None:
+            return False
+        personagem.vantagem = vantagem
+        return True
+
+    def listagem_personagens(self, contar=None):
+        def linha(personagem_id):
+            return self._personagens[personagem_id].nome, int(personagem_id in self._donos), personagem_id
+        return ListagemMemoria(lambda: self._ordem, linha, contar)
+
+    def listagem_amores(self, usuario_id, contar=None):
+        def ordem():
+            return sorted(self._amores.get(usuario_id, {}).items())
+        def linha(personagem_id):
+            return self._personagens[personagem_id].nome, 1, personagem_id
+        return ListagemMemoria(ordem, linha, contar)
+
+    async def casar(self, usuario_id, nome):
+        personagem = self._personagem(nome)
+        if personagem is None or personagem.id in self._donos:
+            return None
+        self._donos[personagem.id] = usuario_id
+        self._amores.setdefault(usuario_id, {})[chave_nome(personagem.nome)] = personagem.id
+        return personagem.id
+
+    async def divorciar(self, usuario_id, nome):
+        personagem = self._personagem(nome)
+        if personagem is None or self._donos.get(personagem.id) != usuario_id:
+            return None
+        del self._donos[personagem.id]
+        del self._amores[usuario_id][chave_nome(personagem.nome)]
+        return personagem.id
+
+    async def amores_de(self, usuario_id):
+        return [self._personagens[personagem_id].nome for _, personagem_id in sorted(self._amores.get(usuario_id, {}).items())]
+
+    async def contar_amores(self, usuario_id):
+        return len(self._amores.get(usuario_id, ()))
+
+    async def dono_do_personagem(self, nome):
+        personagem = self._personagem(nome)
+        return self._donos.get(personagem.id) if personagem else None
+
+    async def carregar_cooldowns(self):
+        return self._geracao, [(usuario_id, *registro) for usuario_id, registro in self._cooldowns.items()]
+
+    async def gravar_cooldowns(self, linhas, geracao):
+        self._geracao = geracao
+        for usuario_id, *registro in linhas:
+            self._cooldowns[usuario_id] = tuple(registro)
+
+    async def eritos_de(self, usuario_id):
+        return self._eritos.get(usuario_id, 0)
+
+    async def saldos(self):
+        return list(self._eritos.items())
+
+    async def historico_eritos(self, usuario_id, antes_de=None, limite=POR_PAGINA):
+        fim = len(self.extrato) if antes_de is None else min(antes_de - 1, len(self.extrato))
+        lancamentos = []
+        # O ID de cada lançamento é a posição dele na lista mais um
+        for lancamento_id, ts, dono, delta, motivo, referencia in reversed(self.extrato[:max(fim, 0)]):
+            if dono == usuario_id:
+                lancamentos.append((lancamento_id, ts, delta, motivo, referencia))
+                if len(lancamentos) >= limite:
+                    break
+        return lancamentos
+
+    async def recalcular_eritos(self, usuario_id):
+        return sum(delta for _, _, dono, delta, _, _ in self.extrato if dono == usuario_id)
+
+    async def adicionar_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        eritos = self._eritos[usuario_id] = self._eritos.get(usuario_id, 0) + quantidade
+        self._lancar([(usuario_id, quantidade, motivo, referencia)])
+        return eritos
+
+    async def remover_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        eritos = self._eritos.get(usuario_id)
+        if eritos is None or eritos < quantidade:
+            return None if quantidade else 0
+        eritos = self._eritos[usuario_id] = eritos - quantidade
+        self._lancar([(usuario_id, -quantidade, motivo, referencia)])
+        return eritos
+
+    async def criar_troca(self, ofertante_id, nome, destinatario_id, quantidade_eritos, validade):
+        agora = int(time.time())
+        # As trocas estão em ordem de criação: as vencidas são as primeiras
+        while self._trocas:
+            troca_id, troca = next(iter(self._trocas.items()))
+            if troca[4] >= agora - validade:
+                break
+            self._apagar_troca(troca_id)
+        personagem = self._personagem(nome)
+        if personagem is None:
+            return None
+        troca_id = self._proxima_troca
+        self._proxima_troca += 1
+        self._trocas[troca_id] = (ofertante_id, personagem.id, destinatario_id, quantidade_eritos, agora)
+        self._trocas_do_personagem.setdefault(personagem.id, set()).add(troca_id)
+        return troca_id
+
+    async def destinatario_da_troca(self, troca_id, validade):
+        troca = self._trocas.get(troca_id)
+        if troca is None or troca[4] < int(time.time()) - validade:
+            return None
+        return troca[2]
+
+    async def confirmar_troca(self, troca_id):
+        troca = self._trocas.get(troca_id)
+        if troca is None:
+            return None
+        ofertante_id, personagem_id, destinatario_id, quantidade_eritos, _ = troca
+        if self._donos.get(personagem_id) != ofertante_id:
+            return None
+        debito = credito = None
+        if quantidade_eritos > 0:
+            if self._eritos.get(destinatario_id, 0) < quantidade_eritos:
+                return None
+            debito = self._eritos[destinatario_id] = self._eritos[destinatario_id] - quantidade_eritos
+            credito = self._eritos[ofertante_id] = self._eritos.get(ofertante_id, 0) + quantidade_eritos
+            self._lancar([(destinatario_id, -quantidade_eritos, "troca", troca_id),
+                          (ofertante_id, quantidade_eritos, "troca", troca_id)])
+        self._transferir(personagem_id, ofertante_id, destinatario_id)
+        self._apagar_troca(troca_id)
+        return ofertante_id, destinatario_id, personagem_id, quantidade_eritos, debito, credito
+
+    async def recusar_troca(self, troca_id):
+        self._apagar_troca(troca_id)
+
+    async def metadado(self, chave):
+        return self._metadados.get(chave)
+
+    async def definir_metadado(self, chave, valor):
+        self._metadados[chave] = valor
+
+    async def resetar(self, tipo, referencia=None):
+        """Zera de uma vez os amores, os saldos (`moedas`) ou os cooldowns, como uma tarefa de reset do
+        SQLite; retorna as linhas alteradas no formato dela (veja `tarefas.TarefasImediatas`)."""
+        if tipo == "amores":
+            linhas = [(usuario_id, personagem_id) for personagem_id, usuario_id in self._donos.items()]
+            self._donos.clear()
+            self._amores.clear()
+        elif tipo == "moedas":
+            linhas = [(usuario_id, 0) for usuario_id, eritos in self._eritos.items() if eritos]
+            self._lancar([(usuario_id, -self._eritos[usuario_id], "reset", referencia) for usuario_id, _ in linhas])
+            self._eritos = dict.fromkeys(self._eritos, 0)
+        elif tipo == "cooldowns":
+            linhas = [(usuario_id,) for usuario_id in self._cooldowns]
+            self._cooldowns.clear()
+        else:
+            raise ValueError(f"Tipo de reset desconhecido: {tipo}")
+        return linhas
@@ -0,0 +1,276 @@
+import asyncio
+import contextlib
+import logging
+import time
+import aiosqlite
+
+log = logging.getLogger(__name__)
+
+# Pragmas aplicados a todas as conexões abertas pelo bot
+PRAGMAS = (
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA synchronous = NORMAL",   # Seguro no modo WAL e evita um fsync por commit
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",    # ~16 MB de cache de páginas por conexão
+    "PRAGMA mmap_size = 134217728",  # Até 128 MB do arquivo mapeados em memória
+    "PRAGMA foreign_keys = ON",
+)
+
+# Quantidade de instruções preparadas mantidas em cache por conexão
+CACHE_INSTRUCOES = 256
+
+# Group commit: pedidos de escrita que chegam enquanto um grupo está aberto entram na mesma
+# transação, até MAXIMO_GRUPO pedidos ou ORCAMENTO_GRUPO segundos desde o início do grupo.
+# Sem fila, o grupo fecha na hora: um pedido isolado não espera ninguém.
+MAXIMO_GRUPO = 256
+ORCAMENTO_GRUPO = 0.005
+
+
+class _ConexaoDoPedido:
+    """Escritor entregue ao bloco de um pedido: mede as instruções para o observador (se houver)
+    e limita o `rollback` ao savepoint do pedido, sem desfazer os outros pedidos do grupo."""
+
+    def __init__(self, db, observador):
+        self._db = db
+        self._observador = observador
+
+    async def execute(self, sql, parametros=()):
+        if self._observador is None:
+            return await self._db.execute(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return await self._db.execute(sql, parametros)
+        finally:
+            self._observador(sql, parametros, time.perf_counter() - inicio)
+
+    async def executemany(self, sql, parametros):
+        if self._observador is None:
+            return await self._db.executemany(sql, parametros)
+        inicio = time.perf_counter()
+        try:
+            return await self._db.executemany(sql, parametros)
+        finally:
+            self._observador(sql, "<lote>", time.perf_counter() - inicio)
+
+    async def rollback(self):
+        await self._db.execute("ROLLBACK TO pedido")
+
+    def __getattr__(self, nome):
+        return getattr(self._db, nome)
+
+
+class _PedidoEscrita:
+    """Um bloco `transacao()` na fila do escritor, com os futuros da troca entre o bloco e o escritor."""
+    __slots__ = ("vez", "fim", "gravado")
+
+    def __init__(self, loop):
+        self.vez = loop.create_future()  # Conexão para o bloco, quando chega a vez do pedido
+        self.fim = loop.create_future()  # True se o bloco terminou sem erro
+        self.gravado = loop.create_future()  # Duração do COMMIT do grupo, ou a exceção dele
+
+    def falhar(self, erro):
+        """Repassa ao bloco a falha do grupo: antes da vez dele ou, se ele terminou sem erro, no COMMIT."""
+        if not self.vez.done():
+            self.vez.set_exception(erro)
+        elif self.fim.done() and self.fim.result() and not self.gravado.done():
+            self.gravado.set_exception(erro)
+
+
+class BancoDeDados:
+    """Escritor único (uma tarefa que aplica os pedidos de escrita em grupos) e pool de leitores
+    compartilhados por todos os comandos."""
+
+    def __init__(self, caminho, leitores=4):
+        self.caminho = caminho
+        self.total_leitores = leitores
+        self.escritor = None
+        self._leitores = asyncio.Queue()
+        self._fila_escrita = asyncio.Queue()
+        self._tarefa_escrita = None
+        self._fechando = False  # Depois de `fechar()`, novos pedidos de escrita são recusados
+        self.observador = None  # `observador(sql, parametros, duracao)`, chamado após cada instrução
+        self.grupos = 0  # Transações (COMMITs) feitas pelo escritor
+        self.pedidos_gravados = 0  # Pedidos de escrita confirmados nessas transações
+
+    async def _conectar(self):
+        """Abre uma conexão em modo autocommit, com os pragmas e o cache de instruções."""
+        db = await aiosqlite.connect(self.caminho, isolation_level=None, cached_statements=CACHE_INSTRUCOES)
+        for pragma in PRAGMAS:
+            await self._pragma(db, pragma)
+        return db
+
+    @staticmethod
+    async def _pragma(db, pragma):
+        """Executa um pragma e descarta o resultado, liberando a instrução."""
+        cursor = await db.execute(pragma)
+        await cursor.fetchall()
+        await cursor.close()
+
+    async def abrir(self):
+        """Abre o escritor (ativando o WAL) e o pool de leitores."""
+        self.escritor = await self._conectar()
+        # Só vale para bancos novos (antes da primeira tabela); permite devolver páginas livres aos poucos
+        # com `PRAGMA incremental_vacuum` em vez de um VACUUM completo, que trava o banco inteiro
+        await self._pragma(self.escritor, "PRAGMA auto_vacuum = INCREMENTAL")
+        await self._pragma(self.escritor, "PRAGMA journal_mode = WAL")
+        for _ in range(self.total_leitores):
+            leitor = await self._conectar()
+            await self._pragma(leitor, "PRAGMA query_only = ON")
+            self._leitores.put_nowait(leitor)
+        self._fechando = False
+        self._tarefa_escrita = asyncio.create_task(self._escrever())
+
+    async def fechar(self):
+        """Termina os pedidos de escrita já enfileirados e fecha todas as conexões abertas.
+
+        Pedidos feitos depois do início do fechamento falham com RuntimeError."""
+        if self._tarefa_escrita is not None:
+            # Recusa novos pedidos antes do sentinela: nenhum entra na fila depois dele
+            self._fechando = True
+            self._fila_escrita.put_nowait(None)
+            try:
+                await self._tarefa_escrita
+            finally:
+                self._tarefa_escrita = None
+                # Se o escritor parou antes do fim da fila, quem ainda espera a vez não fica esperando para sempre
+                while not self._fila_escrita.empty():
+                    pedido = self._fila_escrita.get_nowait()
+                    if pedido is not None:
+                        pedido.falhar(RuntimeError("O banco de dados foi fechado"))
+        while not self._leitores.empty():
+            await self._leitores.get_nowait().close()
+        if self.escritor:
+            # Aproveita o fechamento para manter as estatísticas do planejador atualizadas
+            await self._pragma(self.escritor, "PRAGMA optimize")
+            await self.escritor.close()
+            self.escritor = None
+
+    async def rastrear(self, callback):
+        """Instala `callback(sql)` em todas as conexões (None remove); use com o bot ocioso."""
+        leitores = [self._leitores.get_nowait() for _ in range(self._leitores.qsize())]
+        try:
+            for db in (self.escritor, *leitores):
+                await db.set_trace_callback(callback)
+        finally:
+            for db in leitores:
+                self._leitores.put_nowait(db)
+
+    @contextlib.asynccontextmanager
+    async def leitor(self):
+        """Empresta uma conexão de leitura do pool."""
+        db = await self._leitores.get()
+        try:
+            yield db
+        finally:
+            self._leitores.put_nowait(db)
+
+    @contextlib.asynccontextmanager
+    async def transacao(self):
+        """Executa o bloco como um pedido na fila do escritor único, em um savepoint do grupo atual.
+
+        Uma exceção no bloco (ou `db.rollback()`) desfaz só as instruções dele. A saída do bloco
+        espera o COMMIT do grupo, então o que foi gravado já está confirmado quando o `async with` termina."""
+        if self._tarefa_escrita is None or self._fechando:
+            raise RuntimeError("O banco de dados não está aberto")
+        pedido = _PedidoEscrita(asyncio.get_running_loop())
+        self._fila_escrita.put_nowait(pedido)
+        try:
+            db = await pedido.vez
+        except BaseException:
+            # Cancelado na fila: o escritor pula o pedido; se a vez já tinha chegado, devolve-a
+            if pedido.vez.done() and not pedido.vez.cancelled() and pedido.vez.exception() is None:
+                pedido.fim.set_result(False)
+            raise
+        try:
+            yield db
+        except BaseException:
+            pedido.fim.set_result(False)
+            raise
+        pedido.fim.set_result(True)
+        duracao = await pedido.gravado
+        if self.observador is not None:
+            self.observador("COMMIT", (), duracao)
+
+    async def _escrever(self):
+        """Tarefa do escritor: aplica os pedidos na ordem da fila, um de cada vez, agrupando em uma
+        só transação os que chegam enquanto o grupo está aberto, e confirma o grupo com um COMMIT."""
+        while True:
+            pedido = await self._fila_escrita.get()
+            if pedido is None:
+                return
+            if pedido.vez.cancelled():
+                continue
+            grupo = []
+            encerrar = False
+            inicio = time.perf_counter()
+            try:
+                await self.escritor.execute("BEGIN IMMEDIATE")
+                while True:
+                    if not pedido.vez.cancelled() and await self._aplicar(pedido):
+                        grupo.append(pedido)
+                    pedido = None
+                    if (len(grupo) >= MAXIMO_GRUPO or time.perf_counter() - inicio >= ORCAMENTO_GRUPO
+                            or self._fila_escrita.empty()):
+                        break
+                    pedido = self._fila_escrita.get_nowait()
+                    if pedido is None:
+                        encerrar = True
+                        break
+                inicio_commit = time.perf_counter()
+                await self.escritor.commit()
+                duracao = time.perf_counter() - inicio_commit
+            except Exception as erro:
+                log.exception("Falha em um grupo de %d escritas; o grupo foi desfeito", len(grupo) + (pedido is not None))
+                with contextlib.suppress(Exception):
+                    if self.escritor.in_transaction:
+                        await self.escritor.rollback()
+                for afetado in (*grupo, *([pedido] if pedido is not None else [])):
+                    afetado.falhar(erro)
+                continue
+            self.grupos += 1
+            self.pedidos_gravados += len(grupo)
+            for gravado in grupo:
+                if not gravado.gravado.done():
+                    gravado.gravado.set_result(duracao)
+            if encerrar:
+                return
+
+    async def _aplicar(self, pedido):
+        """Entrega o escritor ao bloco do pedido dentro de um savepoint; retorna True se o bloco terminou sem erro."""
+        await self.escritor.execute("SAVEPOINT pedido")
+        if pedido.vez.cancelled():
+            # Cancelado durante o SAVEPOINT: só este pedido sai do grupo
+            await self.escritor.execute("RELEASE pedido")
+            return False
+        pedido.vez.set_result(_ConexaoDoPedido(self.escritor, self.observador))
+        ok = await pedido.fim
+        if not ok:
+            await self.escritor.execute("ROLLBACK TO pedido")
+        await self.escritor.execute("RELEASE pedido")
+        return ok
+
+    async def consultar_um(self, sql, parametros=()):
+        """Executa uma consulta em um leitor e retorna a primeira linha."""
+        async with self.leitor() as db:
+            inicio = time.perf_counter()
+            # Fechar o cursor encerra a leitura e libera o snapshot do WAL
+            async with db.execute(sql, parametros) as cursor:
+                linha = await cursor.fetchone()
+            if self.observador is not None:
+                self.observador(sql, parametros, time.perf_counter() - inicio)
+            return linha
+
+    async def consultar_todos(self, sql, parametros=()):
+        """Executa uma consulta em um leitor e retorna todas as linhas."""
+        async with self.leitor() as db:
+            inicio = time.perf_counter()
+            async with db.execute(sql, parametros) as cursor:
+                linhas = await cursor.fetchall()
+            if self.observador is not None:
+                self.observador(sql, parametros, time.perf_counter() - inicio)
+            return linhas
+
+    async def executar(self, sql, parametros=()):
+        """Executa uma única instrução de escrita em sua própria transação."""
+        async with self.transacao() as db:
+            return await db.execute(sql, parametros)
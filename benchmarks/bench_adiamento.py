@@ -0,0 +1,150 @@
+"""Mede as respostas dentro do prazo de 3 segundos do Discord com o banco ocupado, com e sem o adiamento automático.
+
+Usuários concorrentes usam /coletar, /flerte, /rank, /listar_personagens e /oferecer_troca (e
+aceitam as trocas pelo botão) enquanto uma escrita longa, como uma importação grande, segura o
+escritor do banco de tempos em tempos, e cada busca de usuário na API demora. Cada comando passa
+pelo mesmo `responder_no_prazo` da árvore de comandos; a rodada sem adiamento desliga só o
+temporizador. Para cada comando, reporta as respostas imediatas e adiadas, as que chegaram depois
+do prazo e a folga, e confere que toda interação recebeu o resultado.
+
+Uso: python benchmarks/bench_adiamento.py [--duracao 20] [--bloqueio 4] [--latencia-api 0.3]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot as eros
+import metricas
+from bench_comandos import Cenario, InteracaoFalsa, semear, usuario_falso
+from caches import CacheNomes
+
+bot = eros.bot
+
+
+async def segurar_escritor(parar, bloqueio, intervalo):
+    """Segura o escritor por `bloqueio` segundos a cada `intervalo` segundos."""
+    while not parar.is_set():
+        async with bot.banco.transacao():
+            await asyncio.sleep(bloqueio)
+        await asyncio.sleep(intervalo)
+
+
+async def comando(nome, usuario, *argumentos):
+    """Executa o comando como a árvore de comandos: medido e com a resposta no prazo."""
+    interacao = InteracaoFalsa(usuario, discord.InteractionType.application_command)
+    with bot.metricas.responder_no_prazo(f"/{nome}", interacao):
+        await getattr(eros, nome).callback(interacao, *argumentos)
+    return interacao
+
+
+async def rodada(cenario, usuarios, duracao, total_usuarios):
+    """Usuários concorrentes até o fim da `duracao`; retorna as interações sem resposta."""
+    sem_resposta = []
+    fim = time.perf_counter() + duracao
+
+    async def conferir(interacao):
+        if interacao.enviado is None:
+            sem_resposta.append(interacao)
+
+    async def usuario():
+        gerador = random.Random()
+        while time.perf_counter() < fim:
+            escolha = gerador.random()
+            if escolha < 0.25:
+                await conferir(await comando("coletar", cenario.usuario_novo()))
+            elif escolha < 0.45:
+                await conferir(await comando("flerte", cenario.usuario_novo()))
+            elif escolha < 0.65:
+                # Páginas diferentes obrigam o /rank a buscar nomes na API
+                pagina = gerador.randint(1, -(-total_usuarios // 10))
+                await conferir(await comando("rank", cenario.usuario_existente(), pagina))
+            elif escolha < 0.8:
+                await conferir(await comando("listar_personagens", cenario.usuario_existente()))
+            else:
+                usuario_id, personagem = cenario._ofertante()
+                destinatario = usuario_falso(usuario_id % total_usuarios + 1)
+                oferta = await comando("oferecer_troca", usuario_falso(usuario_id), personagem, destinatario, 0)
+                await conferir(oferta)
+                view = (oferta.enviado or (None, {}))[1].get("view")
+                if view is not None:
+                    clique = InteracaoFalsa(destinatario)
+                    await view.children[0].callback(clique)
+                    await conferir(clique)
+            await asyncio.sleep(gerador.uniform(0.01, 0.1))
+
+    await asyncio.gather(*(usuario() for _ in range(usuarios)))
+    return sem_resposta
+
+
+def resumo(nome, estatisticas):
+    respostas = estatisticas.imediatas + estatisticas.adiadas
+    return (f"{nome:<22} {respostas:>5} respostas, {estatisticas.adiadas / max(respostas, 1):5.0%} adiadas, "
+            f"{estatisticas.atrasadas:>4} depois do prazo; primeira resposta p99 ≤{estatisticas.primeira_resposta.percentil(0.99) * 1000:g} ms, "
+            f"folga mínima {estatisticas.menor_folga * 1000:.0f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--personagens", type=int, default=20000)
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--concorrentes", type=int, default=20)
+    parser.add_argument("--duracao", type=float, default=20.0, help="Segundos de carga em cada rodada")
+    parser.add_argument("--bloqueio", type=float, default=4.0, help="Segundos que a escrita longa segura o escritor")
+    parser.add_argument("--intervalo", type=float, default=3.0, help="Segundos entre as escritas longas")
+    parser.add_argument("--latencia-api", type=float, default=0.3, help="Segundos de cada busca de usuário na API")
+    args = parser.parse_args()
+    if args.usuarios * 3 > args.personagens:
+        parser.error(f"--usuarios × 3 amores ({args.usuarios * 3}) precisa caber em --personagens ({args.personagens})")
+    random.seed(0)
+    erros = []
+
+    async def buscar_usuario_lento(usuario_id):
+        await asyncio.sleep(args.latencia_api)
+        return usuario_falso(usuario_id)
+    bot.fetch_user = buscar_usuario_lento
+
+    with tempfile.TemporaryDirectory() as pasta:
+        await bot.iniciar_banco(os.path.join(pasta, "bench.db"))
+        try:
+            await semear(args.personagens, args.usuarios, 3)
+            cenario = Cenario(args.usuarios, 3)
+            for titulo, orcamento in (("sem adiamento", None), (f"adiando após {metricas.ORCAMENTO_RESPOSTA:g} s", metricas.ORCAMENTO_RESPOSTA)):
+                bot.metricas.comandos = {}
+                bot.metricas.orcamento_resposta = orcamento
+                bot.nomes_usuarios = CacheNomes()
+                parar = asyncio.Event()
+                escritor = asyncio.create_task(segurar_escritor(parar, args.bloqueio, args.intervalo))
+                sem_resposta = await rodada(cenario, args.concorrentes, args.duracao, args.usuarios)
+                parar.set()
+                await escritor
+
+                print(f"{titulo}:")
+                for nome, estatisticas in sorted(bot.metricas.comandos.items()):
+                    print(f"  {resumo(nome, estatisticas)}")
+                atrasadas = sum(estatisticas.atrasadas for estatisticas in bot.metricas.comandos.values())
+                if sem_resposta:
+                    erros.append(f"{titulo}: {len(sem_resposta)} interações sem resultado")
+                if orcamento is None and not atrasadas:
+                    print("  (nenhuma resposta passou do prazo; aumente --bloqueio para reproduzir o problema)")
+                if orcamento is not None and atrasadas:
+                    erros.append(f"{titulo}: {atrasadas} respostas depois do prazo")
+        finally:
+            bot.metricas.orcamento_resposta = metricas.ORCAMENTO_RESPOSTA
+            await bot.fechar_banco()
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
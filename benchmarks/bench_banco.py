@@ -0,0 +1,82 @@
+"""Compara a latência de ida e volta ao banco: conexão por chamada x camada compartilhada.
+
+Uso: python benchmarks/bench_banco.py [--operacoes 2000]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from banco import BancoDeDados
+
+
+async def preparar(caminho, usuarios):
+    """Cria a tabela de moedas com alguns usuários."""
+    async with aiosqlite.connect(caminho) as db:
+        await db.execute("CREATE TABLE moedas (usuario_id INTEGER PRIMARY KEY, eritos INTEGER DEFAULT 0)")
+        await db.executemany("INSERT INTO moedas VALUES (?, ?)", ((i, i % 500) for i in range(usuarios)))
+        await db.commit()
+
+
+async def leitura_antes(caminho, usuario_id):
+    async with aiosqlite.connect(caminho) as db:
+        cursor = await db.execute("SELECT eritos FROM moedas WHERE usuario_id = ?", (usuario_id,))
+        return await cursor.fetchone()
+
+
+async def escrita_antes(caminho, usuario_id):
+    async with aiosqlite.connect(caminho) as db:
+        await db.execute("UPDATE moedas SET eritos = eritos + 1 WHERE usuario_id = ?", (usuario_id,))
+        await db.commit()
+
+
+async def medir(operacao, operacoes, usuarios):
+    """Executa a operação em sequência e retorna as latências em milissegundos."""
+    latencias = []
+    for i in range(operacoes):
+        inicio = time.perf_counter()
+        await operacao(i % usuarios)
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    return latencias
+
+
+def resumo(nome, latencias):
+    latencias.sort()
+    p99 = latencias[int(len(latencias) * 0.99) - 1]
+    print(f"{nome:<28} média {statistics.fmean(latencias):7.3f} ms   p50 {statistics.median(latencias):7.3f} ms   p99 {p99:7.3f} ms")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operacoes", type=int, default=2000)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "bench.db")
+        await preparar(caminho, args.usuarios)
+
+        resumo("leitura (antes)", await medir(lambda u: leitura_antes(caminho, u), args.operacoes, args.usuarios))
+        resumo("escrita (antes)", await medir(lambda u: escrita_antes(caminho, u), args.operacoes, args.usuarios))
+
+        banco = BancoDeDados(caminho)
+        await banco.abrir()
+        try:
+            resumo("leitura (compartilhado)", await medir(
+                lambda u: banco.consultar_um("SELECT eritos FROM moedas WHERE usuario_id = ?", (u,)),
+                args.operacoes, args.usuarios))
+            resumo("escrita (compartilhado)", await medir(
+                lambda u: banco.executar("UPDATE moedas SET eritos = eritos + 1 WHERE usuario_id = ?", (u,)),
+                args.operacoes, args.usuarios))
+        finally:
+            await banco.fechar()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
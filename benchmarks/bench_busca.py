@@ -0,0 +1,125 @@
+"""Mede a latência da busca aproximada de personagens conforme o catálogo cresce.
+
+Para cada tamanho de catálogo, busca nomes existentes com um erro de digitação (letra trocada,
+faltando ou repetida), partes de nomes e prefixos curtos, reportando p50/p99 e com que frequência
+o nome original aparece entre as 3 primeiras sugestões.
+
+Uso: python benchmarks/bench_busca.py [--tamanhos 1000,10000,100000,200000] [--buscas 500]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import busca
+from armazenamento import ArmazenamentoSQLite
+from banco import BancoDeDados
+from migracoes import migrar
+
+SILABAS = ["ka", "ri", "to", "mi", "na", "su", "ke", "ha", "ru", "yo", "shi", "chi", "ta", "ne", "ko",
+           "ma", "lu", "ra", "be", "do", "fe", "ga", "li", "no", "pe", "sa", "vi", "ze", "an", "el"]
+
+
+def nome_aleatorio(gerador):
+    def palavra():
+        return "".join(gerador.choice(SILABAS) for _ in range(gerador.randint(2, 4))).capitalize()
+    return f"{palavra()} {palavra()}"
+
+
+def com_erro(gerador, nome):
+    """O nome com um erro de digitação: uma letra trocada, apagada ou repetida."""
+    posicao = gerador.randrange(1, len(nome) - 1)
+    erro = gerador.choice(("trocar", "apagar", "repetir"))
+    if erro == "trocar":
+        return nome[:posicao] + gerador.choice("aeiourstnm") + nome[posicao + 1:]
+    if erro == "apagar":
+        return nome[:posicao] + nome[posicao + 1:]
+    return nome[:posicao] + nome[posicao] + nome[posicao:]
+
+
+def percentil(valores, q):
+    return sorted(valores)[min(int(len(valores) * q), len(valores) - 1)]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanhos", default="1000,10000,100000,200000")
+    parser.add_argument("--buscas", type=int, default=500)
+    args = parser.parse_args()
+    gerador = random.Random(1)
+    nomes = []
+    vistos = set()
+    erros = []
+    resultados = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = BancoDeDados(os.path.join(pasta, "busca.db"))
+        await banco.abrir()
+        await migrar(banco)
+        armazenamento = ArmazenamentoSQLite(banco)
+        try:
+            for tamanho in (int(valor) for valor in args.tamanhos.split(",")):
+                novos = []
+                while len(nomes) + len(novos) < tamanho:
+                    nome = nome_aleatorio(gerador)
+                    if nome.casefold() not in vistos:
+                        vistos.add(nome.casefold())
+                        novos.append(nome)
+                async with banco.transacao() as db:
+                    await db.executemany("INSERT INTO personagens (nome, imagem) VALUES (?, 'https://exemplo.com/a.png')",
+                                         ((nome,) for nome in novos))
+                    # Um terço do catálogo conquistado, para os filtros
+                    await db.executemany("INSERT INTO amores (usuario_id, personagem_id) SELECT ?, id FROM personagens WHERE nome = ?",
+                                         ((indice % 100, nome) for indice, nome in enumerate(novos) if indice % 3 == 0))
+                nomes += novos
+
+                latencias = {"com erro": [], "parte do nome": [], "prefixo curto": [], "disponíveis": []}
+                acertos = 0
+                for _ in range(args.buscas):
+                    original = gerador.choice(nomes)
+                    inicio = time.perf_counter()
+                    sugestoes = await busca.sugestoes(armazenamento, com_erro(gerador, original))
+                    latencias["com erro"].append(time.perf_counter() - inicio)
+                    acertos += original in sugestoes
+
+                    inicio = time.perf_counter()
+                    await busca.buscar(banco, original.split()[1][:5])
+                    latencias["parte do nome"].append(time.perf_counter() - inicio)
+
+                    inicio = time.perf_counter()
+                    await busca.buscar(banco, original[:2])
+                    latencias["prefixo curto"].append(time.perf_counter() - inicio)
+
+                    inicio = time.perf_counter()
+                    await busca.buscar(banco, com_erro(gerador, original), "disponiveis")
+                    latencias["disponíveis"].append(time.perf_counter() - inicio)
+
+                taxa = acertos / args.buscas
+                resultados.append((tamanho, latencias, taxa))
+                print(f"{tamanho:>7} nomes: " + "; ".join(
+                    f"{tipo} p50 {percentil(valores, 0.5) * 1000:.2f} ms, p99 {percentil(valores, 0.99) * 1000:.2f} ms"
+                    for tipo, valores in latencias.items()
+                ) + f"; nome certo entre as sugestões em {taxa:.0%}")
+                if taxa < 0.8:
+                    erros.append(f"com {tamanho} nomes o nome certo só foi sugerido em {taxa:.0%} das buscas")
+        finally:
+            await banco.fechar()
+
+    menor, maior = resultados[0], resultados[-1]
+    crescimento = percentil(maior[1]["com erro"], 0.5) / percentil(menor[1]["com erro"], 0.5)
+    print(f"p50 da busca com erro: {crescimento:.1f}× de {menor[0]} para {maior[0]} nomes "
+          f"({maior[0] / menor[0]:.0f}× mais nomes)")
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
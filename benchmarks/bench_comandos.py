@@ -0,0 +1,338 @@
+"""Mede os comandos do bot sem conexão com o Discord, usando interações falsas e um banco temporário.
+
+Para cada comando reporta os percentis de latência e quantas instruções SQL e commits ele
+executa; depois simula N usuários concorrentes e reporta a vazão. O resultado também é
+gravado em JSON para comparar execuções.
+
+Uso: python benchmarks/bench_comandos.py [--personagens 20000] [--concorrentes 50] [--saida resultado.json]
+                                         [--armazenamento memoria]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timezone
+
+import discord
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bot as eros
+import metricas
+
+bot = eros.bot
+
+
+class RespostaFalsa:
+    """Substitui `interaction.response`, guardando o que o comando respondeu."""
+
+    def __init__(self, interacao):
+        self._interacao = interacao
+        self._respondida = False
+
+    def is_done(self):
+        return self._respondida
+
+    async def send_message(self, content=None, **kwargs):
+        self._respondida = True
+        self._interacao.enviado = (content, kwargs)
+
+    async def edit_message(self, **kwargs):
+        self._respondida = True
+        self._interacao.enviado = (None, kwargs)
+
+    async def defer(self, **kwargs):
+        self._respondida = True
+
+    async def send_modal(self, modal):
+        self._respondida = True
+        self._interacao.enviado = (None, {"modal": modal})
+
+
+class MensagemFalsa:
+    _proximo_id = 0
+
+    def __init__(self):
+        MensagemFalsa._proximo_id += 1
+        self.id = MensagemFalsa._proximo_id
+        self.created_at = datetime.now(timezone.utc)
+        self.embeds = []
+
+    async def edit(self, **kwargs):
+        pass
+
+
+class FollowupFalso:
+    def __init__(self, interacao):
+        self._interacao = interacao
+
+    async def send(self, content=None, **kwargs):
+        self._interacao.enviado = (content, kwargs)
+
+
+class InteracaoFalsa:
+    """O mínimo de `discord.Interaction` usado pelos comandos e views do bot."""
+    _proximo_id = 0
+
+    def __init__(self, usuario, tipo=discord.InteractionType.component):
+        InteracaoFalsa._proximo_id += 1
+        self.id = InteracaoFalsa._proximo_id
+        self.type = tipo
+        self.user = usuario
+        self.client = bot
+        self.guild_id = None
+        self.created_at = datetime.now(timezone.utc)
+        self.message = MensagemFalsa()
+        self.followup = FollowupFalso(self)
+        self.enviado = None
+
+    # Propriedade com cache no mesmo slot de `discord.Interaction`, que as métricas substituem
+    response = discord.utils.CachedSlotProperty(metricas.SLOT_RESPOSTA, RespostaFalsa)
+
+    async def edit_original_response(self, **kwargs):
+        self.enviado = (None, kwargs)
+
+    async def delete_original_response(self):
+        self.enviado = None
+
+
+def usuario_falso(usuario_id):
+    return types.SimpleNamespace(id=usuario_id, name=f"usuario{usuario_id}", mention=f"<@{usuario_id}>")
+
+
+async def buscar_usuario_falso(usuario_id):
+    await asyncio.sleep(0)  # Uma volta no event loop no lugar da chamada HTTP
+    return usuario_falso(usuario_id)
+
+
+class Contador:
+    """Conta instruções SQL e commits a partir do trace callback das conexões."""
+
+    def __init__(self):
+        self.instrucoes = 0
+        self.commits = 0
+
+    def __call__(self, sql):
+        self.instrucoes += 1
+        if sql.lstrip().upper().startswith("COMMIT"):
+            self.commits += 1
+
+
+async def semear(personagens, usuarios, amores_por_usuario):
+    """Preenche o armazenamento com personagens, saldos e amores (os amores do usuário N são os personagens seguintes aos do N - 1)."""
+    if bot.banco is None:
+        # Armazenamento em memória: pelas operações do próprio armazenamento
+        armazenamento = bot.armazenamento
+        await armazenamento.adicionar_personagens([(f"Personagem {i:06d}", f"https://exemplo.com/{i}.png", 2) for i in range(personagens)])
+        for usuario_id in range(1, usuarios + 1):
+            await armazenamento.adicionar_eritos(usuario_id, random.randint(0, 5000), "semente")
+            for i in range((usuario_id - 1) * amores_por_usuario, usuario_id * amores_por_usuario):
+                await armazenamento.casar(usuario_id, f"Personagem {i:06d}")
+        await bot.carregar_indices()
+        return
+    async with bot.banco.transacao() as db:
+        await db.executemany("INSERT INTO personagens (nome, imagem) VALUES (?, ?)",
+                             ((f"Personagem {i:06d}", f"https://exemplo.com/{i}.png") for i in range(personagens)))
+        await db.executemany("INSERT INTO moedas (usuario_id, eritos) VALUES (?, ?)",
+                             ((usuario_id, random.randint(0, 5000)) for usuario_id in range(1, usuarios + 1)))
+        amores = []
+        personagem_id = 1
+        for usuario_id in range(1, usuarios + 1):
+            for _ in range(amores_por_usuario):
+                amores.append((usuario_id, personagem_id))
+                personagem_id += 1
+        await db.executemany("INSERT INTO amores (usuario_id, personagem_id) VALUES (?, ?)", amores)
+    await bot.carregar_indices()
+
+
+class Cenario:
+    """Gera as chamadas de cada comando, usando um usuário novo quando o comando tem cooldown."""
+
+    def __init__(self, usuarios, amores_por_usuario):
+        self.usuarios = usuarios
+        self.amores_por_usuario = amores_por_usuario
+        self._proximo_usuario = usuarios  # IDs acima dos semeados ainda não têm cooldown
+        self._proximo_ofertante = 0
+
+    def usuario_novo(self):
+        self._proximo_usuario += 1
+        return usuario_falso(self._proximo_usuario)
+
+    def usuario_existente(self):
+        return usuario_falso(random.randint(1, self.usuarios))
+
+    async def flerte(self):
+        await eros.flerte.callback(InteracaoFalsa(self.usuario_novo()))
+
+    async def flertar(self):
+        interacao = InteracaoFalsa(self.usuario_novo())
+        await eros.flerte.callback(interacao)
+        view = interacao.enviado[1].get("view")
+        if view is None:
+            return None
+        # O clique no botão é o que se mede
+        return lambda: view.children[0].callback(InteracaoFalsa(interacao.user))
+
+    async def coletar(self):
+        await eros.coletar.callback(InteracaoFalsa(self.usuario_novo()))
+
+    def _ofertante(self):
+        # Cada ofertante semeado possui `amores_por_usuario` personagens; usa um diferente a cada vez
+        self._proximo_ofertante += 1
+        usuario_id = (self._proximo_ofertante - 1) % self.usuarios + 1
+        indice = ((self._proximo_ofertante - 1) // self.usuarios) % self.amores_por_usuario
+        personagem_id = (usuario_id - 1) * self.amores_por_usuario + indice + 1
+        return usuario_id, f"Personagem {personagem_id - 1:06d}"
+
+    async def oferecer_troca(self):
+        usuario_id, personagem = self._ofertante()
+        destinatario = usuario_falso(usuario_id % self.usuarios + 1)
+        await eros.oferecer_troca.callback(InteracaoFalsa(usuario_falso(usuario_id)), personagem, destinatario, 0)
+
+    async def aceitar(self):
+        usuario_id, personagem = self._ofertante()
+        destinatario = usuario_falso(usuario_id % self.usuarios + 1)
+        interacao = InteracaoFalsa(usuario_falso(usuario_id))
+        await eros.oferecer_troca.callback(interacao, personagem, destinatario, 0)
+        view = interacao.enviado[1].get("view")
+        if view is None:
+            return None
+        return lambda: view.children[0].callback(InteracaoFalsa(destinatario))
+
+    async def rank(self):
+        await eros.rank.callback(InteracaoFalsa(self.usuario_existente()))
+
+    async def listar_personagens(self):
+        await eros.listar_personagens.callback(InteracaoFalsa(self.usuario_existente()))
+
+
+# Comandos medidos; os que retornam uma função medem apenas o clique no botão
+COMANDOS = ["flerte", "flertar", "coletar", "oferecer_troca", "aceitar", "rank", "listar_personagens"]
+
+
+def percentis(latencias):
+    latencias = sorted(latencias)
+
+    def p(q):
+        return round(latencias[min(len(latencias) - 1, int(len(latencias) * q))], 3)
+
+    return {"p50_ms": p(0.50), "p95_ms": p(0.95), "p99_ms": p(0.99), "media_ms": round(statistics.fmean(latencias), 3)}
+
+
+async def medir_comando(cenario, nome, execucoes, contador):
+    """Executa um comando em sequência, medindo latência, instruções e commits."""
+    latencias = []
+    instrucoes = commits = 0
+    for _ in range(execucoes):
+        preparar = getattr(cenario, nome)
+        if nome in ("flertar", "aceitar"):
+            clique = await preparar()
+            if clique is None:
+                continue
+            chamada = clique
+        else:
+            chamada = preparar
+        antes = (contador.instrucoes, contador.commits)
+        inicio = time.perf_counter()
+        await chamada()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        instrucoes += contador.instrucoes - antes[0]
+        commits += contador.commits - antes[1]
+    if not latencias:
+        return {"execucoes": 0}
+    return {
+        "execucoes": len(latencias),
+        **percentis(latencias),
+        "instrucoes_por_execucao": round(instrucoes / len(latencias), 2),
+        "commits_por_execucao": round(commits / len(latencias), 2),
+    }
+
+
+async def medir_concorrencia(cenario, concorrentes, operacoes_por_usuario):
+    """Simula usuários concorrentes executando uma mistura dos comandos."""
+    mistura = ["flerte", "coletar", "rank", "listar_personagens", "oferecer_troca"]
+    latencias = []
+
+    async def usuario():
+        for _ in range(operacoes_por_usuario):
+            inicio = time.perf_counter()
+            await getattr(cenario, random.choice(mistura))()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(usuario() for _ in range(concorrentes)))
+    duracao = time.perf_counter() - inicio
+    return {
+        "usuarios": concorrentes,
+        "operacoes": len(latencias),
+        "duracao_s": round(duracao, 3),
+        "operacoes_por_segundo": round(len(latencias) / duracao, 1),
+        **percentis(latencias),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--personagens", type=int, default=20000)
+    parser.add_argument("--usuarios", type=int, default=2000)
+    parser.add_argument("--amores-por-usuario", type=int, default=3)
+    parser.add_argument("--execucoes", type=int, default=300)
+    parser.add_argument("--concorrentes", type=int, default=50)
+    parser.add_argument("--operacoes-por-usuario", type=int, default=20)
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="arquivo JSON para gravar o resultado")
+    parser.add_argument("--armazenamento", choices=eros.ARMAZENAMENTOS, default="sqlite",
+                        help="Onde o bot guarda os dados; com \"memoria\" não há instruções SQL a contar")
+    args = parser.parse_args()
+    if args.usuarios * args.amores_por_usuario > args.personagens:
+        parser.error(f"--usuarios × --amores-por-usuario ({args.usuarios * args.amores_por_usuario}) "
+                     f"precisa caber em --personagens ({args.personagens}): cada amor usa um personagem diferente")
+    random.seed(args.semente)
+
+    bot.fetch_user = buscar_usuario_falso
+    bot.tipo_armazenamento = args.armazenamento
+    with tempfile.TemporaryDirectory() as pasta:
+        await bot.iniciar_banco(os.path.join(pasta, "bench.db"))
+        try:
+            await semear(args.personagens, args.usuarios, args.amores_por_usuario)
+            cenario = Cenario(args.usuarios, args.amores_por_usuario)
+            contador = Contador()
+            if bot.banco:
+                await bot.banco.rastrear(contador)
+
+            resultado = {"parametros": vars(args), "comandos": {}}
+            for nome in COMANDOS:
+                medicao = await medir_comando(cenario, nome, args.execucoes, contador)
+                resultado["comandos"][nome] = medicao
+                if medicao["execucoes"]:
+                    print(f"{nome:<20} p50 {medicao['p50_ms']:8.3f} ms  p99 {medicao['p99_ms']:8.3f} ms  "
+                          f"{medicao['instrucoes_por_execucao']:5.1f} instruções  {medicao['commits_por_execucao']:4.1f} commits")
+
+            if bot.banco:
+                await bot.banco.rastrear(None)
+            concorrencia = await medir_concorrencia(cenario, args.concorrentes, args.operacoes_por_usuario)
+            resultado["concorrencia"] = concorrencia
+            print(f"{concorrencia['usuarios']} usuários concorrentes: {concorrencia['operacoes_por_segundo']} operações/s, "
+                  f"p50 {concorrencia['p50_ms']} ms, p99 {concorrencia['p99_ms']} ms")
+            respostas = bot.respostas
+            resultado["cache_respostas"] = {
+                "acertos": respostas.acertos, "falhas": respostas.falhas,
+                "desatualizadas": respostas.desatualizadas, "despejadas": respostas.despejadas,
+            }
+            print(f"Cache de respostas: {respostas.acertos / max(respostas.acertos + respostas.falhas, 1):.0%} de acertos, "
+                  f"{respostas.desatualizadas} desatualizadas, {respostas.despejadas} despejadas")
+        finally:
+            await bot.fechar_banco()
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,200 @@
+"""Mede o impacto de uma cópia de segurança online na latência dos comandos concorrentes.
+
+Produtores simulam comandos (um perfil lido por um leitor e um crédito de Eritos gravado pelo
+escritor) sem parar; a latência deles é medida antes e durante a cópia, que roda com a
+configuração padrão (passos com pausa, na thread de baixa prioridade), em um passo só e em uma
+thread de prioridade normal. Também confere que a cópia é um instante
+consistente (saldos batem com o extrato), que passa na verificação de integridade, que a
+restauração funciona (também pelo bot, sem contagens em memória do banco substituído) e que uma
+cópia interrompida não deixa arquivos para trás.
+
+Uso: python benchmarks/bench_copias.py [--personagens 300000] [--lancamentos 1000000] [--produtores 16]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import copias
+from banco import BancoDeDados
+from extrato import lancar
+from bot import ErosBot
+from migracoes import migrar
+from particoes import Particao
+
+
+def percentil(valores, q):
+    return sorted(valores)[min(int(len(valores) * q), len(valores) - 1)]
+
+
+async def popular(banco, personagens, lancamentos):
+    gerador = random.Random(1)
+    for inicio in range(0, personagens, 50000):
+        async with banco.transacao() as db:
+            await db.executemany("INSERT INTO personagens (nome, imagem) VALUES (?, ?)", (
+                (f"Personagem {numero}", f"https://exemplo.com/imagens/{numero:08d}/{gerador.getrandbits(64):016x}.png")
+                for numero in range(inicio, min(inicio + 50000, personagens))
+            ))
+    for inicio in range(0, lancamentos, 100000):
+        async with banco.transacao() as db:
+            await lancar(db, [(numero % 20000, 1, "coleta", None) for numero in range(inicio, min(inicio + 100000, lancamentos))])
+    async with banco.transacao() as db:
+        await db.execute("""
+            INSERT INTO moedas (usuario_id, eritos) SELECT usuario_id, SUM(delta) FROM extrato GROUP BY usuario_id
+        """)
+
+
+async def carga(banco, produtores, parar, latencias):
+    """Comandos sem parar até `parar`; cada latência vai para `latencias[fase atual]`."""
+    async def produtor(indice):
+        gerador = random.Random(indice)
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            await banco.consultar_um("""
+                SELECT p.id, p.nome, p.imagem, p.imagem_quebrada, a.usuario_id FROM personagens p
+                LEFT JOIN amores a ON a.personagem_id = p.id WHERE p.nome = ?
+            """, (f"Personagem {gerador.randrange(1000)}",))
+            usuario_id = gerador.randrange(20000)
+            async with banco.transacao() as db:
+                await db.execute("UPDATE moedas SET eritos = eritos + 1 WHERE usuario_id = ?", (usuario_id,))
+                await lancar(db, [(usuario_id, 1, "coleta", None)])
+            latencias[-1].append(time.perf_counter() - inicio)
+            await asyncio.sleep(0.002)
+
+    await asyncio.gather(*(produtor(indice) for indice in range(produtores)))
+
+
+def consistente(caminho):
+    """Confere no banco `caminho` que cada saldo é a soma do extrato do usuário."""
+    with contextlib.closing(sqlite3.connect(caminho)) as db:
+        (divergentes,) = db.execute("""
+            SELECT COUNT(*) FROM moedas m
+            WHERE m.eritos != (SELECT SUM(delta) FROM extrato e WHERE e.usuario_id = m.usuario_id)
+        """).fetchone()
+        (lancamentos,) = db.execute("SELECT COUNT(*) FROM extrato").fetchone()
+    return divergentes == 0, lancamentos
+
+
+async def restaurar_pelo_bot(pasta):
+    """Restaura pelo bot uma cópia feita antes de um casamento; retorna a contagem de amores antes e depois."""
+    diretorio = os.getcwd()
+    os.chdir(pasta)  # O bot guarda as cópias em `backups/` relativo ao diretório atual
+    bot = ErosBot()
+    bot.particao_padrao = Particao(os.path.join(pasta, "bot.db"))
+    await bot.abrir_particao(bot.particao_padrao)
+    try:
+        for nome in ("Ana", "Bia", "Carla"):
+            await bot.adicionar_personagem(nome, "https://exemplo.com/imagem.png")
+        await bot.adicionar_amor(1, "Ana")
+        await bot.adicionar_amor(1, "Bia")
+        copia = os.path.basename(await bot.copias.fazer())
+        await bot.adicionar_amor(1, "Carla")
+        antes = await bot.contar_amores(1)
+        await bot.restaurar_copia(copia)
+        return antes, await bot.contar_amores(1)
+    finally:
+        await bot.fechar_particoes()
+        os.chdir(diretorio)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--personagens", type=int, default=300000)
+    parser.add_argument("--lancamentos", type=int, default=1000000)
+    parser.add_argument("--produtores", type=int, default=16)
+    parser.add_argument("--base", type=float, default=3.0, help="Segundos de carga medidos antes de cada cópia")
+    args = parser.parse_args()
+    erros = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "eros.db")
+        pasta_copias = os.path.join(pasta, "backups")
+        banco = BancoDeDados(caminho)
+        await banco.abrir()
+        await migrar(banco)
+        await popular(banco, args.personagens, args.lancamentos)
+        print(f"Banco de {os.path.getsize(caminho) / 1024 / 1024:.0f} MB")
+
+        configuracoes = (
+            ("passos com pausa (padrão)", copias.em_segundo_plano, {}),
+            ("um passo só", copias.em_segundo_plano, {"paginas": -1, "pausa": 0}),
+            ("prioridade normal", asyncio.to_thread, {}),
+        )
+        gravados = 0  # Créditos feitos pelos produtores até o fim da cópia atual
+        for nome, executar, opcoes in configuracoes:
+            latencias = [[]]
+            parar = asyncio.Event()
+            tarefa = asyncio.create_task(carga(banco, args.produtores, parar, latencias))
+            await asyncio.sleep(args.base)
+            latencias.append([])
+            inicio = time.perf_counter()
+            destino, paginas = await executar(copias.fazer_copia, caminho, pasta_copias, **opcoes)
+            duracao = time.perf_counter() - inicio
+            parar.set()
+            await tarefa
+            antes, durante = latencias
+            gravados += len(antes) + len(durante)
+            print(f"{nome:>26}: {paginas} páginas em {duracao:.1f}s ({os.path.getsize(destino) / 1024 / 1024:.0f} MB compactada); "
+                  f"comandos antes p50 {percentil(antes, 0.5) * 1000:.1f} ms, p99 {percentil(antes, 0.99) * 1000:.1f} ms; "
+                  f"durante p50 {percentil(durante, 0.5) * 1000:.1f} ms, p99 {percentil(durante, 0.99) * 1000:.1f} ms "
+                  f"({percentil(durante, 0.99) / percentil(antes, 0.99):.2f}×)")
+
+            restaurado = os.path.join(pasta, "restaurado.db")
+            copias.descompactar(destino, restaurado)
+            copias.verificar_integridade(restaurado)
+            ok, lancamentos = consistente(restaurado)
+            os.remove(restaurado)
+            if not ok:
+                erros.append(f"{nome}: os saldos da cópia não batem com o extrato dela")
+            if not args.lancamentos <= lancamentos <= args.lancamentos + gravados:
+                erros.append(f"{nome}: a cópia tem {lancamentos} lançamentos")
+
+        # Uma cópia interrompida não deixa arquivos temporários nem uma cópia pela metade
+        copiadora = copias.CopiasDeSeguranca(caminho, pasta_copias)
+        existentes = set(os.listdir(copias.pasta_do_banco(caminho, pasta_copias)))
+        interrompida = asyncio.create_task(copiadora.fazer())
+        while not copiadora.copiadas:
+            await asyncio.sleep(0.01)
+        await copiadora.parar()
+        with contextlib.suppress(copias.CopiaCancelada):
+            await interrompida
+        if set(os.listdir(copias.pasta_do_banco(caminho, pasta_copias))) != existentes:
+            erros.append("a cópia interrompida deixou arquivos na pasta")
+
+        # Restauração: o banco volta ao instante da cópia mais recente
+        (mais_recente, _, _), *_ = copias.listar(caminho, pasta_copias)
+        preparado = copias.preparar_restauracao(caminho, mais_recente, pasta_copias)
+        with contextlib.closing(sqlite3.connect(preparado)) as db:
+            (esperados,) = db.execute("SELECT COUNT(*) FROM extrato").fetchone()
+        await banco.executar("DELETE FROM extrato")
+        await banco.fechar()
+        copias.substituir(caminho, preparado)
+        banco = BancoDeDados(caminho)
+        await banco.abrir()
+        await migrar(banco)
+        (restaurados,) = await banco.consultar_um("SELECT COUNT(*) FROM extrato")
+        await banco.fechar()
+        print(f"Restauração: {restaurados} lançamentos de volta")
+        if restaurados != esperados:
+            erros.append(f"a restauração trouxe {restaurados} lançamentos, esperados {esperados}")
+
+        antes, depois = await restaurar_pelo_bot(pasta)
+        print(f"Restauração pelo bot: {antes} amores antes, {depois} depois")
+        if (antes, depois) != (3, 2):
+            erros.append(f"a contagem de amores após a restauração pelo bot é {depois}, esperada 2")
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""Mede a vazão sustentada de escritas do escritor único, com e sem group commit.
+
+Vários produtores concorrentes creditam Eritos (upsert em `moedas` e lançamento no extrato, como o
+/coletar). Para cada configuração reporta escritas por segundo, pedidos por COMMIT e a latência de
+cada escrita até o COMMIT. Um pedido que viola o UNIQUE de `amores` no meio dos grupos deve falhar
+sozinho, sem desfazer os outros pedidos do mesmo grupo, e o mesmo vale para um pedido cancelado
+enquanto o escritor abre o savepoint dele.
+
+Uso: python benchmarks/bench_escritas.py [--produtores 64] [--escritas 20000] [--sincrono NORMAL]
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import banco as modulo_banco
+from banco import BancoDeDados
+from extrato import lancar
+from migracoes import migrar
+
+
+async def medir(caminho, produtores, escritas, maximo_grupo):
+    modulo_banco.MAXIMO_GRUPO = maximo_grupo
+    banco = BancoDeDados(caminho)
+    await banco.abrir()
+    await migrar(banco)
+    await banco.executar("INSERT INTO personagens (nome, imagem) VALUES ('Alvo', 'https://exemplo.com/a.png')")
+    await banco.executar("INSERT INTO amores (usuario_id, personagem_id) VALUES (1, 1)")
+    grupos, pedidos = banco.grupos, banco.pedidos_gravados
+    latencias = []
+    conflitos = 0
+
+    async def creditar(usuario_id):
+        async with banco.transacao() as db:
+            await db.execute("""
+                INSERT INTO moedas (usuario_id, eritos) VALUES (?, 1)
+                ON CONFLICT(usuario_id) DO UPDATE SET eritos = eritos + 1
+            """, (usuario_id,))
+            await lancar(db, [(usuario_id, 1, "coleta", None)])
+
+    async def casar_de_novo():
+        async with banco.transacao() as db:
+            await db.execute("INSERT INTO amores (usuario_id, personagem_id) VALUES (2, 1)")
+
+    async def produtor(indice):
+        nonlocal conflitos
+        for numero in range(indice, escritas, produtores):
+            inicio = time.perf_counter()
+            if numero % 1000 == 500:
+                try:
+                    await casar_de_novo()
+                except sqlite3.IntegrityError:
+                    conflitos += 1
+            else:
+                await creditar(numero % 5000)
+            latencias.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(produtor(indice) for indice in range(produtores)))
+    duracao = time.perf_counter() - inicio
+    grupos, pedidos = banco.grupos - grupos, banco.pedidos_gravados - pedidos
+    (creditos,) = await banco.consultar_um("SELECT COALESCE(SUM(eritos), 0) FROM moedas")
+    (lancamentos,) = await banco.consultar_um("SELECT COUNT(*) FROM extrato WHERE motivo = 'coleta'")
+    (amores,) = await banco.consultar_um("SELECT COUNT(*) FROM amores")
+    await banco.fechar()
+    latencias.sort()
+    return {
+        "escritas_por_segundo": escritas / duracao,
+        "pedidos_por_commit": pedidos / max(grupos, 1),
+        "p50": latencias[len(latencias) // 2],
+        "p99": latencias[int(len(latencias) * 0.99)],
+        "creditos": creditos,
+        "lancamentos": lancamentos,
+        "conflitos": conflitos,
+        "amores": amores,
+    }
+
+
+async def cancelar_no_savepoint(caminho):
+    """Cancela um pedido no meio de um grupo, durante o SAVEPOINT dele; retorna os usuários creditados."""
+    orcamento_padrao = modulo_banco.ORCAMENTO_GRUPO
+    modulo_banco.ORCAMENTO_GRUPO = 60  # Todos os pedidos abaixo no mesmo grupo
+    banco = BancoDeDados(caminho)
+    await banco.abrir()
+    try:
+        await migrar(banco)
+        dentro = asyncio.Event()
+        liberar = asyncio.Event()
+
+        async def creditar(usuario_id, segurar=False):
+            async with banco.transacao() as db:
+                await db.execute("INSERT INTO moedas (usuario_id, eritos) VALUES (?, 1)", (usuario_id,))
+                if segurar:
+                    dentro.set()
+                    await liberar.wait()
+
+        # O primeiro pedido segura o grupo aberto até os outros entrarem na fila
+        pedidos = [asyncio.create_task(creditar(1, segurar=True))]
+        await dentro.wait()
+        pedidos += [asyncio.create_task(creditar(usuario_id)) for usuario_id in (2, 3, 4)]
+        await asyncio.sleep(0)
+        vitima = pedidos[2]
+        execute = banco.escritor.execute
+        savepoints = 0
+
+        async def cancelar_no_segundo_savepoint(sql, *args, **kwargs):
+            nonlocal savepoints
+            if sql == "SAVEPOINT pedido":
+                savepoints += 1
+                if savepoints == 2:
+                    vitima.cancel()
+            return await execute(sql, *args, **kwargs)
+
+        banco.escritor.execute = cancelar_no_segundo_savepoint
+        liberar.set()
+        resultados = await asyncio.gather(*pedidos, return_exceptions=True)
+        del banco.escritor.execute
+        if not isinstance(resultados[2], asyncio.CancelledError) or any(resultados[:2] + resultados[3:]):
+            return None
+        linhas = await banco.consultar_todos("SELECT usuario_id FROM moedas ORDER BY usuario_id")
+        return [usuario_id for (usuario_id,) in linhas]
+    finally:
+        await banco.fechar()
+        modulo_banco.ORCAMENTO_GRUPO = orcamento_padrao
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--produtores", type=int, default=64)
+    parser.add_argument("--escritas", type=int, default=20000)
+    parser.add_argument("--sincrono", choices=("NORMAL", "FULL"), default="NORMAL",
+                        help="PRAGMA synchronous; com FULL cada COMMIT faz um fsync")
+    args = parser.parse_args()
+    modulo_banco.PRAGMAS = tuple(
+        f"PRAGMA synchronous = {args.sincrono}" if pragma.startswith("PRAGMA synchronous") else pragma
+        for pragma in modulo_banco.PRAGMAS
+    )
+    maximo_padrao = modulo_banco.MAXIMO_GRUPO
+    esperados = args.escritas - sum(1 for numero in range(args.escritas) if numero % 1000 == 500)
+    erros = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        for nome, maximo_grupo in (("um COMMIT por escrita", 1), ("group commit", maximo_padrao)):
+            resultado = await medir(os.path.join(pasta, f"escritas_{maximo_grupo}.db"),
+                                    args.produtores, args.escritas, maximo_grupo)
+            print(f"{nome:>22}: {resultado['escritas_por_segundo']:8.0f} escritas/s, "
+                  f"{resultado['pedidos_por_commit']:5.1f} pedidos por COMMIT, "
+                  f"p50 {resultado['p50'] * 1000:.1f} ms, p99 {resultado['p99'] * 1000:.1f} ms")
+            if resultado["creditos"] != esperados or resultado["lancamentos"] != esperados:
+                erros.append(f"{nome}: {resultado['creditos']} créditos e {resultado['lancamentos']} lançamentos, "
+                             f"esperados {esperados}")
+            if resultado["amores"] != 1 or resultado["conflitos"] != args.escritas - esperados:
+                erros.append(f"{nome}: o pedido com conflito não falhou sozinho")
+        creditados = await cancelar_no_savepoint(os.path.join(pasta, "cancelamento.db"))
+        if creditados != [1, 2, 4]:
+            erros.append(f"pedido cancelado no SAVEPOINT: creditados {creditados}, esperados [1, 2, 4]")
+    modulo_banco.MAXIMO_GRUPO = maximo_padrao
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+"""Mede o agendador de prazos dos cooldowns: atraso entre o prazo e o reset, tamanho dos lotes
+e o custo de reagendar. Também confere que verificar um cooldown não executa nenhum SQL.
+
+Uso: python benchmarks/bench_expiracoes.py [--usuarios 100000] [--janela 2]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot import ErosBot
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=100000)
+    parser.add_argument("--janela", type=float, default=2.0, help="Segundos em que os prazos vencem")
+    args = parser.parse_args()
+    erros = []
+
+    bot = ErosBot()
+    with tempfile.TemporaryDirectory() as pasta:
+        await bot.iniciar_banco(os.path.join(pasta, "expiracoes.db"))
+        try:
+            for usuario_id in range(1, args.usuarios + 1):
+                await bot.update_cooldown(usuario_id)
+
+            # Antecipa os prazos para dentro da janela, reagendando cada usuário duas vezes
+            lotes = []
+            atrasos = []
+            original = bot.cooldowns._expirar
+
+            def medir(usuarios):
+                agora = time.time()
+                atrasos.extend(agora - bot.cooldowns.obter(usuario_id).tempo for usuario_id in usuarios)
+                lotes.append(len(usuarios))
+                original(usuarios)
+            bot.cooldowns.expiracoes.ao_expirar = medir
+
+            inicio = time.perf_counter()
+            base = time.time() + 0.5
+            for usuario_id in range(1, args.usuarios + 1):
+                registro = bot.cooldowns.obter(usuario_id)
+                bot.cooldowns.definir_prazo(usuario_id, registro, base + args.janela * 2)
+                bot.cooldowns.definir_prazo(usuario_id, registro, base + args.janela * usuario_id / args.usuarios)
+            reagendamento = time.perf_counter() - inicio
+
+            consultas = []
+            bot.banco.observador = lambda sql, parametros, duracao: consultas.append(sql)
+            for usuario_id in range(1, 1001):
+                await bot.can_paquerar(usuario_id)
+            bot.banco.observador = bot.metricas.observar_consulta
+
+            await asyncio.sleep(base + args.janela + 0.2 - time.time())
+            restantes = sum(1 for usuario_id in range(1, args.usuarios + 1) if bot.cooldowns.obter(usuario_id).tentativas)
+            atrasos.sort()
+            print(f"{2 * args.usuarios} agendamentos em {reagendamento * 1000:.0f} ms "
+                  f"({reagendamento / (2 * args.usuarios) * 1e6:.2f} µs cada)")
+            print(f"{len(atrasos)} prazos vencidos em {len(lotes)} lotes (maior: {max(lotes, default=0)}); "
+                  f"atraso p50 {atrasos[len(atrasos) // 2] * 1000:.1f} ms, p99 {atrasos[int(len(atrasos) * 0.99)] * 1000:.1f} ms")
+            print(f"SQL executado ao verificar 1000 cooldowns: {len(consultas)}")
+            if consultas:
+                erros.append("verificar um cooldown executou SQL")
+            if restantes or len(atrasos) != args.usuarios:
+                erros.append(f"{restantes} usuários não tiveram as tentativas zeradas")
+        finally:
+            await bot.fechar_banco()
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
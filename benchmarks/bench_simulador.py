@@ -0,0 +1,58 @@
+"""Mede a vazão do simulador de equilíbrio (jogadores × dias por segundo) e confere as chances exatas.
+
+As chances de `chance_de_sucesso` são comparadas com a contagem de todos os pares de dados, e a
+taxa de casamentos simulada com um catálogo grande (sem disputa nem esgotamento) com a chance exata.
+
+Uso: python benchmarks/bench_simulador.py [--jogadores 1000000] [--dias 30] [--personagens 50000]
+"""
+import argparse
+import os
+import sys
+from fractions import Fraction
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import simulador
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jogadores", type=int, default=1000000)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--personagens", type=int, default=50000)
+    args = parser.parse_args()
+    erros = []
+
+    for vantagem in range(-25, 26):
+        pares = sum(1 for jogador in range(1, 21) for personagem in range(1, 21) if jogador >= personagem + vantagem)
+        if simulador.chance_de_sucesso(vantagem) != Fraction(pares, 400):
+            erros.append(f"chance exata errada para a vantagem {vantagem}")
+
+    # Catálogo realista: vantagens de -2 a +6, com a padrão (+2) mais comum
+    gerador = simulador.np.random.default_rng(1)
+    vantagens = gerador.choice(range(-2, 7), args.personagens, p=[.05, .05, .1, .1, .4, .1, .1, .05, .05])
+    for atividade in (1.0, 0.3):
+        resultado = simulador.simular(vantagens, args.jogadores, args.dias, atividade=atividade, semente=1)
+        jogadores_dia = args.jogadores * args.dias
+        print(f"atividade {atividade:.0%}: {jogadores_dia:,} jogadores × dias em {resultado.duracao:.2f}s "
+              f"({jogadores_dia / resultado.duracao / 1e6:.1f} milhões por segundo)")
+    print(resultado)
+
+    # Uma tentativa por rodada contra um catálogo muito maior que o número de acertos: a fração de
+    # jogadores que casa deve ser a chance exata
+    for vantagem in (-3, 2, 8):
+        resultado = simulador.simular([vantagem] * 10_000_000, 200000, 1, tentativas=1, semente=vantagem + 10)
+        observada = resultado.casamentos.sum() / (200000 * len(resultado.restantes))
+        esperada = float(simulador.chance_de_sucesso(vantagem))
+        print(f"vantagem {vantagem:+d}: simulada {observada:.4f}, exata {esperada:.4f}")
+        if abs(observada - esperada) > 0.005:
+            erros.append(f"taxa simulada longe da exata para a vantagem {vantagem}")
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+"""Roteiro de conformidade das implementações de `Armazenamento`, com uma comparação de desempenho.
+
+O mesmo roteiro roda contra o ArmazenamentoSQLite (em um banco temporário migrado) e o
+ArmazenamentoMemoria: personagens (nomes sem diferenciar maiúsculas, exclusão em cascata),
+amores, listagens paginadas, cooldowns, saldos com extrato, trocas (vencidas, sem saldo,
+personagem que mudou de dono), importação em lote, busca e metadados. Depois, uma sequência aleatória de operações é aplicada às duas
+implementações e cada resultado é comparado, e por fim as operações por segundo de cada uma.
+
+Uso: python benchmarks/conformidade_armazenamento.py [--operacoes 5000] [--semente 0]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import random
+import sys
+import tempfile
+import time
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from armazenamento import ArmazenamentoMemoria, ArmazenamentoSQLite
+from banco import BancoDeDados
+from migracoes import migrar
+
+IMAGEM = "https://exemplo.com/imagem.png"
+VALIDADE = 60
+
+
+@contextlib.asynccontextmanager
+async def sqlite():
+    with tempfile.TemporaryDirectory() as pasta:
+        banco = BancoDeDados(os.path.join(pasta, "conformidade.db"))
+        await banco.abrir()
+        try:
+            await migrar(banco)
+            yield ArmazenamentoSQLite(banco)
+        finally:
+            await banco.fechar()
+
+
+@contextlib.asynccontextmanager
+async def memoria():
+    yield ArmazenamentoMemoria()
+
+
+IMPLEMENTACOES = {"SQLite": sqlite, "memória": memoria}
+
+
+async def extrato_de(armazenamento, usuario_id):
+    """Deltas do extrato do usuário, em ordem."""
+    return [delta for _, _, delta, _, _ in reversed(await armazenamento.historico_eritos(usuario_id, limite=1000))]
+
+
+async def roteiro_personagens(a, conferir):
+    goku = await a.adicionar_personagem("Goku", IMAGEM)
+    conferir(goku is not None, "adicionar_personagem retorna o ID")
+    conferir(await a.adicionar_personagem("GOKU", IMAGEM) is None, "nomes repetidos em maiúsculas são recusados")
+    goku_acentuado = await a.adicionar_personagem("Gokú", IMAGEM)
+    conferir(goku_acentuado is not None, "letras acentuadas são diferentes das sem acento")
+    conferir(await a.nome_do_personagem(goku) == "Goku", "nome_do_personagem")
+    conferir(await a.nome_do_personagem(999) is None, "nome de personagem inexistente")
+    conferir(await a.personagem_disponivel(goku) == (goku, "Goku", IMAGEM), "personagem novo disponível")
+    conferir(await a.perfil_do_personagem("goku") == (goku, "Goku", IMAGEM, 0, None), "perfil sem diferenciar maiúsculas")
+    conferir(await a.vantagem_do_personagem(goku) == ("Goku", 2), "vantagem padrão")
+    conferir(await a.definir_vantagem("goku", 5), "definir_vantagem de personagem existente")
+    conferir(not await a.definir_vantagem("Vegeta", 5), "definir_vantagem de personagem inexistente")
+    conferir(await a.vantagem_do_personagem(goku) == ("Goku", 5), "vantagem definida")
+    conferir(await a.alterar_imagem("Goku", "https://exemplo.com/nova.png") == (goku, 0), "alterar_imagem")
+    conferir(await a.alterar_imagem("Vegeta", IMAGEM) is None, "alterar_imagem de personagem inexistente")
+    conferir(sorted(await a.listar_personagens()) == [("Goku", 0), ("Gokú", 0)], "listar_personagens")
+
+    conferir(await a.casar(1, "goku") == goku, "casar")
+    conferir(await a.casar(2, "Goku") is None, "personagem com dono não casa de novo")
+    conferir(await a.personagem_disponivel(goku) is None, "personagem casado fica indisponível")
+    conferir(sorted(await a.catalogo()) == sorted([(goku, "Goku", 1), (goku_acentuado, "Gokú", 0)]), "catalogo")
+    conferir(await a.dono_do_personagem("GOKU") == 1, "dono_do_personagem")
+    troca = await a.criar_troca(1, "Goku", 2, 0, VALIDADE)
+    conferir(await a.excluir_personagem("goku") == (goku, "Goku", 1), "excluir retorna ID, nome e dono")
+    conferir(await a.excluir_personagem("Goku") is None, "excluir personagem inexistente")
+    conferir(await a.amores_de(1) == [] and await a.contar_amores(1) == 0, "exclusão remove o amor")
+    conferir(await a.destinatario_da_troca(troca, VALIDADE) is None, "exclusão remove as trocas do personagem")
+    conferir(await a.adicionar_personagem("Goku", IMAGEM) is not None, "nome excluído pode voltar")
+
+
+async def roteiro_amores(a, conferir):
+    nomes = ["banana", "Abacaxi", "cereja", "Damasco", "ameixa", "_kiwi", "Zimbro"]
+    for nome in nomes:
+        await a.adicionar_personagem(nome, IMAGEM)
+    for nome in ("cereja", "Abacaxi", "Zimbro"):
+        await a.casar(7, nome)
+    conferir(await a.amores_de(7) == ["Abacaxi", "cereja", "Zimbro"], "amores_de em ordem alfabética")
+    conferir(await a.contar_amores(7) == 3, "contar_amores")
+    conferir(await a.divorciar(8, "cereja") is None, "só o dono se divorcia")
+    conferir(await a.divorciar(7, "Cereja") is not None, "divorciar")
+    conferir(await a.personagem_disponivel(await a.divorciar(7, "zimbro") or 0) is not None, "divorciado volta a ficar disponível")
+    conferir(await a.amores_de(7) == ["Abacaxi"], "amores depois do divórcio")
+
+    # A ordem é a do COLLATE NOCASE: `_` fica entre as maiúsculas e as minúsculas
+    esperada = sorted(nomes, key=str.lower)
+    listagem = a.listagem_personagens()
+    conferir(await listagem.contar() == len(nomes), "contar da listagem")
+    primeiras = await listagem.apos(None, 3)
+    conferir([nome for nome, _, _ in primeiras] == esperada[:3], "primeira página")
+    conferir([marcado for nome, marcado, _ in primeiras if nome == "Abacaxi"] == [1], "marcador de conquistado")
+    seguintes = await listagem.apos(primeiras[-1][0], 3)
+    conferir([nome for nome, _, _ in seguintes] == esperada[3:6], "página seguinte")
+    anteriores = await listagem.antes(seguintes[0][0], 2)
+    conferir([nome for nome, _, _ in anteriores] == esperada[1:3], "página anterior")
+    conferir([nome for nome, _, _ in await listagem.antes(None, 2)] == esperada[-2:], "última página")
+    conferir([nome for nome, _, _ in await listagem.na_posicao(2, 2)] == esperada[2:4], "salto de página")
+    conferir(await listagem.posicao_de("c") == sum(nome.lower() < "c" for nome in nomes), "posicao_de")
+    amores = a.listagem_amores(7)
+    conferir(await amores.apos(None, 10) == [("Abacaxi", 1, (await a.perfil_do_personagem("Abacaxi"))[0])], "listagem de amores")
+    conferir(await a.listagem_amores(8).contar() == 0, "listagem de quem não tem amores")
+
+    async def contar():
+        return 42
+    conferir(await a.listagem_personagens(contar=contar).contar() == 42, "contador externo da listagem")
+
+
+async def roteiro_cooldowns(a, conferir):
+    geracao, linhas = await a.carregar_cooldowns()
+    conferir((geracao, linhas) == (0, []), "cooldowns vazios")
+    agora = int(time.time())
+    await a.gravar_cooldowns([(1, 2, agora, 0, agora - 10), (2, 0, 0, agora, 0)], 0)
+    await a.gravar_cooldowns([(1, 3, agora + 5, 0, agora - 10)], 0)
+    _, linhas = await a.carregar_cooldowns()
+    conferir(sorted(linhas) == [(1, 3, agora + 5, 0, agora - 10), (2, 0, 0, agora, 0)], "cooldowns gravados e sobrescritos")
+
+
+async def roteiro_eritos(a, conferir):
+    conferir(await a.eritos_de(1) == 0, "saldo de quem nunca ganhou")
+    conferir(await a.adicionar_eritos(1, 10, "coleta") == 10, "adicionar_eritos retorna o saldo")
+    conferir(await a.adicionar_eritos(1, 5, "coleta") == 15, "créditos acumulam")
+    conferir(await a.remover_eritos(1, 20, "ajuste") is None, "remover além do saldo")
+    conferir(await a.remover_eritos(1, 15, "ajuste") == 0, "remover o saldo inteiro")
+    conferir(await a.remover_eritos(2, 0, "ajuste") == 0, "remover zero de quem não tem saldo")
+    conferir(await a.remover_eritos(2, 1, "ajuste") is None, "remover de quem não tem saldo")
+    conferir(sorted(await a.saldos()) == [(1, 0)], "saldos")
+    conferir(await extrato_de(a, 1) == [10, 5, -15], "extrato dos lançamentos")
+    conferir(await extrato_de(a, 2) == [], "nada no extrato sem alteração de saldo")
+    await a.adicionar_eritos(1, 7, "coleta")
+    await a.adicionar_eritos(2, 3, "coleta")
+    recentes = await a.historico_eritos(1, limite=2)
+    conferir([(delta, motivo) for _, _, delta, motivo, _ in recentes] == [(7, "coleta"), (-15, "ajuste")], "historico_eritos do mais recente")
+    anteriores = await a.historico_eritos(1, recentes[-1][0], 10)
+    conferir([delta for _, _, delta, _, _ in anteriores] == [5, 10], "historico_eritos antes de um lançamento")
+    conferir(await a.recalcular_eritos(1) == await a.eritos_de(1) == 7, "recalcular_eritos")
+
+
+async def roteiro_trocas(a, conferir):
+    for nome in ("Goku", "Vegeta", "Bulma"):
+        await a.adicionar_personagem(nome, IMAGEM)
+        await a.casar(1, nome)
+    await a.adicionar_eritos(2, 100, "coleta")
+    conferir(await a.criar_troca(1, "Freeza", 2, 0, VALIDADE) is None, "troca de personagem inexistente")
+
+    troca = await a.criar_troca(1, "goku", 2, 60, VALIDADE)
+    conferir(await a.destinatario_da_troca(troca, VALIDADE) == 2, "destinatario_da_troca")
+    goku = (await a.perfil_do_personagem("Goku"))[0]
+    conferir(await a.confirmar_troca(troca) == (1, 2, goku, 60, 40, 60), "confirmar_troca")
+    conferir(await a.dono_do_personagem("Goku") == 2 and await a.amores_de(1) == ["Bulma", "Vegeta"], "personagem transferido")
+    conferir(await a.confirmar_troca(troca) is None, "troca confirmada é apagada")
+    conferir(await extrato_de(a, 2) == [100, -60] and await extrato_de(a, 1) == [60], "extrato da troca")
+
+    cara = await a.criar_troca(1, "Vegeta", 2, 50, VALIDADE)
+    conferir(await a.confirmar_troca(cara) is None, "troca sem saldo do destinatário")
+    conferir(await a.dono_do_personagem("Vegeta") == 1 and await a.eritos_de(2) == 40, "troca sem saldo não altera nada")
+
+    primeira, segunda = await a.criar_troca(1, "Bulma", 2, 0, VALIDADE), await a.criar_troca(1, "Bulma", 3, 0, VALIDADE)
+    conferir(await a.confirmar_troca(primeira) is not None, "troca grátis")
+    conferir(await a.confirmar_troca(segunda) is None, "personagem que já mudou de dono não é trocado de novo")
+    conferir(await a.dono_do_personagem("Bulma") == 2, "dono depois da troca concorrente")
+
+    await a.recusar_troca(cara)
+    conferir(await a.destinatario_da_troca(cara, VALIDADE) is None, "recusar_troca apaga a proposta")
+
+    vencida = await a.criar_troca(1, "Vegeta", 2, 0, VALIDADE)
+    with mock.patch("time.time", return_value=time.time() + VALIDADE + 1):
+        conferir(await a.destinatario_da_troca(vencida, VALIDADE) is None, "troca vencida não aparece")
+        nova = await a.criar_troca(1, "Vegeta", 3, 0, VALIDADE)
+    conferir(await a.destinatario_da_troca(vencida, VALIDADE * 10) is None, "criar_troca descarta as vencidas")
+    conferir(await a.destinatario_da_troca(nova, VALIDADE) == 3, "troca nova continua")
+
+
+async def roteiro_catalogo(a, conferir):
+    lote = [("Goku", IMAGEM, 3), ("Vegeta", IMAGEM, 2), ("goku", IMAGEM, 9), ("Gohan", IMAGEM, 1), ("Bulma", IMAGEM, 4)]
+    conferir(await a.adicionar_personagens(lote) == 4, "adicionar_personagens ignora nomes repetidos")
+    conferir(await a.adicionar_personagens([("VEGETA", IMAGEM, 2)]) == 0, "adicionar_personagens com nome existente")
+    primeiros = await a.personagens_apos(0, 3)
+    conferir([(nome, vantagem) for _, nome, _, vantagem in primeiros] == [("Goku", 3), ("Vegeta", 2), ("Gohan", 1)], "personagens_apos em ordem de ID")
+    conferir([nome for _, nome, _, _ in await a.personagens_apos(primeiros[-1][0], 3)] == ["Bulma"], "personagens_apos a partir de um ID")
+    await a.casar(1, "Gohan")
+    conferir(sorted(await a.vantagens()) == [2, 3, 4], "vantagens dos disponíveis")
+    conferir(sorted(await a.vantagens(todos=True)) == [1, 2, 3, 4], "vantagens de todos")
+
+    conferir([nome for _, nome, _ in await a.buscar_personagens("goku")][:1] == ["Goku"], "busca pelo nome exato")
+    conferir("Vegeta" in [nome for _, nome, _ in await a.buscar_personagens("Vegetta")], "busca com erro de digitação")
+    conferir(sorted(nome for _, nome, _ in await a.buscar_personagens("go")) == ["Gohan", "Goku"], "busca por prefixo curto")
+    conferir(await a.buscar_personagens("Gohan", "disponiveis") == [], "filtro de disponíveis")
+    conferir([dono for _, _, dono in await a.buscar_personagens("Gohan", "meus", 1)] == [1], "filtro dos amores do usuário")
+    conferir(await a.buscar_personagens("Gohan", "meus", 2) == [], "filtro dos amores de outro usuário")
+    conferir(await a.buscar_personagens("   ") == [], "busca vazia")
+
+    conferir(await a.metadado("assinatura") is None, "metadado inexistente")
+    await a.definir_metadado("assinatura", "a")
+    await a.definir_metadado("assinatura", "b")
+    conferir(await a.metadado("assinatura") == "b", "definir_metadado substitui o valor")
+
+
+ROTEIROS = (roteiro_personagens, roteiro_amores, roteiro_cooldowns, roteiro_eritos, roteiro_trocas, roteiro_catalogo)
+
+
+def operacoes_aleatorias(semente, quantidade):
+    """Sequência de `(método, argumentos)` sobre poucos nomes e usuários, para haver conflitos."""
+    gerador = random.Random(semente)
+    nomes = [f"Personagem {numero}" for numero in range(40)]
+    trocas = list(range(1, quantidade + 1))
+    for _ in range(quantidade):
+        nome = gerador.choice(nomes)
+        if gerador.random() < 0.5:
+            nome = nome.upper()
+        usuario, outro = gerador.randrange(1, 10), gerador.randrange(1, 10)
+        yield gerador.choice((
+            ("adicionar_personagem", (nome, IMAGEM)),
+            ("adicionar_personagem", (nome, IMAGEM)),
+            ("excluir_personagem", (nome,)),
+            ("casar", (usuario, nome)),
+            ("casar", (usuario, nome)),
+            ("divorciar", (usuario, nome)),
+            ("perfil_do_personagem", (nome,)),
+            ("dono_do_personagem", (nome,)),
+            ("amores_de", (usuario,)),
+            ("contar_amores", (usuario,)),
+            ("adicionar_eritos", (usuario, gerador.randrange(0, 50), "coleta")),
+            ("remover_eritos", (usuario, gerador.randrange(0, 50), "ajuste")),
+            ("eritos_de", (usuario,)),
+            ("criar_troca", (usuario, nome, outro, gerador.randrange(0, 60), VALIDADE)),
+            ("criar_troca", (usuario, nome, outro, gerador.randrange(0, 60), VALIDADE)),
+            ("confirmar_troca", (gerador.choice(trocas[:max(1, len(trocas) // 8)]),)),
+            ("recusar_troca", (gerador.choice(trocas[:max(1, len(trocas) // 8)]),)),
+        ))
+
+
+# Posição do ID do personagem no resultado de cada método; os IDs são comparados pela ordem de criação
+POSICAO_DO_ID = {"adicionar_personagem": None, "casar": None, "divorciar": None,
+                 "excluir_personagem": 0, "perfil_do_personagem": 0, "confirmar_troca": 2}
+
+
+async def executar(armazenamento, operacoes):
+    """Resultados das operações, com os IDs de personagem trocados pela ordem de criação.
+
+    Os IDs são opacos: o SQLite, por exemplo, gasta um ID em cada nome repetido recusado."""
+    ordem = {}
+    resultados = []
+    for metodo, argumentos in operacoes:
+        resultado = await getattr(armazenamento, metodo)(*argumentos)
+        if metodo == "adicionar_personagem" and resultado is not None:
+            ordem[resultado] = len(ordem)
+        if metodo in POSICAO_DO_ID and resultado is not None:
+            posicao = POSICAO_DO_ID[metodo]
+            resultado = ordem[resultado] if posicao is None else (*resultado[:posicao], ordem[resultado[posicao]], *resultado[posicao + 1:])
+        resultados.append(resultado)
+    catalogo = sorted((ordem[personagem_id], nome, indisponivel) for personagem_id, nome, indisponivel in await armazenamento.catalogo())
+    resultados.append((catalogo, sorted(await armazenamento.saldos()),
+                       [await armazenamento.amores_de(usuario) for usuario in range(1, 10)]))
+    return resultados
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operacoes", type=int, default=5000)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+    erros = []
+
+    for nome, criar in IMPLEMENTACOES.items():
+        for roteiro in ROTEIROS:
+            def conferir(condicao, descricao):
+                if not condicao:
+                    erros.append(f"{nome}, {roteiro.__name__}: {descricao}")
+            async with criar() as armazenamento:
+                await roteiro(armazenamento, conferir)
+        print(f"{nome:>8}: {len(ROTEIROS)} roteiros executados")
+
+    # As duas implementações devem dar os mesmos resultados para a mesma sequência de operações
+    operacoes = list(operacoes_aleatorias(args.semente, args.operacoes))
+    resultados = {}
+    for nome, criar in IMPLEMENTACOES.items():
+        async with criar() as armazenamento:
+            inicio = time.perf_counter()
+            resultados[nome] = await executar(armazenamento, operacoes)
+            duracao = time.perf_counter() - inicio
+        print(f"{nome:>8}: {len(operacoes)} operações aleatórias em {duracao:.2f}s ({len(operacoes) / duracao:,.0f} operações/s)")
+    esperados, obtidos = resultados.values()
+    for (metodo, argumentos), esperado, obtido in zip(operacoes + [("estado final", ())], esperados, obtidos):
+        if esperado != obtido:
+            erros.append(f"{metodo}{argumentos}: SQLite retornou {esperado!r}, memória {obtido!r}")
+            break
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
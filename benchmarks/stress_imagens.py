@@ -0,0 +1,128 @@
+"""Verifica o VerificadorImagens contra um servidor HTTP local que simula imagens boas, quebradas e lentas.
+
+Confere o status gravado de cada caso, o limite de requisições simultâneas, a ordem
+(mais antigas primeiro) e que personagens com imagem quebrada saem do sorteio.
+
+Uso: python benchmarks/stress_imagens.py [--personagens 300]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import imagens
+from bot import ErosBot
+
+
+class ServidorImagens:
+    """Servidor local com rotas para cada tipo de resposta, contando as requisições simultâneas."""
+
+    def __init__(self):
+        self.simultaneas = 0
+        self.maximo_simultaneas = 0
+        self.requisicoes = 0
+
+    async def _atender(self, requisicao):
+        self.requisicoes += 1
+        self.simultaneas += 1
+        self.maximo_simultaneas = max(self.maximo_simultaneas, self.simultaneas)
+        tipo = requisicao.match_info["tipo"]
+        try:
+            await asyncio.sleep(0.01)
+            if tipo == "lenta":
+                await asyncio.sleep(imagens.TEMPO_LIMITE * 0.8)
+        finally:
+            self.simultaneas -= 1
+        if tipo == "boa":
+            return web.Response(body=b"\x89PNG", content_type="image/png")
+        if tipo == "html":
+            return web.Response(text="<html></html>", content_type="text/html")
+        if tipo == "sem_head":
+            if requisicao.method == "HEAD":
+                return web.Response(status=405)
+            return web.Response(body=b"GIF89a", content_type="image/gif")
+        if tipo == "lenta":
+            # O cliente já desistiu; a contagem acima só considera o tempo antes do limite dele
+            await asyncio.sleep(imagens.TEMPO_LIMITE)
+        return web.Response(status=404)
+
+    async def iniciar(self):
+        app = web.Application()
+        app.router.add_route("*", "/{tipo}/{numero}", self._atender)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        porta = site._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{porta}"
+
+    async def parar(self):
+        await self._runner.cleanup()
+
+
+ESPERADO = {"boa": (200, False), "html": (200, True), "sem_head": (200, False), "ausente": (404, True), "lenta": (0, True)}
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--personagens", type=int, default=300)
+    argumentos = parser.parse_args()
+
+    imagens.TEMPO_LIMITE = 1  # Não espera 10 s pela rota lenta
+    servidor = ServidorImagens()
+    base = await servidor.iniciar()
+    bot = ErosBot()
+    await bot.iniciar_banco(os.path.join(tempfile.mkdtemp(), "imagens.db"))
+    tipos = list(ESPERADO)
+    async with bot.banco.transacao() as db:
+        await db.executemany("INSERT INTO personagens (nome, imagem) VALUES (?, ?)",
+                             [(f"P{i}", f"{base}/{tipos[i % len(tipos)]}/{i}") for i in range(argumentos.personagens)])
+    await bot.carregar_indices()
+
+    verificador = imagens.VerificadorImagens(bot.banco, bot.imagem_verificada)
+    verificador.abrir()  # Sem a tarefa periódica: os ciclos são disparados abaixo
+    try:
+        inicio = time.perf_counter()
+        primeiro_lote = await verificador.verificar_lote(argumentos.personagens // 2)
+        restante = await verificador.verificar_lote(argumentos.personagens)
+        duracao = time.perf_counter() - inicio
+
+        # O segundo lote começa pelas imagens nunca verificadas
+        ids_primeiro = {linha[4] for linha in primeiro_lote}
+        ids_restante = [linha[4] for linha in restante]
+        assert set(ids_restante[:argumentos.personagens - len(ids_primeiro)]).isdisjoint(ids_primeiro)
+
+        falhas = 0
+        for nome, imagem, status, quebrada in await bot.banco.consultar_todos(
+                "SELECT nome, imagem, imagem_status, imagem_quebrada FROM personagens"):
+            tipo = imagem.rsplit("/", 2)[1]
+            if (status, bool(quebrada)) != ESPERADO[tipo]:
+                falhas += 1
+                print(f"{nome} ({tipo}): status {status}, quebrada {quebrada}")
+            if bool(quebrada) == ((int(nome[1:]) + 1 in bot.disponiveis)):
+                falhas += 1
+                print(f"{nome} ({tipo}): índice de sorteio desatualizado")
+        for _ in range(200):
+            sorteado = await bot.sortear_personagem()
+            if "/boa/" not in sorteado[2] and "/sem_head/" not in sorteado[2]:
+                falhas += 1
+                print(f"Sorteado com imagem quebrada: {sorteado}")
+                break
+
+        print(f"{servidor.requisicoes} requisições em {duracao:.2f}s, no máximo {servidor.maximo_simultaneas} simultâneas "
+              f"(limite {imagens.CONCORRENCIA})")
+        assert servidor.maximo_simultaneas <= imagens.CONCORRENCIA
+        print("OK" if not falhas else f"FALHOU: {falhas} problemas")
+    finally:
+        await verificador.parar()
+        await bot.fechar_banco()
+        await servidor.parar()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+"""Reseta tabelas grandes em segundo plano enquanto outros comandos gravam no banco.
+
+Mede a maior espera do escritor durante o reset (o que um comando sentiria), confere que
+créditos feitos durante o reset são mantidos, interrompe um reset de cooldowns no meio
+e verifica que ele é retomado ao reabrir o banco, sem apagar o que mudou depois do pedido.
+
+Uso: python benchmarks/stress_resets.py [--usuarios 20000] [--amores 50000]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import tarefas
+from bot import ErosBot
+from particoes import Particao
+
+BASE_ID = 10 ** 17  # IDs no formato dos do Discord, espalhados como na prática
+
+
+async def abrir(caminho):
+    bot = ErosBot()
+    bot.particao_padrao = Particao(caminho)
+    await bot.abrir_particao(bot.particao_padrao)
+    return bot
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--usuarios", type=int, default=20000)
+    parser.add_argument("--amores", type=int, default=50000)
+    args = parser.parse_args()
+    erros = []
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, "resets.db")
+        bot = await abrir(caminho)
+        agora = int(time.time())
+        async with bot.banco.transacao() as db:
+            await db.executemany("INSERT INTO personagens (nome, imagem) VALUES (?, 'https://exemplo.com/imagem.png')",
+                                 ((f"Personagem {i}",) for i in range(args.amores)))
+            await db.executemany("INSERT INTO amores (usuario_id, personagem_id) VALUES (?, ?)",
+                                 ((BASE_ID + i % args.usuarios, i + 1) for i in range(args.amores)))
+            await db.executemany("INSERT INTO moedas (usuario_id, eritos) VALUES (?, 100)",
+                                 ((BASE_ID + i,) for i in range(args.usuarios)))
+            await db.executemany("INSERT INTO extrato (ts, usuario_id, delta, motivo) VALUES (?, ?, 100, 'ajuste')",
+                                 ((agora, BASE_ID + i) for i in range(args.usuarios)))
+            await db.executemany("INSERT INTO cooldowns (usuario_id, tentativas, ultimo_coletar) VALUES (?, 3, '2020-01-01T00:00:00')",
+                                 ((BASE_ID + i,) for i in range(args.usuarios)))
+        await bot.carregar_indices()
+        await bot.cooldowns.carregar()
+
+        # Reset de amores e Eritos com créditos concorrentes a usuários do fim da tabela
+        inicio = time.perf_counter()
+        ids = await bot.tarefas.criar(["amores", "moedas"])
+        esperas = []
+        ultimo_usuario = BASE_ID + args.usuarios - 1
+        while not await bot.tarefas.aguardar(ids, 0.01):
+            antes = time.perf_counter()
+            await bot.adicionar_eritos(ultimo_usuario, 1, "coleta")
+            esperas.append(time.perf_counter() - antes)
+        duracao = time.perf_counter() - inicio
+        esperas.sort()
+        print(f"Reset de {args.amores} amores e {args.usuarios} saldos em {duracao:.2f}s; "
+              f"{len(esperas)} créditos concorrentes, espera p99 {esperas[int(len(esperas) * 0.99)] * 1000:.1f} ms, "
+              f"máxima {esperas[-1] * 1000:.1f} ms")
+        (restantes,) = await bot.banco.consultar_um("SELECT COUNT(*) FROM amores")
+        (total,) = await bot.banco.consultar_um("SELECT SUM(eritos) FROM moedas")
+        if restantes:
+            erros.append(f"{restantes} amores sobraram após o reset")
+        if total != len(esperas) or await bot.obter_eritos(ultimo_usuario) != len(esperas):
+            erros.append(f"os créditos feitos durante o reset não foram mantidos (total {total}, esperado {len(esperas)})")
+        if await bot.extrato.recalcular(ultimo_usuario) != len(esperas):
+            erros.append("o extrato divergiu do saldo após o reset")
+        if len(bot.disponiveis) != args.amores:
+            erros.append("o índice de personagens disponíveis não foi atualizado")
+
+        # Reset de cooldowns interrompido depois do primeiro bloco e retomado ao reabrir
+        ids = await bot.cooldowns.resetar_todos(bot.tarefas)
+        bot.cooldowns.alterar(ultimo_usuario).tentativas = 1  # Posterior ao reset: deve sobreviver
+        while bot.tarefas.progresso(ids)[0] < tarefas.TAMANHO_BLOCO:
+            await asyncio.sleep(0.001)
+        await bot.fechar_particoes()
+
+        bot = await abrir(caminho)
+        (processadas,) = await bot.banco.consultar_um("SELECT processadas FROM tarefas WHERE id = ?", ids)
+        await bot.tarefas.aguardar(ids)
+        await bot.cooldowns.descarregar()
+        print(f"Reset de cooldowns interrompido após {processadas} de {args.usuarios} linhas e retomado")
+        (sobraram,) = await bot.banco.consultar_um("SELECT COUNT(*) FROM cooldowns WHERE tentativas != 0")
+        if sobraram != 1 or bot.cooldowns.obter(ultimo_usuario) is None:
+            erros.append(f"o reset retomado deixou {sobraram} cooldowns em vez de só o posterior ao pedido")
+        await bot.fechar_particoes()
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK: resets em blocos, sem perder alterações concorrentes e retomados após o reinício")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,95 @@
+"""Aceita muitas trocas conflitantes ao mesmo tempo e verifica que nada é gasto em dobro ou perdido.
+
+Cada personagem é oferecido pelo dono a vários destinatários, e cada destinatário recebe
+mais ofertas do que consegue pagar. Todas as aceitações rodam concorrentemente; ao final
+o total de Eritos deve ser o mesmo, nenhum saldo pode ficar negativo e todo personagem
+deve continuar com exatamente um dono, com o ranking em memória igual ao banco. O extrato
+também é conferido: a soma dos lançamentos e o recálculo a partir da fotografia (tirada
+antes das trocas) devem bater com o saldo de cada usuário.
+
+Uso: python benchmarks/stress_trocas.py [--personagens 200] [--ofertas-por-personagem 5]
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bot import bot
+from extrato import Extrato
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--personagens", type=int, default=200)
+    parser.add_argument("--usuarios", type=int, default=50)
+    parser.add_argument("--ofertas-por-personagem", type=int, default=5)
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+    aleatorio = random.Random(args.semente)
+
+    with tempfile.TemporaryDirectory() as pasta:
+        await bot.iniciar_banco(os.path.join(pasta, "stress.db"))
+        bot.extrato = Extrato(bot.banco)
+        try:
+            usuarios = list(range(1, args.usuarios + 1))
+            for usuario_id in usuarios:
+                await bot.adicionar_eritos(usuario_id, aleatorio.randint(0, 300), "ajuste")
+            await bot.extrato.fotografar()
+
+            ofertas = []
+            for i in range(args.personagens):
+                nome = f"Personagem {i}"
+                dono = aleatorio.choice(usuarios)
+                await bot.adicionar_personagem(nome, "https://exemplo.com/imagem.png")
+                await bot.adicionar_amor(dono, nome)
+                destinatarios = aleatorio.sample([u for u in usuarios if u != dono], args.ofertas_por_personagem)
+                for destinatario in destinatarios:
+                    ofertas.append(await bot.criar_troca(dono, nome, destinatario, aleatorio.randint(0, 150)))
+
+            total_antes = (await bot.banco.consultar_um("SELECT SUM(eritos) FROM moedas"))[0]
+            aleatorio.shuffle(ofertas)
+
+            inicio = time.perf_counter()
+            resultados = await asyncio.gather(*(bot.confirmar_troca(troca_id) for troca_id in ofertas))
+            duracao = time.perf_counter() - inicio
+
+            total_depois = (await bot.banco.consultar_um("SELECT SUM(eritos) FROM moedas"))[0]
+            negativos = (await bot.banco.consultar_um("SELECT COUNT(*) FROM moedas WHERE eritos < 0"))[0]
+            donos = await bot.banco.consultar_todos("SELECT personagem_id, COUNT(*) FROM amores GROUP BY personagem_id")
+            saldos = await bot.banco.consultar_todos("SELECT usuario_id, eritos FROM moedas")
+            somas_extrato = dict(await bot.banco.consultar_todos("SELECT usuario_id, SUM(delta) FROM extrato GROUP BY usuario_id"))
+            recalculados = {usuario_id: await bot.extrato.recalcular(usuario_id) for usuario_id, _ in saldos}
+            aceitas = sum(resultados)
+
+            print(f"{len(ofertas)} aceitações concorrentes em {duracao:.3f}s: {aceitas} confirmadas, {len(ofertas) - aceitas} rejeitadas")
+            erros = []
+            if total_antes != total_depois:
+                erros.append(f"total de Eritos mudou de {total_antes} para {total_depois}")
+            if negativos:
+                erros.append(f"{negativos} saldos negativos")
+            if len(donos) != args.personagens or any(quantidade != 1 for _, quantidade in donos):
+                erros.append("algum personagem ficou sem dono ou com mais de um dono")
+            if any(bot.ranking.saldo(usuario_id) != eritos for usuario_id, eritos in saldos):
+                erros.append("o ranking em memória divergiu dos saldos no banco")
+            if any(somas_extrato.get(usuario_id, 0) != eritos for usuario_id, eritos in saldos):
+                erros.append("a soma do extrato divergiu dos saldos no banco")
+            if any(recalculados[usuario_id] != eritos for usuario_id, eritos in saldos):
+                erros.append("o saldo recalculado pela fotografia divergiu dos saldos no banco")
+            if aceitas > args.personagens:
+                erros.append("um mesmo personagem foi transferido mais de uma vez")
+        finally:
+            await bot.fechar_banco()
+
+    if erros:
+        for erro in erros:
+            print(f"FALHOU: {erro}")
+        sys.exit(1)
+    print("OK: nenhum gasto em dobro e nenhum personagem perdido")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,360 +1,764 @@
 import discord
+import asyncio
+import busca
+import contextlib
+import copias
+import hashlib
+import io
+import json
+import logging
+import os
 import random
-import aiosqlite
+import tempfile
+import time
+import extrato
+import importacao
+import simulador
 from discord import app_commands
-from datetime import datetime, timedelta
+from datetime import timedelta
+from typing import Literal
 from discord.ui import Button, View
+from armazenamento import ArmazenamentoMemoria, ArmazenamentoSQLite
+from banco import BancoDeDados
+from caches import CacheNomes, MarcasComValidade
+from cooldowns import CacheCooldowns
+from extrato import Extrato
+from imagens import VerificadorImagens
+from metricas import ArvoreInstrumentada, ItemDinamicoInstrumentado, Metricas, ModalInstrumentado
+from migracoes import migrar
+from particoes import DaParticao, Particao, RoteiaParticao, particao_atual
+from tarefas import TarefasEmLote, TarefasImediatas
+
+# Marco zero do relatório de inicialização
+INICIO_PROCESSO = time.perf_counter()
+
+log = logging.getLogger(__name__)
 
 # Defina seu ID de usuário aqui
 SEU_ID = 0  # Substitua pelo seu ID real
 
-class ErosBot(discord.Client):
-    def __init__(self):
-        intents = discord.Intents.all()
-        super().__init__(intents=intents)
-        self.tree = app_commands.CommandTree(self)
+# Arquivo do banco de dados SQLite
+CAMINHO_BANCO = "eros.db"
+
+# Onde ficam personagens, amores, Eritos, cooldowns e trocas: "sqlite" (no banco acima) ou "memoria"
+# (só enquanto o bot estiver ligado, para benchmarks e servidores que não precisam guardar nada).
+# Sem o banco, não há cópias de segurança, verificação das imagens nem fotografias do extrato.
+ARMAZENAMENTO = "sqlite"
+ARMAZENAMENTOS = ("sqlite", "memoria")
+
+# Com True, cada servidor tem seu próprio banco (personagens, amores, Eritos, cooldowns e trocas),
+# aberto no primeiro uso; o banco principal continua guardando os metadados e o uso fora de servidores
+PARTICIONAR_POR_SERVIDOR = False
+CAMINHO_BANCO_SERVIDOR = "eros_{}.db"
+
+# Com True, o bot se conecta ao gateway com vários shards (AutoShardedClient). Para dividir os
+# shards entre processos, defina quais shards este processo atende e o total de shards.
+USAR_SHARDS = False
+SHARDS_DESTE_PROCESSO = None  # Ex.: [0, 1]
+TOTAL_SHARDS = None  # Ex.: 4
+
+# Duração dos cooldowns de paquera, casamento e coleta (18 horas)
+COOLDOWN_SEGUNDOS = 18 * 60 * 60
+
+# Tentativas de /paquerar por janela de cooldown
+LIMITE_TENTATIVAS = 5  # Limite de tentativas aumentado para 5
+
+# Com True, quem esgotou as tentativas recebe uma mensagem direta quando pode paquerar de novo
+AVISAR_FIM_DO_COOLDOWN = False
+
+# Por quanto tempo o botão de um /paquerar e uma proposta de troca continuam valendo
+VALIDADE_FLERTE = 3 * 60
+VALIDADE_TROCA = 7 * 24 * 60 * 60
+
+# Itens por página nas listas paginadas
+ITENS_POR_PAGINA = 15
+
+# Intervalo mínimo, em segundos, entre as atualizações da mensagem de progresso de um reset
+INTERVALO_PROGRESSO = 3
+
+# Limite de jogadores × dias de um /simular (cerca de 1 segundo por 50 milhões)
+LIMITE_SIMULACAO = 50_000_000
+
+class ArvoreEros(RoteiaParticao, ArvoreInstrumentada):
+    """Árvore de comandos do bot: mede cada comando e o executa na partição do servidor."""
+
+
+class BotaoEros(RoteiaParticao, ItemDinamicoInstrumentado):
+    """Base dos botões persistentes: o estado vem do custom_id e do banco, não de objetos em memória,
+    então os botões continuam funcionando depois de um reinício."""
+
+
+def view_persistente(*itens):
+    """View só com botões persistentes; o discord.py não guarda nenhum objeto por mensagem para ela."""
+    view = discord.ui.View(timeout=None)
+    for item in itens:
+        view.add_item(item)
+    return view
+
+
+class ErosBot(discord.AutoShardedClient if USAR_SHARDS else discord.Client):
+    # Estado de cada partição; veja `particao`
+    banco = DaParticao()
+    armazenamento = DaParticao()
+    cooldowns = DaParticao()
+    verificador_imagens = DaParticao()
+    extrato = DaParticao()
+    tarefas = DaParticao()
+    copias = DaParticao()
+    disponiveis = DaParticao()
+    nomes = DaParticao()
+    ranking = DaParticao()
+    contagem_amores = DaParticao()
+    respostas = DaParticao()
+
+    def __init__(self, armazenamento=ARMAZENAMENTO):
+        if armazenamento not in ARMAZENAMENTOS:
+            raise ValueError(f"Armazenamento desconhecido: {armazenamento!r} (use {' ou '.join(ARMAZENAMENTOS)})")
+        self.tipo_armazenamento = armazenamento  # Vale para as partições abertas depois
+        # Os comandos de barra não dependem de intents privilegiadas nem do cache de membros;
+        # os nomes exibidos no /rank vêm de `resolver_nomes`
+        intents = discord.Intents.none()
+        intents.guilds = True
+        opcoes = {"shard_ids": SHARDS_DESTE_PROCESSO, "shard_count": TOTAL_SHARDS} if USAR_SHARDS else {}
+        super().__init__(intents=intents, member_cache_flags=discord.MemberCacheFlags.none(),
+                         chunk_guilds_at_startup=False, **opcoes)
+        self.tree = ArvoreEros(self)  # Mede cada comando; veja /metricas
+        self.metricas = Metricas()
+        self.particao_padrao = Particao(CAMINHO_BANCO)
+        self.particoes = {}  # Partições abertas, por ID do servidor (com PARTICIONAR_POR_SERVIDOR)
+        self._trava_particoes = asyncio.Lock()
+        self.nomes_usuarios = CacheNomes()
+        # Mensagens de /paquerar já usadas, lembradas enquanto o botão delas ainda valeria
+        self.flertes_usados = MarcasComValidade(VALIDADE_FLERTE)
+        self.tempos_inicializacao = {}  # Segundos de cada etapa, desde o início do processo
+        self._tarefas_avulsas = set()  # Progresso dos resets e avisos por mensagem direta, em segundo plano
+
+    @property
+    def particao(self):
+        """Partição da interação em andamento (a padrão quando não há particionamento)."""
+        return particao_atual.get() or self.particao_padrao
+
+    async def entrar_particao(self, guild_id):
+        """Faz o restante da tarefa atual usar a partição do servidor, abrindo-a no primeiro uso."""
+        if not PARTICIONAR_POR_SERVIDOR or guild_id is None:
+            return
+        particao = self.particoes.get(guild_id)
+        if particao is None:
+            async with self._trava_particoes:
+                particao = self.particoes.get(guild_id)
+                if particao is None:
+                    particao = Particao(CAMINHO_BANCO_SERVIDOR.format(guild_id))
+                    await self.abrir_particao(particao)
+                    self.particoes[guild_id] = particao
+        particao_atual.set(particao)
+
+    async def abrir_particao(self, particao):
+        """Abre o banco da partição e inicia suas tarefas em segundo plano."""
+        token = particao_atual.set(particao)
+        try:
+            await self.iniciar_banco(particao.caminho)
+            if self.banco is None:
+                # Armazenamento em memória: os resets são imediatos e as tarefas do banco não se aplicam
+                self.tarefas = TarefasImediatas(self.armazenamento, self.linhas_resetadas)
+                return
+            # A tarefa do verificador herda o contexto atual e, com ele, a partição
+            self.verificador_imagens = VerificadorImagens(self.banco, self.imagem_verificada)
+            self.verificador_imagens.iniciar()
+            self.extrato = Extrato(self.banco)
+            self.extrato.iniciar()
+            self.tarefas = TarefasEmLote(self.banco, self.linhas_resetadas)
+            await self.tarefas.retomar()
+            self.copias = copias.CopiasDeSeguranca(particao.caminho)
+            self.copias.iniciar()
+        finally:
+            particao_atual.reset(token)
+
+    async def fechar_particao(self, particao):
+        """Interrompe as tarefas da partição e fecha o banco dela."""
+        token = particao_atual.set(particao)
+        try:
+            if self.copias:
+                await self.copias.parar()
+                self.copias = None
+            if self.verificador_imagens:
+                await self.verificador_imagens.parar()
+                self.verificador_imagens = None
+            if self.extrato:
+                await self.extrato.parar()
+                self.extrato = None
+            if self.tarefas:
+                await self.tarefas.parar()
+                self.tarefas = None
+            await self.fechar_banco()
+        finally:
+            particao_atual.reset(token)
+
+    async def fechar_particoes(self):
+        """Interrompe as tarefas e fecha os bancos de todas as partições abertas."""
+        for particao in (*self.particoes.values(), self.particao_padrao):
+            await self.fechar_particao(particao)
+        self.particoes.clear()
+
+    async def restaurar_copia(self, nome):
+        """Substitui o banco da partição atual pela cópia de segurança `nome`; retorna a cópia do banco substituído.
+
+        A cópia é descompactada e verificada com o bot funcionando; só a troca do arquivo fecha a
+        partição, por alguns instantes, e comandos dela nesse intervalo falham."""
+        particao = self.particao
+        preparado = await copias.em_segundo_plano(copias.preparar_restauracao, particao.caminho, nome)
+        try:
+            anterior = await self.copias.fazer("antes-da-restauracao-")
+            await self.fechar_particao(particao)
+            try:
+                await copias.em_segundo_plano(copias.substituir, particao.caminho, preparado)
+            finally:
+                # Reabrir aplica as migrações pendentes da cópia e refaz os índices e caches em memória
+                await self.abrir_particao(particao)
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(preparado)
+        return anterior
+
+    def marcar_inicializacao(self, etapa, desde):
+        """Registra quanto tempo a etapa levou, medido a partir de `desde` (perf_counter)."""
+        self.tempos_inicializacao[etapa] = time.perf_counter() - desde
 
     async def setup_hook(self):
-        """Cria ou atualiza as tabelas no banco de dados."""
-        async with aiosqlite.connect("eros.db") as db:
-            # Cria a tabela de personagens, se não existir
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS personagens (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL COLLATE NOCASE UNIQUE,
-                    imagem TEXT NOT NULL,
-                    conquistado INTEGER DEFAULT 0,
-                    vantagem INTEGER DEFAULT 2  -- Vantagem padrão é +2
-                )
-            """)
-            # Cria a tabela de amores, se não existir
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS amores (
-                    usuario_id INTEGER NOT NULL,
-                    personagem TEXT NOT NULL COLLATE NOCASE UNIQUE
-                )
-            """)
-            # Cria a tabela de cooldowns, se não existir
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS cooldowns (
-                    usuario_id INTEGER PRIMARY KEY,
-                    tentativas INTEGER DEFAULT 0,
-                    tempo TEXT,
-                    ultimo_casamento TEXT,
-                    ultimo_coletar TEXT  -- Nova coluna para armazenar o último uso do comando /coletar
-                )
-            """)
-            # Adiciona a coluna `vantagem` se ela não existir
-            try:
-                await db.execute("ALTER TABLE personagens ADD COLUMN vantagem INTEGER DEFAULT 2")
-            except aiosqlite.OperationalError:
-                pass  # A coluna já existe, não faz nada
-            # Cria a tabela de moedas, se não existir
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS moedas (
-                    usuario_id INTEGER PRIMARY KEY,
-                    eritos INTEGER DEFAULT 0
-                )
-            """)
-            # Cria a tabela de trocas, se não existir
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS trocas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    ofertante_id INTEGER NOT NULL,
-                    personagem TEXT NOT NULL,
-                    destinatario_id INTEGER NOT NULL,
-                    quantidade_eritos INTEGER NOT NULL
-                )
-            """)
-            await db.commit()
+        """Abre o banco compartilhado e sincroniza os comandos, se eles mudaram."""
+        self.marcar_inicializacao("login", INICIO_PROCESSO)
+        inicio = time.perf_counter()
+        await self.abrir_particao(self.particao_padrao)
+        self.marcar_inicializacao("banco", inicio)
+        self.metricas.iniciar()
+        self.add_dynamic_items(BotaoFlerte, BotaoTroca, BotaoLista, BotaoExtrato)
+        inicio = time.perf_counter()
+        sincronizou = await self.sincronizar_comandos()
+        self.marcar_inicializacao("sincronizacao" if sincronizou else "verificacao_comandos", inicio)
+
+    async def on_ready(self):
+        # on_ready se repete a cada reconexão; o relatório só vale para a primeira
+        if "pronto" in self.tempos_inicializacao:
+            return
+        self.marcar_inicializacao("pronto", INICIO_PROCESSO)
+        log.info("Inicialização: %s", ", ".join(f"{etapa} {segundos * 1000:.0f} ms" for etapa, segundos in self.tempos_inicializacao.items()))
+
+    def assinatura_comandos(self):
+        """Hash estável das definições dos comandos, como seriam enviadas ao Discord."""
+        definicoes = sorted((comando.to_dict(self.tree) for comando in self.tree.get_commands()),
+                            key=lambda definicao: (definicao["type"], definicao["name"]))
+        conteudo = json.dumps([self.application_id, definicoes], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode()).hexdigest()
+
+    async def sincronizar_comandos(self):
+        """Envia os comandos ao Discord só quando a assinatura difere da última sincronizada."""
+        assinatura = self.assinatura_comandos()
+        if await self.armazenamento.metadado("assinatura_comandos") == assinatura:
+            return False
         await self.tree.sync()
+        await self.armazenamento.definir_metadado("assinatura_comandos", assinatura)
+        log.info("Comandos sincronizados com o Discord")
+        return True
+
+    async def close(self):
+        await super().close()
+        self.metricas.parar()
+        await self.fechar_particoes()
+
+    async def iniciar_banco(self, caminho=CAMINHO_BANCO):
+        """Abre o armazenamento da partição: o banco em `caminho`, com as migrações pendentes, ou a memória."""
+        if self.tipo_armazenamento == "memoria":
+            self.armazenamento = ArmazenamentoMemoria()
+        else:
+            self.banco = BancoDeDados(caminho)
+            await self.banco.abrir()
+            self.banco.observador = self.metricas.observar_consulta
+            await migrar(self.banco)
+            self.armazenamento = ArmazenamentoSQLite(self.banco)
+        await self.carregar_indices()
+        self.cooldowns = CacheCooldowns(self.armazenamento, self.tentativas_liberadas)
+        await self.cooldowns.carregar()
+        self.cooldowns.iniciar()
+
+    async def fechar_banco(self):
+        """Grava o que estiver pendente em memória e fecha o banco."""
+        if self.cooldowns:
+            await self.cooldowns.parar()
+            self.cooldowns = None
+        if self.banco:
+            await self.banco.fechar()
+            self.banco = None
+        self.armazenamento = None
+
+    async def carregar_indices(self):
+        """Reconstrói os índices em memória (disponíveis, nomes e ranking) a partir do armazenamento
+        e descarta as contagens e respostas guardadas, que podem ser de outro banco (ex.: antes de uma restauração)."""
+        linhas = await self.armazenamento.catalogo()
+        self.disponiveis.reconstruir(personagem_id for personagem_id, _, indisponivel in linhas if not indisponivel)
+        self.nomes.reconstruir(nome for _, nome, _ in linhas)
+        self.ranking.reconstruir(await self.armazenamento.saldos())
+        self.contagem_amores.clear()
+        self.respostas.limpar()
+
+    async def consultar_em_cache(self, chave, carregar):
+        """Resultado de `carregar()` pelo cache de respostas da partição; `carregar` retorna (valor, dependências)."""
+        encontrado, valor = self.respostas.obter(chave)
+        if encontrado:
+            return valor
+        marca = self.respostas.marca()
+        valor, dependencias = await carregar()
+        self.respostas.guardar(chave, valor, dependencias, marca)
+        return valor
+
+    async def sortear_personagem(self):
+        """Sorteia um personagem disponível em O(1) e retorna (id, nome, imagem), ou None se não houver nenhum."""
+        while len(self.disponiveis):
+            personagem_id = self.disponiveis.sortear()
+            personagem = await self.armazenamento.personagem_disponivel(personagem_id)
+            if personagem:
+                return personagem
+            # O índice estava desatualizado para este ID; descarta e sorteia de novo
+            self.disponiveis.remover(personagem_id)
+        return None
+
+    def imagem_verificada(self, personagem_id, quebrada, conquistado):
+        """Tira do sorteio os personagens com imagem quebrada e devolve os que voltaram a funcionar."""
+        if quebrada:
+            self.disponiveis.remover(personagem_id)
+        elif not conquistado:
+            self.disponiveis.adicionar(personagem_id)
+        self.respostas.invalidar(("personagem", personagem_id))  # O perfil mostra a imagem
 
     async def adicionar_personagem(self, nome, imagem):
         """Adiciona um personagem, garantindo que não haja repetição de nomes (ignorando maiúsculas/minúsculas)."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT 1 FROM personagens WHERE LOWER(nome) = LOWER(?)", (nome,))
-            if await cursor.fetchone():
-                return False  # Nome já existe
-            await db.execute("INSERT INTO personagens (nome, imagem) VALUES (?, ?)", (nome, imagem))
-            await db.commit()
-            return True
+        personagem_id = await self.armazenamento.adicionar_personagem(nome, imagem)
+        if personagem_id is None:
+            return False  # Nome já existe
+        self.disponiveis.adicionar(personagem_id)
+        self.nomes.adicionar(nome)
+        self.respostas.invalidar(("catalogo",))
+        return True
 
     async def excluir_personagem(self, nome):
         """Exclui um personagem do banco de dados."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("DELETE FROM personagens WHERE nome = ?", (nome,))
-            await db.execute("DELETE FROM amores WHERE personagem = ?", (nome,))
-            await db.commit()
+        removido = await self.armazenamento.excluir_personagem(nome)
+        if removido is None:
+            return
+        personagem_id, nome_removido, dono_id = removido
+        self.disponiveis.remover(personagem_id)
+        self.nomes.remover(nome_removido)
+        self.respostas.invalidar(("catalogo",), ("personagem", personagem_id))
+        if dono_id is not None:
+            self.contagem_amores.pop(dono_id, None)
+            self.respostas.invalidar(("amores", dono_id))
 
     async def listar_amores(self, usuario_id):
         """Lista os personagens conquistados por um usuário."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT personagem FROM amores WHERE usuario_id = ?", (usuario_id,))
-            return [row[0] for row in await cursor.fetchall()]
+        return await self.armazenamento.amores_de(usuario_id)
 
     async def adicionar_amor(self, usuario_id, personagem):
-        """Adiciona um personagem à lista de amores de um usuário e o marca como conquistado."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("INSERT INTO amores (usuario_id, personagem) VALUES (?, ?)", (usuario_id, personagem))
-            await db.execute("UPDATE personagens SET conquistado = 1 WHERE nome = ?", (personagem,))
-            await db.commit()
+        """Adiciona um personagem à lista de amores de um usuário; retorna False se ele já tinha dono."""
+        personagem_id = await self.armazenamento.casar(usuario_id, personagem)
+        self.contagem_amores.pop(usuario_id, None)
+        if personagem_id is None:
+            return False
+        self.disponiveis.remover(personagem_id)
+        self.respostas.invalidar(("catalogo",), ("amores", usuario_id), ("personagem", personagem_id))
+        return True
+
+    async def nome_do_personagem(self, personagem_id):
+        """Nome do personagem com o ID informado, ou None se ele não existir mais."""
+        return await self.armazenamento.nome_do_personagem(personagem_id)
+
+    async def perfil_do_personagem(self, nome):
+        """Retorna (id, nome, imagem, imagem_quebrada, dono_id) do personagem, ou None se ele não existir."""
+        async def carregar():
+            personagem = await self.armazenamento.perfil_do_personagem(nome)
+            # Um nome que ainda não existe pode passar a existir com um novo personagem
+            return personagem, [("personagem", personagem[0]) if personagem else ("catalogo",)]
+        return await self.consultar_em_cache(("perfil", nome), carregar)
 
     async def obter_dono_personagem(self, nome):
         """Obtém o ID do usuário que conquistou determinado personagem."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT usuario_id FROM amores WHERE LOWER(personagem) = LOWER(?)", (nome,))
-            dono = await cursor.fetchone()
-            return dono[0] if dono else None
+        return await self.armazenamento.dono_do_personagem(nome)
 
     async def liberar_personagem(self, usuario_id, personagem):
         """Remove o personagem da lista de amores do usuário e o torna disponível novamente."""
-        async with aiosqlite.connect("eros.db") as db:
-            dono = await self.obter_dono_personagem(personagem)
-            if dono == usuario_id:
-                await db.execute("DELETE FROM amores WHERE personagem = ?", (personagem,))
-                await db.execute("UPDATE personagens SET conquistado = 0 WHERE nome = ?", (personagem,))
-                await db.commit()
-                return True
+        personagem_id = await self.armazenamento.divorciar(usuario_id, personagem)
+        if personagem_id is None:
             return False
-
-    async def limpar_todos_amores(self):
-        """Remove todos os relacionamentos e marca todos os personagens como disponíveis."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("DELETE FROM amores")
-            await db.execute("UPDATE personagens SET conquistado = 0")
-            await db.commit()
+        self.contagem_amores.pop(usuario_id, None)
+        self.disponiveis.adicionar(personagem_id)
+        self.respostas.invalidar(("catalogo",), ("amores", usuario_id), ("personagem", personagem_id))
+        return True
+
+    async def limpar_todos_amores(self, referencia=None):
+        """Agenda a remoção de todos os relacionamentos em segundo plano e retorna os IDs das tarefas."""
+        return await self.tarefas.criar(["amores"], referencia)
+
+    def linhas_resetadas(self, tipo, linhas):
+        """Atualiza os índices em memória após cada bloco de uma tarefa de reset."""
+        if tipo == "amores":
+            for usuario_id, personagem_id in linhas:
+                self.contagem_amores.pop(usuario_id, None)
+                self.disponiveis.adicionar(personagem_id)
+            self.respostas.invalidar(("catalogo",), *(entidade for usuario_id, personagem_id in linhas
+                                                      for entidade in (("amores", usuario_id), ("personagem", personagem_id))))
+        elif tipo == "moedas":
+            for usuario_id, eritos in linhas:
+                self.ranking.atualizar(usuario_id, eritos)
+            self.respostas.invalidar(*(("eritos", usuario_id) for usuario_id, _ in linhas))
+
+    async def resetar_em_segundo_plano(self, interaction, agendar, descricao):
+        """Chama `agendar()` (que cria as tarefas de reset e retorna seus IDs) e acompanha o progresso
+        em uma mensagem de acompanhamento da interação.
+
+        O reset é agendado antes de responder: se a interação já expirou, ele acontece mesmo assim."""
+        ids = await agendar()
+        await interaction.response.defer()
+        mensagem = await interaction.followup.send(f"⏳ {descricao}...", wait=True)
+        self.em_segundo_plano(self._acompanhar_reset(mensagem, ids, descricao))
+
+    def em_segundo_plano(self, corotina):
+        """Executa a corotina em uma tarefa própria, mantendo uma referência até ela terminar."""
+        tarefa = asyncio.create_task(corotina)
+        self._tarefas_avulsas.add(tarefa)
+        tarefa.add_done_callback(self._tarefas_avulsas.discard)
+
+    async def _acompanhar_reset(self, mensagem, ids, descricao):
+        while True:
+            concluido = await self.tarefas.aguardar(ids, INTERVALO_PROGRESSO)
+            processadas, total = self.tarefas.progresso(ids)
+            if concluido:
+                texto = f"✅ {descricao}: concluído ({processadas} registros)."
+            else:
+                texto = f"⏳ {descricao}: {min(processadas * 100 // max(total, 1), 99)}% ({processadas} de {total} registros)"
+            try:
+                await mensagem.edit(content=texto)
+            except discord.HTTPException:
+                # O token da interação vale 15 minutos; o reset continua mesmo sem a mensagem
+                log.info("Progresso do reset não pôde mais ser exibido; a tarefa continua em segundo plano")
+                return
+            if concluido:
+                return
 
     async def can_paquerar(self, usuario_id):
         """Verifica se o usuário pode usar o comando /paquerar."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT tentativas, tempo, ultimo_casamento FROM cooldowns WHERE usuario_id = ?", (usuario_id,))
-            cooldown_info = await cursor.fetchone()
+        registro = self.cooldowns.obter(usuario_id)
 
-        if not cooldown_info:
+        if not registro:
             return True, None, None  # Nunca usou o comando antes
 
-        tentativas, tempo_str, ultimo_casamento_str = cooldown_info
-        tempo = datetime.fromisoformat(tempo_str) if tempo_str else None
-        ultimo_casamento = datetime.fromisoformat(ultimo_casamento_str) if ultimo_casamento_str else None
+        agora = time.time()
 
         # Verifica se o cooldown de casamento já expirou
-        if ultimo_casamento:
-            tempo_restante_casamento = (ultimo_casamento + timedelta(hours=18)) - datetime.now()
-            if tempo_restante_casamento > timedelta(0):
-                return False, None, tempo_restante_casamento  # Ainda em cooldown de casamento
-
-        # Verifica o cooldown de tentativas
-        if tempo and datetime.now() > tempo:
-            # Reinicia a contagem de tentativas
-            await self.resetar_tentativas(usuario_id)
+        if registro.ultimo_casamento:
+            tempo_restante_casamento = registro.ultimo_casamento + COOLDOWN_SEGUNDOS - agora
+            if tempo_restante_casamento > 0:
+                return False, None, timedelta(seconds=tempo_restante_casamento)  # Ainda em cooldown de casamento
+
+        # Verifica o cooldown de tentativas; o agendador de cooldowns zera a contagem quando o prazo vence
+        if registro.tempo and agora > registro.tempo:
             return True, None, None
 
-        if tentativas >= 5:  # Limite de tentativas aumentado para 5
-            tempo_restante = tempo - datetime.now()
-            if tempo_restante > timedelta(0):
-                return False, tempo_restante, None  # Ainda em cooldown de tentativas
+        if registro.tentativas >= LIMITE_TENTATIVAS:
+            tempo_restante = registro.tempo - agora
+            if tempo_restante > 0:
+                return False, timedelta(seconds=tempo_restante), None  # Ainda em cooldown de tentativas
 
         return True, None, None
 
-    async def resetar_tentativas(self, usuario_id):
-        """Reinicia a contagem de tentativas e o tempo de cooldown."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("UPDATE cooldowns SET tentativas = 0, tempo = NULL WHERE usuario_id = ?", (usuario_id,))
-            await db.commit()
-
     async def update_cooldown(self, usuario_id, casou=False):
         """Atualiza o cooldown do usuário após usar o comando /paquerar."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT tentativas FROM cooldowns WHERE usuario_id = ?", (usuario_id,))
-            cooldown_info = await cursor.fetchone()
-
-            if not cooldown_info:
-                # Primeira tentativa
-                await db.execute("INSERT INTO cooldowns (usuario_id, tentativas, tempo) VALUES (?, 1, ?)",
-                                (usuario_id, (datetime.now() + timedelta(hours=18)).isoformat()))
-            else:
-                tentativas = cooldown_info[0] + 1
-                if tentativas >= 5:  # Limite de tentativas aumentado para 5
-                    await db.execute("UPDATE cooldowns SET tentativas = ?, tempo = ? WHERE usuario_id = ?",
-                                    (tentativas, (datetime.now() + timedelta(hours=18)).isoformat(), usuario_id))
-                else:
-                    await db.execute("UPDATE cooldowns SET tentativas = ? WHERE usuario_id = ?",
-                                    (tentativas, usuario_id))
+        agora = int(time.time())
+        registro = self.cooldowns.alterar(usuario_id)
 
-            if casou:
-                await db.execute("UPDATE cooldowns SET ultimo_casamento = ? WHERE usuario_id = ?",
-                                (datetime.now().isoformat(), usuario_id))
+        if not registro.tempo or agora > registro.tempo:
+            # Primeira tentativa da janela (inclusive se o agendador ainda não zerou a anterior, já vencida)
+            registro.tentativas = 1
+            self.cooldowns.definir_prazo(usuario_id, registro, agora + COOLDOWN_SEGUNDOS)
+        else:
+            registro.tentativas += 1
+            if registro.tentativas >= LIMITE_TENTATIVAS:
+                self.cooldowns.definir_prazo(usuario_id, registro, agora + COOLDOWN_SEGUNDOS)
 
-            await db.commit()
+        if casou:
+            registro.ultimo_casamento = agora
+
+    def tentativas_liberadas(self, liberados):
+        """Chamado pelo agendador de cooldowns; avisa quem tinha esgotado as tentativas, se configurado."""
+        if not AVISAR_FIM_DO_COOLDOWN:
+            return
+        bloqueados = [usuario_id for usuario_id, tentativas in liberados if tentativas >= LIMITE_TENTATIVAS]
+        if bloqueados:
+            self.em_segundo_plano(self._avisar_fim_do_cooldown(bloqueados))
+
+    async def _avisar_fim_do_cooldown(self, usuarios):
+        for usuario_id in usuarios:
+            try:
+                usuario = self.get_user(usuario_id) or await self.fetch_user(usuario_id)
+                await usuario.send("💘 Seu cooldown acabou: você já pode usar o /paquerar de novo!")
+            except discord.HTTPException:
+                pass  # Mensagens diretas fechadas ou usuário inexistente
 
     async def obter_eritos(self, usuario_id):
         """Obtém a quantidade de Eritos de um usuário."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT eritos FROM moedas WHERE usuario_id = ?", (usuario_id,))
-            resultado = await cursor.fetchone()
-            return resultado[0] if resultado else 0
-
-    async def adicionar_eritos(self, usuario_id, quantidade):
-        """Adiciona Eritos a um usuário."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("INSERT OR IGNORE INTO moedas (usuario_id, eritos) VALUES (?, 0)", (usuario_id,))
-            await db.execute("UPDATE moedas SET eritos = eritos + ? WHERE usuario_id = ?", (quantidade, usuario_id))
-            await db.commit()
-
-    async def remover_eritos(self, usuario_id, quantidade):
-        """Remove Eritos de um usuário."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("UPDATE moedas SET eritos = eritos - ? WHERE usuario_id = ?", (quantidade, usuario_id))
-            await db.commit()
+        async def carregar():
+            return await self.armazenamento.eritos_de(usuario_id), [("eritos", usuario_id)]
+        return await self.consultar_em_cache(("saldo", usuario_id), carregar)
+
+    async def adicionar_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        """Adiciona Eritos a um usuário, registrando o lançamento no extrato, e retorna o novo saldo."""
+        eritos = await self.armazenamento.adicionar_eritos(usuario_id, quantidade, motivo, referencia)
+        self.ranking.atualizar(usuario_id, eritos)
+        self.respostas.invalidar(("eritos", usuario_id))
+        return eritos
+
+    async def remover_eritos(self, usuario_id, quantidade, motivo, referencia=None):
+        """Remove Eritos de um usuário e retorna o novo saldo, ou None se o saldo não for suficiente."""
+        eritos = await self.armazenamento.remover_eritos(usuario_id, quantidade, motivo, referencia)
+        if eritos is None:
+            return None
+        self.ranking.atualizar(usuario_id, eritos)
+        self.respostas.invalidar(("eritos", usuario_id))
+        return eritos
 
     async def criar_troca(self, ofertante_id, personagem, destinatario_id, quantidade_eritos):
         """Cria uma proposta de troca e retorna o ID da troca."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute(
-                "INSERT INTO trocas (ofertante_id, personagem, destinatario_id, quantidade_eritos) VALUES (?, ?, ?, ?)",
-                (ofertante_id, personagem, destinatario_id, quantidade_eritos)
-            )
-            await db.commit()
-            return cursor.lastrowid  # Retorna o ID da troca
+        return await self.armazenamento.criar_troca(ofertante_id, personagem, destinatario_id, quantidade_eritos, VALIDADE_TROCA)
 
     async def confirmar_troca(self, troca_id):
-        """Confirma uma troca e transfere o personagem e os Eritos."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT ofertante_id, personagem, destinatario_id, quantidade_eritos FROM trocas WHERE id = ?", (troca_id,))
-            troca = await cursor.fetchone()
-
-            if not troca:
-                return False
-
-            ofertante_id, personagem, destinatario_id, quantidade_eritos = troca
-
-            # Verifica se o ofertante ainda possui o personagem
-            dono = await self.obter_dono_personagem(personagem)
-            if dono != ofertante_id:
-                return False
-
-            # Verifica se o destinatário tem Eritos suficientes
-            eritos_destinatario = await self.obter_eritos(destinatario_id)
-            if eritos_destinatario < quantidade_eritos:
-                return False
-
-            # Transfere o personagem
-            await self.liberar_personagem(ofertante_id, personagem)
-            await self.adicionar_amor(destinatario_id, personagem)
-
-            # Transfere os Eritos
-            await self.adicionar_eritos(ofertante_id, quantidade_eritos)
-            await self.remover_eritos(destinatario_id, quantidade_eritos)
-
-            # Remove a troca
-            await db.execute("DELETE FROM trocas WHERE id = ?", (troca_id,))
-            await db.commit()
+        """Confirma uma troca, transferindo o personagem e os Eritos em uma única transação."""
+        troca = await self.armazenamento.confirmar_troca(troca_id)
+        if not troca:
+            return False
+        ofertante_id, destinatario_id, personagem_id, quantidade_eritos, debito, credito = troca
 
-            return True
+        self.contagem_amores.pop(ofertante_id, None)
+        self.contagem_amores.pop(destinatario_id, None)
+        self.respostas.invalidar(("amores", ofertante_id), ("amores", destinatario_id), ("personagem", personagem_id))
+        if quantidade_eritos > 0:
+            self.ranking.atualizar(destinatario_id, debito)
+            self.ranking.atualizar(ofertante_id, credito)
+            self.respostas.invalidar(("eritos", ofertante_id), ("eritos", destinatario_id))
+        return True
 
     async def recusar_troca(self, troca_id):
         """Recusa uma proposta de troca."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("DELETE FROM trocas WHERE id = ?", (troca_id,))
-            await db.commit()
+        await self.armazenamento.recusar_troca(troca_id)
 
     async def pode_coletar(self, usuario_id):
         """Verifica se o usuário pode usar o comando /coletar."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT ultimo_coletar FROM cooldowns WHERE usuario_id = ?", (usuario_id,))
-            resultado = await cursor.fetchone()
+        registro = self.cooldowns.obter(usuario_id)
 
-        if not resultado or not resultado[0]:
+        if not registro or not registro.ultimo_coletar:
             return True, None  # Nunca usou o comando antes
 
-        ultimo_coletar = datetime.fromisoformat(resultado[0])
-        tempo_restante = (ultimo_coletar + timedelta(hours=18)) - datetime.now()
+        tempo_restante = registro.ultimo_coletar + COOLDOWN_SEGUNDOS - time.time()
 
-        if tempo_restante > timedelta(0):
-            return False, tempo_restante  # Ainda em cooldown
+        if tempo_restante > 0:
+            return False, timedelta(seconds=tempo_restante)  # Ainda em cooldown
         else:
             return True, None  # Pode coletar
 
     async def atualizar_cooldown_coletar(self, usuario_id):
         """Atualiza o momento em que o usuário usou o comando /coletar."""
-        async with aiosqlite.connect("eros.db") as db:
-            await db.execute("""
-                INSERT OR IGNORE INTO cooldowns (usuario_id, ultimo_coletar) VALUES (?, ?)
-                ON CONFLICT(usuario_id) DO UPDATE SET ultimo_coletar = ?
-            """, (usuario_id, datetime.now().isoformat(), datetime.now().isoformat()))
-            await db.commit()
+        self.cooldowns.alterar(usuario_id).ultimo_coletar = int(time.time())
 
     async def listar_todos_personagens(self):
         """Lista todos os personagens do banco de dados, marcando os casados com um coração."""
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT nome, conquistado FROM personagens")
-            personagens = await cursor.fetchall()
-            return [(nome, "❤️" if conquistado else "") for nome, conquistado in personagens]
-
-    async def exibir_lista_paginada(self, interaction: discord.Interaction, titulo: str, dados: list, itens_por_pagina: int = 15):
-        """Função genérica para exibir listas paginadas."""
-        if not dados:
+        personagens = await self.armazenamento.listar_personagens()
+        return [(nome, "❤️" if conquistado else "") for nome, conquistado in personagens]
+
+    async def resolver_nomes(self, usuarios_ids):
+        """Resolve IDs de usuário em nomes usando o cache, o cache do cliente e buscas concorrentes na API."""
+        nomes = {}
+        pendentes = []
+        for usuario_id in usuarios_ids:
+            encontrado, nome = self.nomes_usuarios.obter(usuario_id)
+            if not encontrado:
+                usuario = self.get_user(usuario_id)
+                if usuario is None:
+                    pendentes.append(usuario_id)
+                    continue
+                nome = usuario.name
+                self.nomes_usuarios.guardar(usuario_id, nome)
+            nomes[usuario_id] = nome
+
+        async def buscar(usuario_id):
+            try:
+                return (await self.fetch_user(usuario_id)).name
+            except discord.NotFound:
+                return None  # Usuário não existe mais
+
+        for usuario_id, nome in zip(pendentes, await asyncio.gather(*(buscar(u) for u in pendentes))):
+            self.nomes_usuarios.guardar(usuario_id, nome)
+            nomes[usuario_id] = nome
+        return nomes
+
+    def listagem_personagens(self):
+        """Listagem paginada de todos os personagens, marcando os casados com um coração."""
+        async def contar():
+            return len(self.nomes)  # O índice de nomes já tem o total, sem COUNT(*)
+        return self.armazenamento.listagem_personagens(contar=contar)
+
+    def listagem_amores(self, usuario_id):
+        """Listagem paginada dos personagens conquistados por um usuário."""
+        return self.armazenamento.listagem_amores(usuario_id, contar=lambda: self.contar_amores(usuario_id))
+
+    def listagem_de(self, alvo):
+        """Listagem identificada nos botões de navegação: 0 para todos os personagens, ou os amores do usuário `alvo`."""
+        return self.listagem_amores(alvo) if alvo else self.listagem_personagens()
+
+    async def contar_amores(self, usuario_id):
+        """Conta os amores de um usuário, guardando o resultado até a próxima alteração."""
+        if usuario_id not in self.contagem_amores:
+            self.contagem_amores[usuario_id] = await self.armazenamento.contar_amores(usuario_id)
+        return self.contagem_amores[usuario_id]
+
+    async def exibir_lista_paginada(self, interaction: discord.Interaction, titulo: str, alvo: int):
+        """Função genérica para exibir listas paginadas, buscando uma página por vez."""
+        lista = ListaPaginada(self.listagem_de(alvo), interaction.user.id, alvo, titulo)
+
+        async def carregar():
+            total = await lista.listagem.contar()
+            linhas = await lista.listagem.apos(None, ITENS_POR_PAGINA) if total else []
+            return (total, linhas), [("amores", alvo) if alvo else ("catalogo",)]
+        total, linhas = await self.consultar_em_cache(("lista", alvo), carregar)
+        if not total:
             await interaction.response.send_message(f"⚠️ Nenhum dado encontrado para {titulo.lower()}!")
             return
 
-        # Divide a lista em partes de `itens_por_pagina`
-        partes = [dados[i:i + itens_por_pagina] for i in range(0, len(dados), itens_por_pagina)]
-        total_partes = len(partes)
-
-        # Cria a view com botões de navegação
-        view = ListaPaginadaView(partes, total_partes, interaction.user, titulo)
-
-        # Envia a primeira parte
-        lista = "\n".join(f"{item[0]} {item[1]}" for item in partes[0])
-        embed = discord.Embed(
-            title=titulo,
-            description=f"**Página 1 de {total_partes}**\n{lista}",
-            color=discord.Color.pink()
-        )
+        # Envia a primeira página com os botões de navegação
+        embed, view = await lista.exibir(0, linhas)
         await interaction.response.send_message(embed=embed, view=view)
 
-class ListaPaginadaView(discord.ui.View):
-    """View genérica para navegar entre páginas de uma lista."""
-    def __init__(self, partes, total_partes, usuario, titulo):
-        super().__init__()
-        self.partes = partes
-        self.total_partes = total_partes
-        self.pagina_atual = 0
-        self.usuario = usuario
+class ListaPaginada:
+    """Uma lista paginada exibida a um usuário; a posição atual fica nos custom_ids dos botões."""
+    def __init__(self, listagem, usuario_id, alvo, titulo):
+        self.listagem = listagem
+        self.usuario_id = usuario_id
+        self.alvo = alvo
         self.titulo = titulo
 
-    @discord.ui.button(emoji="⬅️", style=discord.ButtonStyle.secondary)
-    async def anterior(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user != self.usuario:
-            await interaction.response.send_message("❌ Esse não é o seu comando!", ephemeral=True)
-            return
+    async def total_partes(self):
+        return max(1, -(-await self.listagem.contar() // ITENS_POR_PAGINA))
 
-        self.pagina_atual = (self.pagina_atual - 1) % self.total_partes
-        lista = "\n".join(f"{item[0]} {item[1]}" for item in self.partes[self.pagina_atual])
+    async def exibir(self, pagina, linhas):
+        """Monta a embed da página e os botões que levam às páginas vizinhas."""
+        primeiro_id, ultimo_id = (linhas[0][2], linhas[-1][2]) if linhas else (0, 0)
+        lista = "\n".join(f"{nome} {'❤️' if marcado else ''}" for nome, marcado, _ in linhas)
         embed = discord.Embed(
             title=self.titulo,
-            description=f"**Página {self.pagina_atual + 1} de {self.total_partes}**\n{lista}",
+            description=f"**Página {pagina + 1} de {await self.total_partes()}**\n{lista}",
             color=discord.Color.pink()
         )
-        await interaction.response.edit_message(embed=embed, view=self)
-
-    @discord.ui.button(emoji="➡️", style=discord.ButtonStyle.secondary)
-    async def proximo(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user != self.usuario:
+        view = view_persistente(*(BotaoLista(acao, self.usuario_id, self.alvo, pagina, primeiro_id, ultimo_id)
+                                  for acao in ("anterior", "proximo", "ir")))
+        return embed, view
+
+    async def ir_para_pagina(self, pagina):
+        """Exibe uma página qualquer (saltos de página e de letra)."""
+        pagina = min(max(pagina, 0), await self.total_partes() - 1)
+        linhas = await self.listagem.na_posicao(pagina * ITENS_POR_PAGINA, ITENS_POR_PAGINA)
+        return await self.exibir(pagina, linhas)
+
+    async def anterior(self, pagina, primeiro_id):
+        """Página anterior à exibida, voltando para a última a partir da primeira."""
+        total_partes = await self.total_partes()
+        if pagina == 0 or pagina >= total_partes:
+            # Volta para a última página, que pode estar incompleta
+            pagina = total_partes - 1
+            tamanho = await self.listagem.contar() - pagina * ITENS_POR_PAGINA
+            return await self.exibir(pagina, await self.listagem.antes(None, tamanho))
+        chave = await bot.nome_do_personagem(primeiro_id)
+        if chave is None:
+            # O personagem usado como cursor foi excluído; recorre à posição
+            return await self.ir_para_pagina(pagina - 1)
+        return await self.exibir(pagina - 1, await self.listagem.antes(chave, ITENS_POR_PAGINA))
+
+    async def proximo(self, pagina, ultimo_id):
+        """Página seguinte à exibida, voltando para a primeira depois da última."""
+        if pagina + 1 < await self.total_partes():
+            chave = await bot.nome_do_personagem(ultimo_id)
+            if chave is None:
+                return await self.ir_para_pagina(pagina + 1)
+            linhas = await self.listagem.apos(chave, ITENS_POR_PAGINA)
+            if linhas:
+                return await self.exibir(pagina + 1, linhas)
+        return await self.exibir(0, await self.listagem.apos(None, ITENS_POR_PAGINA))
+
+class BotaoLista(BotaoEros, discord.ui.DynamicItem[discord.ui.Button],
+                 template=r"eros:lista:(?P<acao>anterior|proximo|ir):(?P<usuario>\d+):(?P<alvo>\d+):(?P<pagina>\d+):(?P<primeiro>\d+):(?P<ultimo>\d+)"):
+    """Botões ⬅️, ➡️ e 🔎 das listas paginadas; guardam o dono, a lista, a página e os IDs da primeira e da última linha."""
+    EMOJIS = {"anterior": "⬅️", "proximo": "➡️", "ir": "🔎"}
+
+    def __init__(self, acao, usuario_id, alvo, pagina, primeiro_id, ultimo_id):
+        super().__init__(discord.ui.Button(
+            emoji=self.EMOJIS[acao], style=discord.ButtonStyle.secondary,
+            custom_id=f"eros:lista:{acao}:{usuario_id}:{alvo}:{pagina}:{primeiro_id}:{ultimo_id}"
+        ))
+        self.acao = acao
+        self.usuario_id = usuario_id
+        self.alvo = alvo
+        self.pagina = pagina
+        self.primeiro_id = primeiro_id
+        self.ultimo_id = ultimo_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["acao"], *(int(match[campo]) for campo in ("usuario", "alvo", "pagina", "primeiro", "ultimo")))
+
+    async def clicar(self, interaction: discord.Interaction):
+        if interaction.user.id != self.usuario_id:
             await interaction.response.send_message("❌ Esse não é o seu comando!", ephemeral=True)
             return
 
-        self.pagina_atual = (self.pagina_atual + 1) % self.total_partes
-        lista = "\n".join(f"{item[0]} {item[1]}" for item in self.partes[self.pagina_atual])
-        embed = discord.Embed(
-            title=self.titulo,
-            description=f"**Página {self.pagina_atual + 1} de {self.total_partes}**\n{lista}",
-            color=discord.Color.pink()
-        )
-        await interaction.response.edit_message(embed=embed, view=self)
+        titulo = interaction.message.embeds[0].title if interaction.message.embeds else "Lista"
+        lista = ListaPaginada(bot.listagem_de(self.alvo), self.usuario_id, self.alvo, titulo)
+        if self.acao == "ir":
+            await interaction.response.send_modal(IrParaModal(lista))
+            return
+
+        if self.acao == "anterior":
+            embed, view = await lista.anterior(self.pagina, self.primeiro_id)
+        else:
+            embed, view = await lista.proximo(self.pagina, self.ultimo_id)
+        await interaction.response.edit_message(embed=embed, view=view)
+
+class IrParaModal(RoteiaParticao, ModalInstrumentado, discord.ui.Modal, title="Ir para"):
+    """Pede uma página ou letra para a lista paginada."""
+    destino = discord.ui.TextInput(label="Página ou letra", placeholder="Ex.: 12 ou M", max_length=10)
+
+    def __init__(self, lista):
+        # Um modal fechado sem resposta é descartado depois do tempo limite
+        super().__init__(timeout=600)
+        self.lista = lista
+
+    async def enviar(self, interaction: discord.Interaction):
+        destino = self.destino.value.strip()
+        if destino.isdigit():
+            embed, view = await self.lista.ir_para_pagina(int(destino) - 1)
+        elif destino:
+            # Página em que está o primeiro nome que começa com o texto informado
+            posicao = await self.lista.listagem.posicao_de(destino)
+            embed, view = await self.lista.ir_para_pagina(posicao // ITENS_POR_PAGINA)
+        else:
+            await interaction.response.send_message("❌ Informe uma página ou uma letra.", ephemeral=True)
+            return
+        await interaction.response.edit_message(embed=embed, view=view)
 
 bot = ErosBot()
 
+# Sugere nomes de personagens enquanto o usuário digita
+async def autocompletar_personagem(interaction: discord.Interaction, atual: str):
+    # O valor de uma opção é limitado a 100 caracteres pelo Discord
+    return [app_commands.Choice(name=nome, value=nome) for nome in bot.nomes.buscar(atual) if len(nome) <= 100]
+
+async def voce_quis_dizer(nome, filtro="todos", usuario_id=None):
+    """Complemento de uma mensagem de nome não encontrado, com os nomes parecidos (ou vazio se não houver)."""
+    nomes = await busca.sugestoes(bot.armazenamento, nome, filtro, usuario_id)
+    return f"\n🔎 Você quis dizer: {', '.join(f'**{nome}**' for nome in nomes)}?" if nomes else ""
+
 # Adição de personagem ao banco de dados
 @bot.tree.command(name="adicionar_personagem", description="📝 Adicione um novo personagem.")
 async def adicionar_personagem(interaction: discord.Interaction, nome: str, imagem_url: str):
@@ -369,8 +773,48 @@ async def adicionar_personagem(interaction: discord.Interaction, nome: str, imag
     else:
         await interaction.response.send_message(f"⚠️ **{nome}** já existe no banco de dados!")
 
+# Importação de personagens em lote (apenas para o dono do bot)
+@bot.tree.command(name="importar_personagens", description="[Dono] Importa personagens de um arquivo CSV, JSON ou JSON Lines.")
+async def importar_personagens(interaction: discord.Interaction, arquivo: discord.Attachment):
+    if interaction.user.id != SEU_ID:
+        await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
+        return
+
+    try:
+        formato = importacao.formato_do_arquivo(arquivo.filename)
+    except ValueError as erro:
+        await interaction.response.send_message(f"❌ {erro}", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    dados = importacao.abrir_texto(io.BytesIO(await arquivo.read()))
+    resumo = await importacao.importar(bot.armazenamento, dados, formato)
+    if resumo.inseridos:
+        # Os novos personagens passam a aparecer no /paquerar e no autocompletar
+        await bot.carregar_indices()
+
+    await interaction.followup.send(f"✅ Importação concluída: {resumo}"[:2000], ephemeral=True)
+
+# Exportação do catálogo de personagens (apenas para o dono do bot)
+@bot.tree.command(name="exportar_personagens", description="[Dono] Exporta todos os personagens para um arquivo.")
+async def exportar_personagens(interaction: discord.Interaction, formato: Literal["csv", "jsonl", "json"] = "csv"):
+    if interaction.user.id != SEU_ID:
+        await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    # O catálogo vai para um arquivo temporário em disco, não para a memória
+    with tempfile.TemporaryFile() as temporario:
+        texto = io.TextIOWrapper(temporario, encoding="utf-8", newline="")
+        await importacao.exportar(bot.armazenamento, texto, formato)
+        texto.flush()
+        texto.detach()  # Devolve o arquivo binário sem fechá-lo
+        temporario.seek(0)
+        await interaction.followup.send(file=discord.File(temporario, filename=f"personagens.{formato}"), ephemeral=True)
+
 # Exclusão de personagem do banco de dados (apenas para o dono do bot)
 @bot.tree.command(name="excluir_personagem", description="[Dono] Exclui um personagem do banco de dados.")
+@app_commands.autocomplete(nome=autocompletar_personagem)
 async def excluir_personagem(interaction: discord.Interaction, nome: str):
     if interaction.user.id != SEU_ID:
         await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
@@ -381,26 +825,44 @@ async def excluir_personagem(interaction: discord.Interaction, nome: str):
 
 # Consultar o perfil do personagem e conferir se ele esta casado (e com quem), solteiro ou se não existe. 
 @bot.tree.command(name="consultar_personagem", description="🔍 Veja o perfil de um personagem.")
+@app_commands.autocomplete(nome=autocompletar_personagem)
 async def perfil_personagem(interaction: discord.Interaction, nome: str):
-    async with aiosqlite.connect("eros.db") as db:
-        cursor = await db.execute("SELECT nome, imagem FROM personagens WHERE LOWER(nome) = LOWER(?)", (nome,))
-        personagem = await cursor.fetchone()
+    personagem = await bot.perfil_do_personagem(nome)
 
     if not personagem:
-        await interaction.response.send_message("⚠️ Personagem não encontrado!")
+        await interaction.response.send_message("⚠️ Personagem não encontrado!" + await voce_quis_dizer(nome))
         return
 
-    nome_personagem, imagem_url = personagem
-
-    dono_id = await bot.obter_dono_personagem(nome)
+    _, nome_personagem, imagem_url, imagem_quebrada, dono_id = personagem
     dono_info = f"❤️ Em um relacionamento com <@{dono_id}>" if dono_id else "Pode ser conquistado"
 
     embed = discord.Embed(title=f"{nome_personagem}", color=discord.Color.pink())
-    embed.set_image(url=imagem_url)
+    if imagem_quebrada:
+        # Evita uma embed vazia; o dono pode corrigir com /alterar_imagem_personagem
+        embed.description = "🖼️ A imagem deste personagem está indisponível."
+    else:
+        embed.set_image(url=imagem_url)
     embed.add_field(name="Status", value=dono_info, inline=False)
 
     await interaction.response.send_message(embed=embed)
 
+# Busca aproximada de personagens, tolerante a erros de digitação
+@bot.tree.command(name="buscar", description="🔎 Busque personagens por parte do nome.")
+@app_commands.describe(texto="Nome ou parte do nome, mesmo com erros de digitação",
+                       filtro="Todos, só os disponíveis, só os conquistados ou só os seus amores")
+async def buscar(interaction: discord.Interaction, texto: str, filtro: Literal["todos", "disponiveis", "conquistados", "meus"] = "todos"):
+    resultados = await bot.armazenamento.buscar_personagens(texto, filtro, interaction.user.id)
+    if not resultados:
+        await interaction.response.send_message(f"🔎 Nenhum personagem parecido com **{texto[:100]}**.", ephemeral=True)
+        return
+
+    linhas = [
+        f"**{nome}** — " + (f"❤️ <@{dono_id}>" if dono_id else "💘 pode ser conquistado")
+        for _, nome, dono_id in resultados
+    ]
+    embed = discord.Embed(title=f"🔎 Resultados para \"{texto[:100]}\"", description="\n".join(linhas), color=discord.Color.pink())
+    await interaction.response.send_message(embed=embed)
+
 # Fazer um personagem aleatório aparecer para tentativa de flerte
 @bot.tree.command(name="paquerar", description="🏹 Tente conquistar um personagem aleatório!")
 async def flerte(interaction: discord.Interaction):
@@ -416,39 +878,56 @@ async def flerte(interaction: discord.Interaction):
             await interaction.response.send_message(f"⏳ Você já usou o comando /paquerar 5 vezes. Tente novamente em {horas}h {minutos}m {segundos}s.", ephemeral=True)
         return
 
-    async with aiosqlite.connect("eros.db") as db:
-        cursor = await db.execute("SELECT nome, imagem FROM personagens WHERE conquistado = 0 ORDER BY RANDOM() LIMIT 1")
-        personagem = await cursor.fetchone()
+    personagem = await bot.sortear_personagem()
 
     if not personagem:
         await interaction.response.send_message("❌ Nenhum personagem na mira de Eros")
         return
 
-    nome_personagem, imagem_url = personagem
+    personagem_id, nome_personagem, imagem_url = personagem
 
     embed = discord.Embed(title="💖 Alvo na mira de Eros", description=f"{nome_personagem} apareceu!", color=discord.Color.pink())
     embed.set_image(url=imagem_url)
 
     await bot.update_cooldown(interaction.user.id)
-    await interaction.response.send_message(embed=embed, view=FlerteView(nome_personagem, interaction.user))
-
-class FlerteView(discord.ui.View):
-    def __init__(self, personagem, usuario):
-        super().__init__()
-        self.personagem = personagem
-        self.usuario = usuario
-        self.pressionado = False
-
-    @discord.ui.button(label="🏹 Atirar", style=discord.ButtonStyle.primary)
-    async def flertar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user != self.usuario:
+    await interaction.response.send_message(embed=embed, view=view_persistente(BotaoFlerte(interaction.user.id, personagem_id)))
+
+class BotaoFlerte(BotaoEros, discord.ui.DynamicItem[discord.ui.Button], template=r"eros:flerte:(?P<usuario>\d+):(?P<personagem>\d+)"):
+    """Botão 🏹 Atirar do /paquerar; guarda o usuário e o personagem sorteado."""
+    def __init__(self, usuario_id, personagem_id, desativado=False):
+        super().__init__(discord.ui.Button(
+            label="🏹 Atirar", style=discord.ButtonStyle.primary, disabled=desativado,
+            custom_id=f"eros:flerte:{usuario_id}:{personagem_id}"
+        ))
+        self.usuario_id = usuario_id
+        self.personagem_id = personagem_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["usuario"]), int(match["personagem"]))
+
+    async def desativar(self, interaction: discord.Interaction):
+        try:
+            await interaction.message.edit(view=view_persistente(BotaoFlerte(self.usuario_id, self.personagem_id, desativado=True)))
+        except discord.HTTPException:
+            # O clique já foi respondido e a mensagem fica marcada em `flertes_usados`; o botão só continua visível
+            log.info("Não foi possível desativar o botão do flerte %s", interaction.message.id)
+
+    async def clicar(self, interaction: discord.Interaction):
+        if interaction.user.id != self.usuario_id:
             await interaction.response.send_message("❌ Esse não é o seu encontro!", ephemeral=True)
             return
-        
-        if self.pressionado:
+
+        # O botão é desativado depois do clique, mas um clique com a mensagem de antes disso ainda chega aqui
+        if interaction.message.id in bot.flertes_usados:
             await interaction.response.send_message("⚠️ Você já tentou conquistar esse amor", ephemeral=True)
             return
 
+        if (interaction.created_at - interaction.message.created_at).total_seconds() > VALIDADE_FLERTE:
+            await interaction.response.send_message("⌛ Esse encontro já acabou. Use /paquerar de novo!", ephemeral=True)
+            await self.desativar(interaction)
+            return
+
         # Verifica o cooldown de casamento
         pode_paquerar, _, tempo_restante_casamento = await bot.can_paquerar(interaction.user.id)
         if not pode_paquerar and tempo_restante_casamento:
@@ -457,36 +936,43 @@ class FlerteView(discord.ui.View):
             await interaction.response.send_message(f"⏳ Você só pode se casar novamente em {horas}h {minutos}m {segundos}s.", ephemeral=True)
             return
 
-        self.pressionado = True
+        # Marcada de vez (sem pausa desde a verificação): um erro também não dá uma nova rolagem
+        if not bot.flertes_usados.marcar(interaction.message.id):
+            await interaction.response.send_message("⚠️ Você já tentou conquistar esse amor", ephemeral=True)
+            return
 
-        # Obtém a vantagem do personagem
-        async with aiosqlite.connect("eros.db") as db:
-            cursor = await db.execute("SELECT vantagem FROM personagens WHERE nome = ?", (self.personagem,))
-            resultado = await cursor.fetchone()
-            vantagem = resultado[0] if resultado else 2  # Vantagem padrão é +2
+        # Obtém o personagem e a vantagem dele
+        personagem = await bot.armazenamento.vantagem_do_personagem(self.personagem_id)
+        if not personagem:
+            await interaction.response.send_message("⚠️ Esse personagem não existe mais.", ephemeral=True)
+            await self.desativar(interaction)
+            return
+        nome_personagem, vantagem = personagem
 
         num_user = random.randint(1, 20)
         num_personagem = random.randint(1, 20) + vantagem  # Adiciona a vantagem do personagem
 
-        if num_user >= num_personagem:
-            await bot.adicionar_amor(interaction.user.id, self.personagem)
-            resposta = f"💘 Eros acertou em cheio! Agora você está casado com **{self.personagem}**!\n🎲 Eros tirou **{num_user}** e seu alvo **{num_personagem}**."
+        if num_user < num_personagem:
+            resposta = f"💔 {nome_personagem} esquivou, não foi dessa vez...\n🎲 Eros tirou **{num_user}** e seu alvo **{num_personagem}**."
+        elif await bot.adicionar_amor(interaction.user.id, nome_personagem):
+            resposta = f"💘 Eros acertou em cheio! Agora você está casado com **{nome_personagem}**!\n🎲 Eros tirou **{num_user}** e seu alvo **{num_personagem}**."
             await bot.update_cooldown(interaction.user.id, casou=True)
         else:
-            resposta = f"💔 {self.personagem} esquivou, não foi dessa vez...\n🎲 Eros tirou **{num_user}** e seu alvo **{num_personagem}**."
+            resposta = f"💔 {nome_personagem} já está em um relacionamento com outra pessoa..."
 
-        button.disabled = True
-        await interaction.message.edit(view=self)
         await interaction.response.send_message(resposta)
+        await self.desativar(interaction)
 
 # Divorciar de uma das suas paixões
 @bot.tree.command(name="divorciar", description="💔 Libere um dos seus amores.")
+@app_commands.autocomplete(personagem=autocompletar_personagem)
 async def divorciar(interaction: discord.Interaction, personagem: str):
     sucesso = await bot.liberar_personagem(interaction.user.id, personagem)
     if sucesso:
         await interaction.response.send_message(f"💔 Você se divorciou de **{personagem}**.")
     else:
-        await interaction.response.send_message("❌ Você não pode se divorciar de um personagem que não te pertence!")
+        await interaction.response.send_message("❌ Você não pode se divorciar de um personagem que não te pertence!"
+                                                + await voce_quis_dizer(personagem, "meus", interaction.user.id))
 
 # Limpar todos os relacionamentos e resetar Eritos
 @bot.tree.command(name="resetar_status", description="[Dono] Reseta todos os relacionamentos e saldo de Eritos.")
@@ -495,33 +981,23 @@ async def resertar_status(interaction: discord.Interaction):
         await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
         return
 
-    async with aiosqlite.connect("eros.db") as db:
-        # Limpa todos os relacionamentos
-        await db.execute("DELETE FROM amores")
-        await db.execute("UPDATE personagens SET conquistado = 0")
-        # Reseta os Eritos de todos os usuários
-        await db.execute("UPDATE moedas SET eritos = 0")
-        await db.commit()
-
-    await interaction.response.send_message("✅ Todos os relacionamentos e saldo de Eritos resetados!")
+    # Em blocos e em segundo plano: o escritor continua atendendo os outros comandos durante o reset
+    await bot.resetar_em_segundo_plano(interaction, lambda: bot.tarefas.criar(["amores", "moedas"], interaction.user.id),
+                                       "Resetando relacionamentos e saldos de Eritos")
 
 # Listar os personagens conquistados pelo usuário (em partes de 15 em 15)
 @bot.tree.command(name="meus_amores", description="💞 Veja a lista de personagens com quem você está casado.")
 async def meus_amores(interaction: discord.Interaction):
-    amores = await bot.listar_amores(interaction.user.id)
-    if not amores:
+    if not await bot.contar_amores(interaction.user.id):
         await interaction.response.send_message("💔 Você ainda não conquistou ninguém.")
         return
 
-    # Formata os dados para a função genérica
-    dados = [(nome, "❤️") for nome in amores]
-    await bot.exibir_lista_paginada(interaction, "Seus amores", dados)
+    await bot.exibir_lista_paginada(interaction, "Seus amores", interaction.user.id)
 
 # Listar todos os personagens do banco de dados
 @bot.tree.command(name="listar_personagens", description="📜 Lista todos os personagens do banco de dados.")
 async def listar_personagens(interaction: discord.Interaction):
-    personagens = await bot.listar_todos_personagens()
-    await bot.exibir_lista_paginada(interaction, "Todos os personagens", personagens)
+    await bot.exibir_lista_paginada(interaction, "Todos os personagens", 0)
 
 # Verificar saldo de Eritos
 @bot.tree.command(name="saldo", description="💰 Veja quantos Eritos você possui.")
@@ -538,14 +1014,11 @@ async def ver_saldo(interaction: discord.Interaction, usuario: discord.User):
 # Verificar amores de outro usuário
 @bot.tree.command(name="ver_amores", description="💞 Veja a lista de personagens com quem outro usuário está casado.")
 async def ver_amores(interaction: discord.Interaction, usuario: discord.User):
-    amores = await bot.listar_amores(usuario.id)
-    if not amores:
+    if not await bot.contar_amores(usuario.id):
         await interaction.response.send_message(f"💔 {usuario.mention} ainda não conquistou ninguém.")
         return
 
-    # Formata os dados para a função genérica
-    dados = [(nome, "❤️") for nome in amores]
-    await bot.exibir_lista_paginada(interaction, f"Amores de {usuario.name}", dados)
+    await bot.exibir_lista_paginada(interaction, f"Amores de {usuario.name}", usuario.id)
 
 # Adicionar ou remover Eritos (apenas para o dono do bot)
 @bot.tree.command(name="gerenciar_eritos", description="[Dono] Adiciona ou remove Eritos de um usuário.")
@@ -555,14 +1028,19 @@ async def gerenciar_eritos(interaction: discord.Interaction, usuario: discord.Us
         return
 
     if quantidade > 0:
-        await bot.adicionar_eritos(usuario.id, quantidade)
+        await bot.adicionar_eritos(usuario.id, quantidade, "ajuste", interaction.user.id)
         await interaction.response.send_message(f"✅ **{quantidade}** Eritos foram adicionados ao saldo de {usuario.mention}.")
+    elif await bot.remover_eritos(usuario.id, abs(quantidade), "ajuste", interaction.user.id) is None:
+        eritos = await bot.obter_eritos(usuario.id)
+        await interaction.response.send_message(
+            f"❌ {usuario.mention} possui apenas **{eritos}** Eritos; o saldo não pode ficar negativo.", ephemeral=True
+        )
     else:
-        await bot.remover_eritos(usuario.id, abs(quantidade))
         await interaction.response.send_message(f"🗑️ **{abs(quantidade)}** Eritos foram removidos do saldo de {usuario.mention}.")
 
 # Oferecer um personagem em troca de Eritos
 @bot.tree.command(name="oferecer_troca", description="🔄 Ofereça um personagem em troca de Eritos.")
+@app_commands.autocomplete(personagem=autocompletar_personagem)
 async def oferecer_troca(interaction: discord.Interaction, personagem: str, destinatario: discord.User, quantidade_eritos: int):
     if destinatario.id == interaction.user.id:
         await interaction.response.send_message("❌ Você não pode oferecer um personagem para si mesmo!", ephemeral=True)
@@ -574,7 +1052,8 @@ async def oferecer_troca(interaction: discord.Interaction, personagem: str, dest
 
     dono = await bot.obter_dono_personagem(personagem)
     if dono != interaction.user.id:
-        await interaction.response.send_message("❌ Você não possui este personagem!", ephemeral=True)
+        await interaction.response.send_message("❌ Você não possui este personagem!" + await voce_quis_dizer(personagem, "meus", interaction.user.id),
+                                                ephemeral=True)
         return
 
     eritos_destinatario = await bot.obter_eritos(destinatario.id)
@@ -584,9 +1063,12 @@ async def oferecer_troca(interaction: discord.Interaction, personagem: str, dest
 
     # Cria a troca e obtém o ID
     troca_id = await bot.criar_troca(interaction.user.id, personagem, destinatario.id, quantidade_eritos)
+    if troca_id is None:
+        await interaction.response.send_message("⚠️ Esse personagem não existe mais.", ephemeral=True)
+        return
 
     # Envia a proposta com botões de aceitar/recusar
-    view = TrocaView(troca_id, interaction.user.id, destinatario.id)
+    view = view_persistente(BotaoTroca("aceitar", troca_id), BotaoTroca("recusar", troca_id))
     await interaction.response.send_message(
         f"💌 {destinatario.mention}, você recebeu uma proposta de troca de {interaction.user.mention}:\n"
         f"**{personagem}** por **{quantidade_eritos} Eritos**.\n"
@@ -594,17 +1076,35 @@ async def oferecer_troca(interaction: discord.Interaction, personagem: str, dest
         view=view
     )
 
-class TrocaView(discord.ui.View):
-    def __init__(self, troca_id, ofertante_id, destinatario_id):
-        super().__init__()
+class BotaoTroca(BotaoEros, discord.ui.DynamicItem[discord.ui.Button], template=r"eros:troca:(?P<acao>aceitar|recusar):(?P<troca>\d+)"):
+    """Botões ✅ e ✖️ de uma proposta de troca; o restante da proposta é lido da tabela `trocas`."""
+    def __init__(self, acao, troca_id):
+        if acao == "aceitar":
+            botao = discord.ui.Button(emoji="✅", style=discord.ButtonStyle.success)
+        else:
+            botao = discord.ui.Button(emoji="✖️", style=discord.ButtonStyle.danger)
+        botao.custom_id = f"eros:troca:{acao}:{troca_id}"
+        super().__init__(botao)
+        self.acao = acao
         self.troca_id = troca_id
-        self.ofertante_id = ofertante_id
-        self.destinatario_id = destinatario_id
 
-    @discord.ui.button(emoji="✅", style=discord.ButtonStyle.success)
-    async def aceitar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.destinatario_id:
-            await interaction.response.send_message("❌ Você não pode aceitar essa troca!", ephemeral=True)
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["acao"], int(match["troca"]))
+
+    async def clicar(self, interaction: discord.Interaction):
+        destinatario_id = await bot.armazenamento.destinatario_da_troca(self.troca_id, VALIDADE_TROCA)
+        if destinatario_id is None:
+            await interaction.response.send_message("⌛ Essa proposta de troca não existe mais.", ephemeral=True)
+            return
+
+        if interaction.user.id != destinatario_id:
+            await interaction.response.send_message(f"❌ Você não pode {self.acao} essa troca!", ephemeral=True)
+            return
+
+        if self.acao == "recusar":
+            await bot.recusar_troca(self.troca_id)
+            await interaction.response.send_message("❌ Troca recusada.")
             return
 
         sucesso = await bot.confirmar_troca(self.troca_id)
@@ -613,15 +1113,6 @@ class TrocaView(discord.ui.View):
         else:
             await interaction.response.send_message("❌ A troca não pôde ser confirmada. Verifique se o personagem ainda está disponível.", ephemeral=True)
 
-    @discord.ui.button(emoji="✖️", style=discord.ButtonStyle.danger)
-    async def recusar(self, interaction: discord.Interaction, button: discord.ui.Button):
-        if interaction.user.id != self.destinatario_id:
-            await interaction.response.send_message("❌ Você não pode recusar essa troca!", ephemeral=True)
-            return
-
-        await bot.recusar_troca(self.troca_id)
-        await interaction.response.send_message("❌ Troca recusada.")
-
 # Coletar Eritos 
 @bot.tree.command(name="coletar", description="💸 Colete seus Eritos (a cada 18 horas).")
 async def coletar(interaction: discord.Interaction):
@@ -640,7 +1131,7 @@ async def coletar(interaction: discord.Interaction):
     eritos_ganhos = random.randint(0, 100)
 
     # Adiciona os Eritos ao usuário
-    await bot.adicionar_eritos(interaction.user.id, eritos_ganhos)
+    await bot.adicionar_eritos(interaction.user.id, eritos_ganhos, "coleta")
 
     # Atualiza o cooldown
     await bot.atualizar_cooldown_coletar(interaction.user.id)
@@ -656,87 +1147,290 @@ async def resetar_cooldowns(interaction: discord.Interaction):
         await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
         return
 
-    async with aiosqlite.connect("eros.db") as db:
-        # Reseta o cooldown de casamentos, paquera e coleta de Eritos
-        await db.execute("UPDATE cooldowns SET tentativas = 0, tempo = NULL, ultimo_casamento = NULL, ultimo_coletar = NULL")
-        await db.commit()
-
-    await interaction.response.send_message("✅ Todos os cooldowns (paquerar, casamento e coleta) foram resetados!")
+    # Reseta o cooldown de casamentos, paquera e coleta de Eritos: a memória na hora, o banco aos poucos
+    await bot.resetar_em_segundo_plano(interaction, lambda: bot.cooldowns.resetar_todos(bot.tarefas, interaction.user.id),
+                                       "Resetando os cooldowns (paquerar, casamento e coleta)")
 
 # Alterar a imagem de um personagem
 @bot.tree.command(name="alterar_imagem_personagem", description="🖼️ Altere a imagem de um personagem.")
+@app_commands.autocomplete(nome=autocompletar_personagem)
 async def alterar_imagem_personagem(interaction: discord.Interaction, nome: str, nova_imagem_url: str):
     # Verifica se a URL da imagem é válida
     if not nova_imagem_url.startswith(("http://", "https://")):
         await interaction.response.send_message("❌ A URL da imagem deve começar com 'http://' ou 'https://'.", ephemeral=True)
         return
 
-    async with aiosqlite.connect("eros.db") as db:
-        # Verifica se o personagem existe
-        cursor = await db.execute("SELECT 1 FROM personagens WHERE LOWER(nome) = LOWER(?)", (nome,))
-        if not await cursor.fetchone():
-            await interaction.response.send_message("❌ Personagem não encontrado!", ephemeral=True)
-            return
-
-        # Atualiza a imagem do personagem
-        await db.execute("UPDATE personagens SET imagem = ? WHERE LOWER(nome) = LOWER(?)", (nova_imagem_url, nome))
-        await db.commit()
+    # Atualiza a imagem do personagem, se ele existir; a nova imagem entra na fila de verificação
+    personagem = await bot.armazenamento.alterar_imagem(nome, nova_imagem_url)
+    if not personagem:
+        await interaction.response.send_message("❌ Personagem não encontrado!", ephemeral=True)
+        return
+    bot.imagem_verificada(personagem[0], quebrada=False, conquistado=personagem[1])
 
     await interaction.response.send_message(f"✅ A imagem de **{nome}** foi atualizada com sucesso!")
 
 # RANK
-@bot.tree.command(name="rank", description="🏆 Exibe o top 10 usuários com mais Eritos.")
-async def rank(interaction: discord.Interaction):
-    async with aiosqlite.connect("eros.db") as db:
-        # Consulta os 10 usuários com mais Eritos
-        cursor = await db.execute("""
-            SELECT usuario_id, eritos FROM moedas
-            ORDER BY eritos DESC
-            LIMIT 10
-        """)
-        top_usuarios = await cursor.fetchall()
-
-    if not top_usuarios:
+@bot.tree.command(name="rank", description="🏆 Exibe o ranking de usuários com mais Eritos.")
+async def rank(interaction: discord.Interaction, pagina: int = 1):
+    total_paginas = -(-len(bot.ranking) // 10)
+    if not total_paginas:
         await interaction.response.send_message("🏆 Nenhum usuário possui Eritos no momento.", ephemeral=True)
         return
 
+    if not 1 <= pagina <= total_paginas:
+        await interaction.response.send_message(f"❌ Escolha uma página entre 1 e {total_paginas}.", ephemeral=True)
+        return
+
+    # Os 10 usuários da página vêm do ranking em memória, sem consultar o banco
+    inicio = (pagina - 1) * 10
+    usuarios = bot.ranking.pagina(inicio, 10)
+    nomes = await bot.resolver_nomes([usuario_id for usuario_id, _ in usuarios])
+
     # Formata a lista de usuários
     lista_top = []
-    for posicao, (usuario_id, eritos) in enumerate(top_usuarios, start=1):
-        try:
-            usuario = await bot.fetch_user(usuario_id)  # Obtém o nome do usuário pelo ID
-            lista_top.append(f"{posicao}º: {usuario.name} - **{eritos}** Eritos")
-        except discord.NotFound:
-            # Se o usuário não for encontrado, exibe o ID
-            lista_top.append(f"{posicao}º: Usuário {usuario_id} - **{eritos}** Eritos")
+    for posicao, (usuario_id, eritos) in enumerate(usuarios, start=inicio + 1):
+        # Se o usuário não for encontrado, exibe o ID
+        nome = nomes[usuario_id] or f"Usuário {usuario_id}"
+        lista_top.append(f"{posicao}º: {nome} - **{eritos}** Eritos")
 
-    # Cria uma embed para exibir o top 10
+    # Cria uma embed para exibir a página do ranking
     embed = discord.Embed(
-        title="🏆 Top 10 mais ricos",
+        title="🏆 Top 10 mais ricos" if pagina == 1 else f"🏆 Mais ricos - página {pagina} de {total_paginas}",
         description="\n".join(lista_top),
         color=discord.Color.gold()
     )
+    minha_posicao = bot.ranking.posicao(interaction.user.id)
+    if minha_posicao:
+        embed.set_footer(text=f"Sua posição: {minha_posicao}º de {len(bot.ranking)}")
 
     await interaction.response.send_message(embed=embed)
 
 # Comando para definir vantagem específica de um personagem
 @bot.tree.command(name="definir_vantagem", description="[Dono] Define a vantagem de um personagem.")
+@app_commands.autocomplete(nome=autocompletar_personagem)
 async def definir_vantagem(interaction: discord.Interaction, nome: str, vantagem: int):
     if interaction.user.id != SEU_ID:
         await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
         return
 
-    async with aiosqlite.connect("eros.db") as db:
-        # Verifica se o personagem existe
-        cursor = await db.execute("SELECT 1 FROM personagens WHERE LOWER(nome) = LOWER(?)", (nome,))
-        if not await cursor.fetchone():
-            await interaction.response.send_message("❌ Personagem não encontrado!", ephemeral=True)
+    # Atualiza a vantagem do personagem, se ele existir
+    if not await bot.armazenamento.definir_vantagem(nome, vantagem):
+        await interaction.response.send_message("❌ Personagem não encontrado!", ephemeral=True)
+        return
+
+    await interaction.response.send_message(f"✅ A vantagem de **{nome}** foi definida como **{vantagem}**.")
+
+# Simular o jogo com o catálogo atual, para calibrar as vantagens (apenas para o dono do bot)
+@bot.tree.command(name="simular", description="[Dono] Simula jogadores paquerando o catálogo atual por alguns dias.")
+@app_commands.describe(atividade="Chance de cada jogador jogar a cada 18 horas (0 a 1)",
+                       todos="Usa o catálogo inteiro, como depois de um /resetar_status")
+async def simular(interaction: discord.Interaction, jogadores: int = 1000, dias: int = 30, atividade: float = 1.0, todos: bool = False):
+    if interaction.user.id != SEU_ID:
+        await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
+        return
+
+    if simulador.np is None:
+        await interaction.response.send_message("❌ O simulador requer NumPy: `pip install numpy`.", ephemeral=True)
+        return
+    if jogadores < 1 or dias < 1 or not 0 < atividade <= 1 or jogadores * dias > LIMITE_SIMULACAO:
+        await interaction.response.send_message(
+            f"❌ Use ao menos 1 jogador e 1 dia, atividade entre 0 e 1 e no máximo {LIMITE_SIMULACAO:,} jogadores × dias.",
+            ephemeral=True
+        )
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    vantagens = await bot.armazenamento.vantagens(todos)
+    # A simulação é só NumPy: roda em uma thread para não travar o loop de eventos
+    resultado = await asyncio.to_thread(simulador.simular, vantagens, jogadores, dias, LIMITE_TENTATIVAS, atividade)
+
+    embed = discord.Embed(
+        title="🧪 Simulação de equilíbrio",
+        description=f"{jogadores} jogadores × {dias} dias, atividade {atividade:.0%}",
+        color=discord.Color.purple()
+    )
+    for titulo, texto in resultado.secoes():
+        embed.add_field(name=titulo, value=texto[:1024], inline=False)
+    embed.set_footer(text=f"Simulado em {resultado.duracao:.2f}s")
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+# Cópias de segurança do banco, feitas com o bot ligado (apenas para o dono do bot)
+SEM_COPIAS = "❌ Não há cópias de segurança com o armazenamento em memória."
+
+def descrever_copias():
+    """Lista das cópias de segurança da partição atual, da mais recente à mais antiga."""
+    return "\n".join(
+        f"`{nome}` · {tamanho / 1024 / 1024:.1f} MB · <t:{int(momento)}:R>"
+        for nome, tamanho, momento in bot.copias.listar()
+    ) or "Nenhuma cópia ainda."
+
+async def autocompletar_copia(interaction: discord.Interaction, atual: str):
+    if interaction.user.id != SEU_ID or bot.copias is None:
+        return []
+    return [app_commands.Choice(name=nome, value=nome) for nome, _, _ in bot.copias.listar() if atual in nome][:25]
+
+@bot.tree.command(name="backup", description="[Dono] Faz uma cópia de segurança do banco agora e lista as cópias.")
+async def backup(interaction: discord.Interaction):
+    if interaction.user.id != SEU_ID:
+        await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
+        return
+    if bot.copias is None:
+        await interaction.response.send_message(SEM_COPIAS, ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        caminho = await bot.copias.fazer()
+    except copias.CopiaInvalida as erro:
+        await interaction.followup.send(f"❌ A cópia não passou na verificação de integridade: {erro}"[:2000], ephemeral=True)
+        return
+
+    _, paginas, duracao = bot.copias.ultima
+    embed = discord.Embed(
+        title="💾 Cópias de segurança",
+        description=descrever_copias()[:4096],
+        color=discord.Color.green()
+    )
+    embed.set_footer(text=f"{os.path.basename(caminho)}: {paginas} páginas copiadas e verificadas em {duracao:.1f}s")
+    await interaction.followup.send(embed=embed, ephemeral=True)
+
+@bot.tree.command(name="restaurar_backup", description="[Dono] Substitui o banco por uma cópia de segurança.")
+@app_commands.describe(arquivo="Cópia a restaurar; o banco atual é guardado antes em outra cópia")
+@app_commands.autocomplete(arquivo=autocompletar_copia)
+async def restaurar_backup(interaction: discord.Interaction, arquivo: str):
+    if interaction.user.id != SEU_ID:
+        await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
+        return
+    if bot.copias is None:
+        await interaction.response.send_message(SEM_COPIAS, ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    try:
+        anterior = await bot.restaurar_copia(arquivo)
+    except copias.CopiaInvalida as erro:
+        await interaction.followup.send(f"❌ Nada foi alterado: {erro}"[:2000], ephemeral=True)
+        return
+
+    await interaction.followup.send(
+        f"✅ Banco restaurado a partir de `{arquivo}`. O banco anterior foi guardado em `{os.path.basename(anterior)}`.",
+        ephemeral=True
+    )
+
+# Extrato de Eritos: páginas do histórico de um usuário, do lançamento mais recente ao mais antigo
+async def pagina_extrato(usuario_id, dono_id, antes_de=None):
+    """Monta o embed de uma página do extrato e a view com o botão dos lançamentos mais antigos (ou None na última)."""
+    lancamentos = await bot.armazenamento.historico_eritos(usuario_id, antes_de, extrato.POR_PAGINA + 1)
+    mais_antigos = len(lancamentos) > extrato.POR_PAGINA
+    lancamentos = lancamentos[:extrato.POR_PAGINA]
+    linhas = [
+        f"`#{lancamento_id}` <t:{ts}:d> **{delta:+d}** {motivo}" + (f" (ref. {referencia})" if referencia is not None else "")
+        for lancamento_id, ts, delta, motivo, referencia in lancamentos
+    ]
+    saldo = await bot.obter_eritos(usuario_id)
+    recalculado = await bot.armazenamento.recalcular_eritos(usuario_id)
+    embed = discord.Embed(
+        title="📒 Extrato de Eritos",
+        description=f"<@{usuario_id}>\n\n" + ("\n".join(linhas) or "Nenhum lançamento."),
+        color=discord.Color.gold()
+    )
+    embed.set_footer(text=f"Saldo: {saldo} · recalculado pelo extrato: {recalculado}"
+                          + ("" if saldo == recalculado else " ⚠️ divergente"))
+    view = view_persistente(BotaoExtrato(dono_id, usuario_id, lancamentos[-1][0])) if mais_antigos else None
+    return embed, view
+
+class BotaoExtrato(BotaoEros, discord.ui.DynamicItem[discord.ui.Button], template=r"eros:extrato:(?P<dono>\d+):(?P<usuario>\d+):(?P<antes>\d+)"):
+    """Botão ⏬ do /extrato; guarda quem pediu, o usuário auditado e o ID do último lançamento exibido."""
+    def __init__(self, dono_id, usuario_id, antes_de):
+        super().__init__(discord.ui.Button(
+            emoji="⏬", label="Mais antigos", style=discord.ButtonStyle.secondary,
+            custom_id=f"eros:extrato:{dono_id}:{usuario_id}:{antes_de}"
+        ))
+        self.dono_id = dono_id
+        self.usuario_id = usuario_id
+        self.antes_de = antes_de
+
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["dono"]), int(match["usuario"]), int(match["antes"]))
+
+    async def clicar(self, interaction: discord.Interaction):
+        if interaction.user.id != self.dono_id:
+            await interaction.response.send_message("❌ Esse não é o seu comando!", ephemeral=True)
             return
 
-        # Atualiza a vantagem do personagem
-        await db.execute("UPDATE personagens SET vantagem = ? WHERE LOWER(nome) = LOWER(?)", (vantagem, nome))
-        await db.commit()
+        embed, view = await pagina_extrato(self.usuario_id, self.dono_id, self.antes_de)
+        await interaction.response.edit_message(embed=embed, view=view)
 
-    await interaction.response.send_message(f"✅ A vantagem de **{nome}** foi definida como **{vantagem}**.")
+# Auditar as movimentações de Eritos de um usuário (apenas para o dono do bot)
+@bot.tree.command(name="extrato", description="[Dono] Exibe o histórico de Eritos de um usuário.")
+async def ver_extrato(interaction: discord.Interaction, usuario: discord.User):
+    if interaction.user.id != SEU_ID:
+        await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
+        return
 
-bot.run('SEU TOKEN') # Substitua pelo seu token
+    embed, view = await pagina_extrato(usuario.id, interaction.user.id)
+    await interaction.response.send_message(embed=embed, ephemeral=True, **({"view": view} if view else {}))
+
+# Métricas de desempenho dos comandos
+@bot.tree.command(name="metricas", description="[Dono] Exibe a latência dos comandos e do banco de dados.")
+async def metricas(interaction: discord.Interaction):
+    if interaction.user.id != SEU_ID:
+        await interaction.response.send_message("❌ Você não tem permissão para usar este comando!", ephemeral=True)
+        return
+
+    # Os comandos mais usados primeiro, com p50/p99 em ms e a média de consultas e tempo de banco por execução
+    linhas = []
+    for nome, estatisticas in sorted(bot.metricas.comandos.items(), key=lambda item: -item[1].duracao.total)[:20]:
+        total = estatisticas.duracao.total
+        linhas.append(
+            f"`{nome}` ×{total}: p50 ≤{estatisticas.duracao.percentil(0.5) * 1000:g} ms, "
+            f"p99 ≤{estatisticas.duracao.percentil(0.99) * 1000:g} ms, "
+            f"{estatisticas.consultas / total:.1f} consultas ({estatisticas.tempo_banco / total * 1000:.1f} ms de banco)"
+            + (f", {estatisticas.erros} erros" if estatisticas.erros else "")
+            + (f", {estatisticas.adiadas} adiadas, folga mínima {estatisticas.menor_folga * 1000:.0f} ms"
+               if estatisticas.adiadas else "")
+        )
+
+    embed = discord.Embed(
+        title="📈 Métricas",
+        description="\n".join(linhas) or "Nenhum comando executado ainda.",
+        color=discord.Color.blurple()
+    )
+    embed.add_field(name="Atraso do event loop", value=(
+        f"p99 ≤{bot.metricas.atraso_loop.percentil(0.99) * 1000:g} ms, máximo {bot.metricas.maior_atraso * 1000:.1f} ms"
+    ))
+    embed.add_field(name="Consultas lentas", value=str(bot.metricas.consultas_lentas))
+    todas = bot.metricas.comandos.values()
+    imediatas, adiadas = sum(e.imediatas for e in todas), sum(e.adiadas for e in todas)
+    menor_folga = min((e.menor_folga for e in todas if e.primeira_resposta.total), default=None)
+    embed.add_field(name="Respostas", value=(
+        f"{imediatas} imediatas, {adiadas} adiadas ({sum(e.automaticas for e in todas)} automaticamente), "
+        f"{sum(e.atrasadas for e in todas)} depois do prazo de 3 s"
+        + (f"; menor folga {menor_folga * 1000:.0f} ms" if menor_folga is not None else "")
+    ))
+    respostas = bot.respostas
+    consultas = respostas.acertos + respostas.falhas
+    embed.add_field(name="Cache de respostas", value=(
+        f"{respostas.acertos / max(consultas, 1):.0%} de acertos em {consultas} consultas; "
+        f"{respostas.desatualizadas} desatualizadas, {respostas.despejadas} despejadas; "
+        f"{len(respostas)} entradas ({respostas.bytes // 1024} KiB)"
+    ))
+    if bot.banco:
+        embed.add_field(name="Escritas", value=(
+            f"{bot.banco.pedidos_gravados} em {bot.banco.grupos} commits "
+            f"({bot.banco.pedidos_gravados / max(bot.banco.grupos, 1):.1f} por commit)"
+        ))
+    if bot.copias and bot.copias.copiando:
+        embed.add_field(name="Cópia de segurança", value=f"em andamento: {bot.copias.copiadas}/{bot.copias.total} páginas")
+    elif bot.copias and bot.copias.ultima:
+        caminho, paginas, duracao = bot.copias.ultima
+        embed.add_field(name="Cópia de segurança", value=f"`{os.path.basename(caminho)}`: {paginas} páginas em {duracao:.1f}s")
+    if bot.tempos_inicializacao:
+        embed.add_field(name="Inicialização", value="\n".join(
+            f"{etapa}: {segundos * 1000:.0f} ms" for etapa, segundos in bot.tempos_inicializacao.items()
+        ), inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+if __name__ == "__main__":
+    bot.run('SEU TOKEN') # Substitua pelo seu token
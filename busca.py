@@ -0,0 +1,101 @@
+"""Busca aproximada de personagens pelo nome, com o índice FTS5 de trigramas `personagens_busca`.
+
+O texto é dividido em pedaços e o índice traz os nomes que contêm algum pedaço inteiro (com o
+trigram, uma frase do FTS5 é uma busca de substring): com até ERROS_TOLERADOS erros de digitação,
+ao menos um pedaço continua intacto no nome certo. Os candidatos, ordenados pelo bm25 (quem contém
+mais pedaços vem antes), são reordenados em Python: nome igual, depois os que começam com o texto,
+os que o contêm e, por fim, os mais parecidos.
+
+Pedaços inteiros, e não trigramas soltos, mantêm a consulta seletiva: o custo acompanha o número
+de nomes parecidos, e não o tamanho do catálogo.
+"""
+import difflib
+from indices import chave_nome
+
+# Candidatos trazidos do índice antes de reordenar pela semelhança com o texto buscado
+CANDIDATOS = 50
+
+# Erros de digitação (letras trocadas, faltando ou sobrando) que a busca tolera em textos longos
+ERROS_TOLERADOS = 1
+
+# Sugestões de "você quis dizer" quando um nome não é encontrado, e a semelhança mínima (0 a 1) delas
+SUGESTOES = 3
+SEMELHANCA_MINIMA = 0.5
+
+# Filtros por situação do personagem; "meus" são os amores do usuário informado
+FILTROS = {
+    "todos": "1",
+    "disponiveis": "p.conquistado = 0 AND p.imagem_quebrada = 0",
+    "conquistados": "p.conquistado = 1",
+    "meus": "a.usuario_id = ?",
+}
+
+
+def _pedacos(chave):
+    """Divide o texto em até ERROS_TOLERADOS + 1 pedaços contíguos de pelo menos 3 caracteres (um trigrama)."""
+    quantidade = min(ERROS_TOLERADOS + 1, len(chave) // 3)
+    tamanho = len(chave) / quantidade
+    return list(dict.fromkeys(chave[round(i * tamanho):round((i + 1) * tamanho)] for i in range(quantidade)))
+
+
+def semelhanca(chave, nome):
+    """Semelhança entre 0 e 1 do texto buscado (já em `chave_nome`) com um nome."""
+    return difflib.SequenceMatcher(None, chave, chave_nome(nome)).ratio()
+
+
+def _ordem(chave, nome):
+    alvo = chave_nome(nome)
+    return alvo != chave, not alvo.startswith(chave), chave not in alvo, -semelhanca(chave, alvo), alvo
+
+
+async def buscar(banco, texto, filtro="todos", usuario_id=None, limite=10):
+    """Retorna até `limite` personagens `(id, nome, dono_id)` com nome parecido com `texto`, do mais parecido ao menos."""
+    chave = chave_nome(texto.strip())
+    if not chave:
+        return []
+    condicao = FILTROS[filtro]
+    parametros = (usuario_id,) if filtro == "meus" else ()
+    if len(chave) >= 3:
+        expressao = " OR ".join('"' + pedaco.replace('"', '""') + '"' for pedaco in _pedacos(chave))
+        linhas = await banco.consultar_todos(f"""
+            SELECT p.id, p.nome, a.usuario_id FROM personagens_busca b
+            JOIN personagens p ON p.id = b.rowid
+            LEFT JOIN amores a ON a.personagem_id = p.id
+            WHERE personagens_busca MATCH ? AND {condicao}
+            ORDER BY b.rank LIMIT ?
+        """, (expressao, *parametros, CANDIDATOS))
+    else:
+        # Menos de 3 caracteres não formam um trigrama: busca por prefixo no índice da coluna `nome`
+        prefixo = chave.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        linhas = await banco.consultar_todos(f"""
+            SELECT p.id, p.nome, a.usuario_id FROM personagens p
+            LEFT JOIN amores a ON a.personagem_id = p.id
+            WHERE p.nome LIKE ? ESCAPE '\\' AND {condicao}
+            ORDER BY p.nome LIMIT ?
+        """, (prefixo + "%", *parametros, CANDIDATOS))
+    linhas.sort(key=lambda linha: _ordem(chave, linha[1]))
+    return linhas[:limite]
+
+
+def buscar_em(personagens, texto, limite=10):
+    """Como `buscar`, sobre `(id, nome, dono_id)` já filtrados em memória: sem o índice, cada nome é
+    comparado com os pedaços do texto, e todos os que contêm algum são reordenados."""
+    chave = chave_nome(texto.strip())
+    if not chave:
+        return []
+    if len(chave) >= 3:
+        pedacos = _pedacos(chave)
+        linhas = [linha for linha in personagens if any(pedaco in chave_nome(linha[1]) for pedaco in pedacos)]
+    else:
+        linhas = [linha for linha in personagens if chave_nome(linha[1]).startswith(chave)]
+    linhas.sort(key=lambda linha: _ordem(chave, linha[1]))
+    return linhas[:limite]
+
+
+async def sugestoes(armazenamento, texto, filtro="todos", usuario_id=None):
+    """Nomes parecidos com `texto` para um "você quis dizer", sem o próprio texto."""
+    chave = chave_nome(texto.strip())
+    return [
+        nome for _, nome, _ in await armazenamento.buscar_personagens(texto, filtro, usuario_id, SUGESTOES + 1)
+        if chave_nome(nome) != chave and (chave in chave_nome(nome) or semelhanca(chave, nome) >= SEMELHANCA_MINIMA)
+    ][:SUGESTOES]
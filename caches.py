@@ -0,0 +1,132 @@
+import time
+from collections import OrderedDict
+
+
+class CacheNomes:
+    """Cache LRU com expiração de IDs de usuário para nomes de exibição."""
+
+    def __init__(self, capacidade=2048, validade=3600):
+        self.capacidade = capacidade
+        self.validade = validade  # Segundos até um nome precisar ser resolvido de novo
+        self._entradas = OrderedDict()
+
+    def obter(self, usuario_id):
+        """Retorna (encontrado, nome); `nome` pode ser None para usuários que não existem mais."""
+        entrada = self._entradas.get(usuario_id)
+        if entrada is None:
+            return False, None
+        nome, expira_em = entrada
+        if expira_em < time.monotonic():
+            del self._entradas[usuario_id]
+            return False, None
+        self._entradas.move_to_end(usuario_id)
+        return True, nome
+
+    def guardar(self, usuario_id, nome):
+        self._entradas[usuario_id] = (nome, time.monotonic() + self.validade)
+        self._entradas.move_to_end(usuario_id)
+        while len(self._entradas) > self.capacidade:
+            self._entradas.popitem(last=False)
+
+
+class MarcasComValidade:
+    """Chaves lembradas por `validade` segundos depois de marcadas. As expiradas saem na próxima
+    marcação, então o tamanho fica limitado às marcações feitas dentro de um período de validade."""
+
+    def __init__(self, validade):
+        self.validade = validade
+        self._entradas = OrderedDict()  # chave -> instante em que expira, na ordem de marcação
+
+    def __contains__(self, chave):
+        expira_em = self._entradas.get(chave)
+        return expira_em is not None and expira_em >= time.monotonic()
+
+    def marcar(self, chave):
+        """Marca a chave; retorna False se ela já estava marcada e ainda não tinha expirado."""
+        agora = time.monotonic()
+        # A validade é a mesma para todas, então as mais antigas expiram primeiro
+        while self._entradas and next(iter(self._entradas.values())) < agora:
+            self._entradas.popitem(last=False)
+        if chave in self._entradas:
+            return False
+        self._entradas[chave] = agora + self.validade
+        return True
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+class CacheRespostas:
+    """Cache LRU das consultas dos comandos de leitura, limitado em entradas e em tamanho aproximado.
+
+    Cada entrada depende de entidades (ex.: `("eritos", usuario_id)`). As escritas chamam `invalidar`,
+    que marca as entidades com o próximo valor de um relógio; uma entrada lida antes dessa marca
+    está desatualizada e é descartada na próxima leitura, sem varrer o cache."""
+
+    def __init__(self, capacidade=4096, limite_bytes=8 * 1024 * 1024):
+        self.capacidade = capacidade
+        self.limite_bytes = limite_bytes  # Soma do comprimento do repr dos valores guardados
+        self._entradas = OrderedDict()  # chave -> (valor, dependências, marca, tamanho)
+        self._modificadas = {}  # entidade -> relógio da última invalidação
+        self._relogio = 0
+        self._piso = 0  # Marca assumida para entidades esquecidas ao compactar `_modificadas`
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.desatualizadas = 0
+        self.despejadas = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def marca(self):
+        """Marca a tomar antes de consultar o banco; passe-a a `guardar` junto com o resultado."""
+        return self._relogio
+
+    def obter(self, chave):
+        """Retorna (encontrado, valor), descartando a entrada se alguma dependência mudou."""
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            valor, dependencias, marca, _ = entrada
+            if all(self._modificadas.get(entidade, self._piso) <= marca for entidade in dependencias):
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return True, valor
+            self._remover(chave)
+            self.desatualizadas += 1
+        self.falhas += 1
+        return False, None
+
+    def guardar(self, chave, valor, dependencias, marca):
+        """Guarda o resultado de uma consulta feita depois de `marca`; descarta-o se ele já nasceu desatualizado."""
+        if any(self._modificadas.get(entidade, self._piso) > marca for entidade in dependencias):
+            return
+        if chave in self._entradas:
+            self._remover(chave)
+        tamanho = len(repr(valor))
+        self._entradas[chave] = (valor, tuple(dependencias), marca, tamanho)
+        self.bytes += tamanho
+        while len(self._entradas) > self.capacidade or self.bytes > self.limite_bytes:
+            self._remover(next(iter(self._entradas)))
+            self.despejadas += 1
+
+    def invalidar(self, *entidades):
+        """Marca as entidades como alteradas; chame depois do COMMIT da escrita."""
+        self._relogio += 1
+        for entidade in entidades:
+            self._modificadas[entidade] = self._relogio
+        if len(self._modificadas) > 4 * self.capacidade:
+            # Esquece as marcas individuais: tudo o que foi guardado até agora passa a ser desatualizado
+            self._modificadas.clear()
+            self._piso = self._relogio
+
+    def limpar(self):
+        """Descarta todas as entradas (ex.: depois de recarregar os índices)."""
+        self._entradas.clear()
+        self.bytes = 0
+        self._relogio += 1
+        self._modificadas.clear()
+        self._piso = self._relogio
+
+    def _remover(self, chave):
+        self.bytes -= self._entradas.pop(chave)[3]
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from expiracoes import AgendadorExpiracoes
+
+log = logging.getLogger(__name__)
+
+# Intervalo, em segundos, entre as descargas dos cooldowns alterados para o banco.
+# É também a janela de durabilidade: se o processo cair sem fechar o bot, no máximo
+# os últimos INTERVALO_DESCARGA segundos de alterações de cooldown são perdidos.
+# No desligamento normal (`parar`) tudo o que estiver pendente é gravado.
+INTERVALO_DESCARGA = 5
+
+
+class RegistroCooldown:
+    """Estado de cooldown de um usuário, com os horários em segundos desde a época (0 = nunca)."""
+    __slots__ = ("tentativas", "tempo", "ultimo_casamento", "ultimo_coletar")
+
+    def __init__(self, tentativas=0, tempo=0, ultimo_casamento=0, ultimo_coletar=0):
+        self.tentativas = tentativas
+        self.tempo = tempo
+        self.ultimo_casamento = ultimo_casamento
+        self.ultimo_coletar = ultimo_coletar
+
+
+class CacheCooldowns:
+    """Cooldowns mantidos em memória e gravados no armazenamento em lotes (write-behind).
+
+    As tentativas de paquera são zeradas pelo agendador quando o prazo (`tempo`) vence, então
+    consultar um cooldown nunca grava nada."""
+
+    def __init__(self, armazenamento, ao_liberar=None):
+        self.armazenamento = armazenamento
+        self.ao_liberar = ao_liberar  # `ao_liberar([(usuario_id, tentativas)])`, com as tentativas antes de zerar
+        self.expiracoes = AgendadorExpiracoes(self._expirar)
+        self._registros = {}
+        self._sujos = set()
+        self._trava = asyncio.Lock()  # Serializa descargas e o reset geral
+        self._tarefa = None
+        self.geracao = 0  # ID do último reset pedido; gravado em `geracao_reset`
+
+    async def carregar(self):
+        """Lê todos os cooldowns para a memória, sem os que um reset pendente ainda vai zerar."""
+        self.geracao, linhas = await self.armazenamento.carregar_cooldowns()
+        self._registros = {usuario_id: RegistroCooldown(*registro) for usuario_id, *registro in linhas}
+        self._sujos.clear()
+        # Prazos já vencidos (bot desligado) são processados no primeiro ciclo do agendador
+        self.expiracoes.limpar()
+        for usuario_id, registro in self._registros.items():
+            if registro.tempo:
+                self.expiracoes.agendar(usuario_id, registro.tempo)
+
+    def obter(self, usuario_id):
+        """Retorna o registro do usuário, ou None se ele nunca usou um comando com cooldown."""
+        return self._registros.get(usuario_id)
+
+    def alterar(self, usuario_id):
+        """Retorna o registro do usuário (criando-o se preciso) e o marca para a próxima descarga."""
+        registro = self._registros.get(usuario_id)
+        if registro is None:
+            registro = self._registros[usuario_id] = RegistroCooldown()
+        self._sujos.add(usuario_id)
+        return registro
+
+    def definir_prazo(self, usuario_id, registro, prazo):
+        """Define até quando valem as tentativas do usuário e agenda o reset delas."""
+        registro.tempo = prazo
+        self.expiracoes.agendar(usuario_id, prazo)
+
+    def _expirar(self, usuarios):
+        """Zera em lote as tentativas dos usuários cujo prazo venceu; a próxima descarga grava todos juntos."""
+        agora = time.time()
+        liberados = []
+        for usuario_id in usuarios:
+            registro = self._registros.get(usuario_id)
+            if registro is None or not registro.tempo or registro.tempo > agora:
+                continue
+            liberados.append((usuario_id, registro.tentativas))
+            registro.tentativas = 0
+            registro.tempo = 0
+            self._sujos.add(usuario_id)
+        if liberados and self.ao_liberar:
+            self.ao_liberar(liberados)
+
+    def iniciar(self):
+        """Inicia a tarefa que descarrega as alterações periodicamente e o agendador dos prazos."""
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._descarregar_periodicamente())
+        self.expiracoes.iniciar()
+
+    async def parar(self):
+        """Interrompe as tarefas periódicas e grava o que estiver pendente."""
+        await self.expiracoes.parar()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        await self.descarregar()
+
+    async def _descarregar_periodicamente(self):
+        while True:
+            await asyncio.sleep(INTERVALO_DESCARGA)
+            try:
+                await self.descarregar()
+            except Exception:
+                log.exception("Falha ao gravar os cooldowns; nova tentativa na próxima descarga")
+
+    async def descarregar(self):
+        """Grava todos os registros alterados em uma única transação."""
+        async with self._trava:
+            if not self._sujos:
+                return
+            sujos, self._sujos = self._sujos, set()
+            linhas = []
+            for usuario_id in sujos:
+                registro = self._registros.get(usuario_id)
+                if registro is not None:
+                    linhas.append((usuario_id, registro.tentativas, registro.tempo,
+                                   registro.ultimo_casamento, registro.ultimo_coletar))
+            try:
+                await self.armazenamento.gravar_cooldowns(linhas, self.geracao)
+            except BaseException:
+                # Mantém os registros pendentes para a próxima descarga
+                self._sujos |= sujos
+                raise
+
+    async def resetar_todos(self, tarefas, referencia=None):
+        """Zera todos os cooldowns na memória e agenda o reset do banco em `tarefas`; retorna os IDs das tarefas."""
+        async with self._trava:
+            # A memória é limpa antes de qualquer await, então nenhum comando enxerga um estado
+            # intermediário. Nenhuma descarga acontece até a tarefa existir, então tudo o que for
+            # gravado depois leva a geração do novo reset e é preservado por ele.
+            self._registros.clear()
+            self._sujos.clear()
+            self.expiracoes.limpar()
+            ids = await tarefas.criar(["cooldowns"], referencia)
+            self.geracao = ids[0]
+        return ids
@@ -0,0 +1,298 @@
+"""Cópias de segurança do banco com o bot ligado, pela API de backup online do SQLite.
+
+A cópia é feita em uma thread, em passos de PAGINAS_POR_PASSO páginas com uma pausa entre eles,
+então nem o loop de eventos nem o escritor ficam parados esperando por ela. A conexão de origem
+mantém uma transação de leitura aberta durante a cópia inteira: no WAL, isso fixa o instante
+copiado e os commits do bot não fazem a cópia recomeçar (sem ela, a API de backup recomeça do
+zero a cada escrita de outra conexão e, com o bot ativo, nunca termina). Cada cópia passa pelo
+`PRAGMA integrity_check` antes de ser compactada com gzip; só as MANTER_COPIAS mais recentes ficam.
+
+A verificação e a compactação disputam a CPU com o loop de eventos; no Linux a thread das cópias
+roda com a menor prioridade do sistema, e os comandos passam na frente dela.
+
+Uso pela linha de comando:
+    python copias.py fazer [--banco eros.db]                (com o bot ligado ou não)
+    python copias.py restaurar ARQUIVO [--banco eros.db]    (com o bot desligado; veja /restaurar_backup)
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import contextlib
+import functools
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# Pasta das cópias; cada banco tem sua própria subpasta, com o nome do arquivo
+PASTA_COPIAS = "backups"
+
+# Intervalo entre as cópias automáticas e quantas cópias de cada banco são mantidas
+INTERVALO_COPIAS = 6 * 60 * 60
+MANTER_COPIAS = 7
+
+# Páginas copiadas por passo (1 MB com páginas de 4 KB) e a pausa entre os passos
+PAGINAS_POR_PASSO = 256
+PAUSA_ENTRE_PASSOS = 0.005
+
+# Nível do gzip: o 9 leva várias vezes mais tempo para compactar só um pouco mais
+NIVEL_COMPACTACAO = 6
+
+EXTENSAO = ".db.gz"
+
+# Prioridade (nice) da thread das cópias: 19 é a mais baixa
+PRIORIDADE = 19
+
+
+def _baixar_prioridade():
+    # No Linux cada thread tem sua própria prioridade; em outros sistemas isso mudaria o processo inteiro
+    if sys.platform.startswith("linux"):
+        with contextlib.suppress(OSError):
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PRIORIDADE)
+
+
+# Uma thread só, de baixa prioridade, para todas as cópias e restaurações: as cópias de partições
+# diferentes esperam a vez em vez de disputar o disco
+_EXECUTOR = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="copias", initializer=_baixar_prioridade)
+
+
+def em_segundo_plano(funcao, *args, **kwargs):
+    """Roda `funcao` na thread das cópias; retorna um futuro do asyncio."""
+    return asyncio.get_running_loop().run_in_executor(_EXECUTOR, functools.partial(funcao, *args, **kwargs))
+
+
+class CopiaCancelada(Exception):
+    """A cópia foi interrompida por `CopiasDeSeguranca.parar`."""
+
+
+class CopiaInvalida(Exception):
+    """A cópia não passou no `PRAGMA integrity_check` ou não é um banco SQLite."""
+
+
+def verificar_integridade(caminho):
+    """Roda o `PRAGMA integrity_check` no banco; levanta CopiaInvalida se ele acusar problemas."""
+    try:
+        with contextlib.closing(sqlite3.connect(f"file:{caminho}?mode=ro", uri=True)) as db:
+            problemas = [linha for (linha,) in db.execute("PRAGMA integrity_check")]
+    except sqlite3.DatabaseError as erro:
+        raise CopiaInvalida(str(erro)) from erro
+    if problemas != ["ok"]:
+        raise CopiaInvalida("; ".join(problemas[:5]))
+
+
+def copiar(caminho_banco, destino, paginas=PAGINAS_POR_PASSO, pausa=PAUSA_ENTRE_PASSOS, ao_progredir=None, cancelar=None):
+    """Copia o banco para `destino` (sem compactar) em passos de `paginas` páginas; retorna o total de páginas.
+
+    Bloqueante: rode em uma thread. `ao_progredir(copiadas, total)` é chamado após cada passo, e a
+    cópia é interrompida com CopiaCancelada se o evento `cancelar` for ativado."""
+    def progredir(status, restantes, total):
+        if ao_progredir is not None:
+            ao_progredir(total - restantes, total)
+        if cancelar is not None and cancelar.is_set():
+            raise CopiaCancelada()
+        time.sleep(pausa)
+
+    with contextlib.closing(sqlite3.connect(caminho_banco, isolation_level=None)) as origem, \
+            contextlib.closing(sqlite3.connect(destino)) as copia:
+        origem.execute("PRAGMA query_only = ON")
+        # Abre a transação de leitura que fixa o instante copiado até o fim da cópia
+        origem.execute("BEGIN")
+        origem.execute("SELECT COUNT(*) FROM sqlite_schema").fetchall()
+        try:
+            origem.backup(copia, pages=paginas, progress=progredir)
+        except sqlite3.OperationalError as erro:
+            # A exceção do `progredir` chega embrulhada pelo módulo sqlite3
+            if cancelar is not None and cancelar.is_set():
+                raise CopiaCancelada() from erro
+            raise
+        finally:
+            origem.execute("COMMIT")
+        (total,) = copia.execute("PRAGMA page_count").fetchone()
+        # A cópia é lida sozinha, de um arquivo só: sem o WAL herdado da origem
+        copia.execute("PRAGMA journal_mode = DELETE")
+    return total
+
+
+def compactar(origem, destino):
+    """Compacta `origem` com gzip em `destino`."""
+    with open(origem, "rb") as entrada, gzip.open(destino, "wb", compresslevel=NIVEL_COMPACTACAO) as saida:
+        shutil.copyfileobj(entrada, saida, 1024 * 1024)
+
+
+def descompactar(origem, destino):
+    """Descompacta a cópia `origem` em `destino`; levanta CopiaInvalida se o gzip estiver corrompido."""
+    try:
+        with gzip.open(origem, "rb") as entrada, open(destino, "wb") as saida:
+            shutil.copyfileobj(entrada, saida, 1024 * 1024)
+    except (OSError, EOFError) as erro:
+        raise CopiaInvalida(f"arquivo compactado corrompido: {erro}") from erro
+
+
+def pasta_do_banco(caminho_banco, pasta=PASTA_COPIAS):
+    """Subpasta das cópias de um banco: `backups/eros` para `eros.db`."""
+    return os.path.join(pasta, os.path.splitext(os.path.basename(caminho_banco))[0])
+
+
+def listar(caminho_banco, pasta=PASTA_COPIAS):
+    """Cópias do banco `(nome, tamanho em bytes, momento)`, da mais recente à mais antiga."""
+    pasta = pasta_do_banco(caminho_banco, pasta)
+    with contextlib.suppress(FileNotFoundError):
+        copias = []
+        for entrada in os.scandir(pasta):
+            if entrada.name.endswith(EXTENSAO) and entrada.is_file():
+                estado = entrada.stat()
+                copias.append((entrada.name, estado.st_size, estado.st_mtime))
+        return sorted(copias, key=lambda copia: (copia[2], copia[0]), reverse=True)
+    return []
+
+
+def fazer_copia(caminho_banco, pasta=PASTA_COPIAS, prefixo="", manter=MANTER_COPIAS, **opcoes):
+    """Copia, verifica, compacta e rotaciona; retorna `(caminho da cópia, páginas)`. Bloqueante: rode em uma thread.
+
+    `opcoes` vão para `copiar`. Nada fica pela metade: os arquivos temporários são removidos em
+    caso de falha, e a cópia compactada só recebe o nome final depois de pronta."""
+    pasta = pasta_do_banco(caminho_banco, pasta)
+    os.makedirs(pasta, exist_ok=True)
+    nome = f"{prefixo}{time.strftime('%Y%m%d-%H%M%S')}"
+    temporaria = os.path.join(pasta, f".{nome}.db")
+    destino = os.path.join(pasta, nome + EXTENSAO)
+    try:
+        paginas = copiar(caminho_banco, temporaria, **opcoes)
+        verificar_integridade(temporaria)
+        compactar(temporaria, destino + ".parcial")
+        os.replace(destino + ".parcial", destino)
+    finally:
+        for arquivo in (temporaria, destino + ".parcial"):
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(arquivo)
+    for antiga, _, _ in listar(caminho_banco, os.path.dirname(pasta))[manter:]:
+        os.remove(os.path.join(pasta, antiga))
+    return destino, paginas
+
+
+def preparar_restauracao(caminho_banco, nome, pasta=PASTA_COPIAS):
+    """Descompacta a cópia `nome` ao lado do banco e verifica a integridade; retorna o arquivo pronto para `substituir`.
+
+    Bloqueante: rode em uma thread. Pode ser feito com o bot ligado; só `substituir` exige o banco fechado."""
+    if os.path.basename(nome) != nome or not nome.endswith(EXTENSAO):
+        raise CopiaInvalida(f"nome de cópia inválido: {nome}")
+    origem = os.path.join(pasta_do_banco(caminho_banco, pasta), nome)
+    if not os.path.exists(origem):
+        raise CopiaInvalida(f"cópia não encontrada: {nome}")
+    preparado = caminho_banco + ".restauracao"
+    try:
+        descompactar(origem, preparado)
+        verificar_integridade(preparado)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(preparado)
+        raise
+    return preparado
+
+
+def substituir(caminho_banco, preparado):
+    """Troca o arquivo do banco pelo `preparado`; o banco precisa estar fechado (sem nenhuma conexão)."""
+    # Um -wal ou -shm que sobrou seria aplicado por cima da cópia restaurada
+    for sufixo in ("-wal", "-shm"):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(caminho_banco + sufixo)
+    os.replace(preparado, caminho_banco)
+
+
+class CopiasDeSeguranca:
+    """Cópias periódicas de um banco, feitas em segundo plano, e as cópias pedidas pelo /backup."""
+
+    def __init__(self, caminho_banco, pasta=PASTA_COPIAS):
+        self.caminho_banco = caminho_banco
+        self.pasta = pasta
+        self.copiadas = 0  # Progresso da cópia em andamento, em páginas
+        self.total = 0
+        self.ultima = None  # `(caminho, páginas, duração em segundos)` da última cópia desta execução
+        self._trava = asyncio.Lock()
+        self._cancelar = threading.Event()
+        self._em_andamento = None  # Thread da cópia atual, que segue rodando se a tarefa que a pediu for cancelada
+        self._tarefa = None
+
+    @property
+    def copiando(self):
+        return self._em_andamento is not None and not self._em_andamento.done()
+
+    def iniciar(self):
+        if self._tarefa is None:
+            self._cancelar.clear()
+            self._tarefa = asyncio.create_task(self._copiar_periodicamente())
+
+    async def parar(self):
+        """Interrompe a tarefa periódica e a cópia em andamento, esperando a thread dela terminar."""
+        self._cancelar.set()
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        if self._em_andamento is not None:
+            await asyncio.wait([self._em_andamento])
+            # Sem ninguém mais esperando pela cópia, o CopiaCancelada dela é só recolhido
+            if not self._em_andamento.cancelled():
+                self._em_andamento.exception()
+
+    async def _copiar_periodicamente(self):
+        while True:
+            # Depois de um reinício, a próxima cópia respeita o intervalo desde a última já feita
+            copias = listar(self.caminho_banco, self.pasta)
+            desde_a_ultima = time.time() - copias[0][2] if copias else INTERVALO_COPIAS
+            await asyncio.sleep(max(INTERVALO_COPIAS - desde_a_ultima, 0))
+            try:
+                await self.fazer()
+            except Exception:
+                log.exception("Falha na cópia de segurança de %s; nova tentativa no próximo ciclo", self.caminho_banco)
+                await asyncio.sleep(INTERVALO_COPIAS)
+
+    def _progredir(self, copiadas, total):
+        # Chamado da thread da cópia; só grava dois inteiros
+        self.copiadas, self.total = copiadas, total
+
+    async def fazer(self, prefixo=""):
+        """Faz uma cópia agora (esperando a que estiver em andamento) e retorna o caminho dela."""
+        async with self._trava:
+            inicio = time.perf_counter()
+            self.copiadas = self.total = 0
+            self._em_andamento = em_segundo_plano(
+                fazer_copia, self.caminho_banco, self.pasta, prefixo,
+                ao_progredir=self._progredir, cancelar=self._cancelar
+            )
+            caminho, paginas = await asyncio.shield(self._em_andamento)
+            self.ultima = (caminho, paginas, time.perf_counter() - inicio)
+            log.info("Cópia de segurança %s: %d páginas em %.1f s", caminho, paginas, self.ultima[2])
+            return caminho
+
+    def listar(self):
+        return listar(self.caminho_banco, self.pasta)
+
+
+def _principal(argumentos):
+    if argumentos.acao == "fazer":
+        caminho, paginas = fazer_copia(argumentos.banco, argumentos.pasta)
+        print(f"Cópia verificada: {caminho} ({paginas} páginas)")
+        return
+    preparado = preparar_restauracao(argumentos.banco, argumentos.arquivo, argumentos.pasta)
+    if os.path.exists(argumentos.banco):
+        caminho, _ = fazer_copia(argumentos.banco, argumentos.pasta, "antes-da-restauracao-")
+        print(f"Banco atual guardado em {caminho}")
+    substituir(argumentos.banco, preparado)
+    print(f"{argumentos.banco} restaurado a partir de {argumentos.arquivo}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cópias de segurança do banco de dados do bot.")
+    parser.add_argument("--banco", default="eros.db", help="Arquivo do banco de dados (padrão: eros.db)")
+    parser.add_argument("--pasta", default=PASTA_COPIAS, help=f"Pasta das cópias (padrão: {PASTA_COPIAS})")
+    acoes = parser.add_subparsers(dest="acao", required=True)
+    acoes.add_parser("fazer", help="Faz uma cópia verificada e compactada")
+    restaurar = acoes.add_parser("restaurar", help="Substitui o banco por uma cópia (com o bot desligado)")
+    restaurar.add_argument("arquivo", help="Nome da cópia, como listado pelo /backup")
+    _principal(parser.parse_args())
@@ -0,0 +1,78 @@
+import asyncio
+import heapq
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# Espera máxima entre duas verificações, para acompanhar ajustes no relógio do sistema
+ESPERA_MAXIMA = 60
+
+# Prazos que vencem até AGRUPAMENTO segundos depois do primeiro são entregues no mesmo lote
+AGRUPAMENTO = 1
+
+
+class AgendadorExpiracoes:
+    """Fila de prazos (heap) que entrega em lote as chaves cujo prazo passou.
+
+    Reagendar uma chave não remove a entrada antiga do heap: ela é descartada ao sair,
+    quando não corresponde mais ao prazo atual da chave."""
+
+    def __init__(self, ao_expirar):
+        self.ao_expirar = ao_expirar  # `ao_expirar(chaves)`, chamado com todas as chaves vencidas de uma vez
+        self._heap = []
+        self._prazos = {}
+        self._acordar = None  # Futuro que interrompe a espera atual do agendador
+        self._tarefa = None
+
+    def __len__(self):
+        return len(self._prazos)
+
+    def agendar(self, chave, prazo):
+        """Define o prazo da chave, em segundos desde a época (substitui o anterior)."""
+        self._prazos[chave] = prazo
+        heapq.heappush(self._heap, (prazo, chave))
+        if len(self._heap) > 2 * len(self._prazos) + 1024:
+            # Muitas entradas antigas acumuladas: reconstrói o heap só com os prazos atuais
+            self._heap = [(prazo, chave) for chave, prazo in self._prazos.items()]
+            heapq.heapify(self._heap)
+        if self._heap[0][1] == chave and self._acordar is not None and not self._acordar.done():
+            self._acordar.set_result(None)  # O novo prazo é o próximo: a espera atual é longa demais
+
+    def limpar(self):
+        self._heap.clear()
+        self._prazos.clear()
+
+    def iniciar(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+    def vencidas(self, agora=None):
+        """Retira do heap e retorna as chaves com prazo até `agora`."""
+        agora = time.time() if agora is None else agora
+        chaves = []
+        while self._heap and self._heap[0][0] <= agora:
+            prazo, chave = heapq.heappop(self._heap)
+            if self._prazos.get(chave) == prazo:
+                del self._prazos[chave]
+                chaves.append(chave)
+        return chaves
+
+    async def _executar(self):
+        while True:
+            espera = min(self._heap[0][0] + AGRUPAMENTO - time.time(), ESPERA_MAXIMA) if self._heap else ESPERA_MAXIMA
+            if espera > 0:
+                # asyncio.wait, e não wait_for: um cancelamento simultâneo ao aviso nunca é perdido
+                self._acordar = asyncio.get_running_loop().create_future()
+                await asyncio.wait([self._acordar], timeout=espera)
+            chaves = self.vencidas()
+            if chaves:
+                try:
+                    self.ao_expirar(chaves)
+                except Exception:
+                    log.exception("Falha ao processar %d prazos vencidos", len(chaves))
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+# A cada INTERVALO_SNAPSHOT segundos, os saldos de quem teve lançamentos desde a última fotografia são
+# fotografados; recalcular um saldo soma no máximo os lançamentos desse intervalo
+INTERVALO_SNAPSHOT = 60 * 60
+
+# Lançamentos por página no /extrato
+POR_PAGINA = 10
+
+
+async def lancar(db, lancamentos):
+    """Grava `(usuario_id, delta, motivo, referencia)` no extrato, dentro da transação `db` que altera os saldos.
+
+    Deltas zerados são ignorados."""
+    agora = int(time.time())
+    await db.executemany(
+        "INSERT INTO extrato (ts, usuario_id, delta, motivo, referencia) VALUES (?, ?, ?, ?, ?)",
+        [(agora, usuario_id, delta, motivo, referencia) for usuario_id, delta, motivo, referencia in lancamentos if delta]
+    )
+
+
+async def zerar_saldos(db, inicio, fim, ate_extrato, motivo, referencia=None):
+    """Zera, na transação `db`, os saldos das linhas de `moedas` com rowid em (inicio, fim], lançando o estorno.
+
+    Só é estornado o saldo até o lançamento `ate_extrato`: o que o usuário ganhou ou gastou depois
+    (durante um reset feito aos poucos) é mantido. Retorna `(usuario_id, novo saldo)` dos alterados."""
+    cursor = await db.execute("""
+        SELECT m.usuario_id, m.eritos, COALESCE((
+            SELECT SUM(e.delta) FROM extrato e WHERE e.usuario_id = m.usuario_id AND e.id > ?
+        ), 0)
+        FROM moedas m WHERE m.rowid > ? AND m.rowid <= ?
+    """, (ate_extrato, inicio, fim))
+    # O que foi gasto depois pode ter saído do saldo antigo; nesse caso o saldo fica zerado
+    novos = [(usuario_id, eritos, max(posterior, 0)) for usuario_id, eritos, posterior in await cursor.fetchall()]
+    novos = [(usuario_id, eritos, novo) for usuario_id, eritos, novo in novos if novo != eritos]
+    await db.executemany("UPDATE moedas SET eritos = ? WHERE usuario_id = ?",
+                         [(novo, usuario_id) for usuario_id, _, novo in novos])
+    await lancar(db, [(usuario_id, novo - eritos, motivo, referencia) for usuario_id, eritos, novo in novos])
+    return [(usuario_id, novo) for usuario_id, _, novo in novos]
+
+
+class Extrato:
+    """Consultas ao extrato de Eritos e a tarefa que fotografa os saldos periodicamente."""
+
+    def __init__(self, banco):
+        self.banco = banco
+        self._tarefa = None
+
+    def iniciar(self):
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._fotografar_periodicamente())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+    async def _fotografar_periodicamente(self):
+        while True:
+            await asyncio.sleep(INTERVALO_SNAPSHOT)
+            try:
+                await self.fotografar()
+            except Exception:
+                log.exception("Falha ao fotografar os saldos; nova tentativa no próximo ciclo")
+
+    async def fotografar(self):
+        """Grava o saldo atual de quem teve lançamentos desde a última fotografia; retorna quantos foram gravados."""
+        async with self.banco.transacao() as db:
+            cursor = await db.execute("SELECT valor FROM metadados WHERE chave = 'extrato_snapshot_ate'")
+            linha = await cursor.fetchone()
+            desde = int(linha[0]) if linha else 0
+            cursor = await db.execute("SELECT MAX(id) FROM extrato")
+            (ate,) = await cursor.fetchone()
+            if ate is None or ate <= desde:
+                return 0
+            # Dentro da transação de escrita nenhum lançamento novo aparece, então `moedas` é o saldo após `ate`
+            cursor = await db.execute("""
+                INSERT INTO saldos_snapshot (usuario_id, ate_id, saldo)
+                SELECT e.usuario_id, MAX(e.id), COALESCE(m.eritos, 0)
+                FROM extrato e LEFT JOIN moedas m ON m.usuario_id = e.usuario_id
+                WHERE e.id > ? GROUP BY e.usuario_id
+                ON CONFLICT(usuario_id) DO UPDATE SET ate_id = excluded.ate_id, saldo = excluded.saldo
+            """, (desde,))
+            fotografados = cursor.rowcount
+            await db.execute("""
+                INSERT INTO metadados (chave, valor) VALUES ('extrato_snapshot_ate', ?)
+                ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor
+            """, (ate,))
+        return fotografados
+
+    async def recalcular(self, usuario_id):
+        """Saldo do usuário refeito a partir da última fotografia e dos lançamentos posteriores."""
+        # Uma única consulta, para que a fotografia e os lançamentos venham do mesmo instante
+        (saldo,) = await self.banco.consultar_um("""
+            SELECT COALESCE(s.saldo, 0) + COALESCE((
+                SELECT SUM(e.delta) FROM extrato e WHERE e.usuario_id = u.id AND e.id > COALESCE(s.ate_id, 0)
+            ), 0)
+            FROM (SELECT ? AS id) u LEFT JOIN saldos_snapshot s ON s.usuario_id = u.id
+        """, (usuario_id,))
+        return saldo
+
+    async def historico(self, usuario_id, antes_de=None, limite=POR_PAGINA):
+        """Lançamentos `(id, ts, delta, motivo, referencia)` do usuário, do mais recente ao mais antigo,
+        a partir do lançamento anterior ao ID `antes_de`."""
+        return await self.banco.consultar_todos("""
+            SELECT id, ts, delta, motivo, referencia FROM extrato
+            WHERE usuario_id = ? AND id < ? ORDER BY id DESC LIMIT ?
+        """, (usuario_id, antes_de or 2 ** 63 - 1, limite))
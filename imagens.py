@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import time
+import aiohttp
+
+log = logging.getLogger(__name__)
+
+# A cada INTERVALO_VERIFICACAO segundos, as POR_CICLO imagens verificadas há mais tempo são checadas de novo
+INTERVALO_VERIFICACAO = 60
+POR_CICLO = 100
+
+# Requisições simultâneas e tempo máximo de cada uma
+CONCORRENCIA = 8
+TEMPO_LIMITE = 10
+
+# Servidores que não aceitam HEAD costumam responder com um destes códigos
+SEM_SUPORTE_A_HEAD = (403, 405, 501)
+
+
+def imagem_quebrada(status, tipo):
+    """Uma imagem é válida se respondeu 2xx com um Content-Type de imagem."""
+    return not (200 <= status < 300 and (tipo or "").startswith("image/"))
+
+
+class VerificadorImagens:
+    """Verifica em segundo plano as URLs de `personagens.imagem`, das mais antigas para as mais recentes."""
+
+    def __init__(self, banco, ao_verificar=None):
+        self.banco = banco
+        self.ao_verificar = ao_verificar  # `ao_verificar(personagem_id, quebrada, conquistado)`, chamado para cada resultado gravado
+        self._sessao = None
+        self._limite = asyncio.Semaphore(CONCORRENCIA)
+        self._tarefa = None
+
+    def abrir(self):
+        """Abre a sessão HTTP compartilhada por todas as verificações."""
+        if self._sessao is None:
+            self._sessao = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=TEMPO_LIMITE))
+
+    def iniciar(self):
+        """Abre a sessão e inicia a tarefa periódica."""
+        self.abrir()
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._verificar_periodicamente())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+        if self._sessao is not None:
+            await self._sessao.close()
+            self._sessao = None
+
+    async def _verificar_periodicamente(self):
+        while True:
+            try:
+                await self.verificar_lote()
+            except Exception:
+                log.exception("Falha ao verificar as imagens; nova tentativa no próximo ciclo")
+            await asyncio.sleep(INTERVALO_VERIFICACAO)
+
+    async def verificar_url(self, url):
+        """Retorna `(status, content_type)` da URL; status 0 quando não houve resposta."""
+        async with self._limite:
+            try:
+                async with self._sessao.head(url, allow_redirects=True) as resposta:
+                    if resposta.status not in SEM_SUPORTE_A_HEAD:
+                        return resposta.status, resposta.content_type
+                # O corpo não é lido: os cabeçalhos bastam
+                async with self._sessao.get(url, allow_redirects=True) as resposta:
+                    return resposta.status, resposta.content_type
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                return 0, None
+
+    async def verificar_lote(self, quantidade=POR_CICLO):
+        """Verifica as `quantidade` imagens mais antigas (as nunca verificadas primeiro) e grava o resultado."""
+        linhas = await self.banco.consultar_todos(
+            "SELECT id, imagem FROM personagens ORDER BY imagem_verificada_em LIMIT ?", (quantidade,)
+        )
+        if not linhas:
+            return []
+        respostas = await asyncio.gather(*(self.verificar_url(imagem) for _, imagem in linhas))
+        agora = int(time.time())
+        resultados = [
+            (status, tipo, agora, imagem_quebrada(status, tipo), personagem_id, imagem)
+            for (personagem_id, imagem), (status, tipo) in zip(linhas, respostas)
+        ]
+        gravados = []
+        async with self.banco.transacao() as db:
+            # A condição na imagem descarta o resultado se ela foi alterada durante a verificação;
+            # o `conquistado` devolvido é o atual, e não o lido antes das requisições
+            for resultado in resultados:
+                cursor = await db.execute("""
+                    UPDATE personagens
+                    SET imagem_status = ?, imagem_tipo = ?, imagem_verificada_em = ?, imagem_quebrada = ?
+                    WHERE id = ? AND imagem = ?
+                    RETURNING id, imagem_quebrada, conquistado
+                """, resultado)
+                gravados.extend(await cursor.fetchall())
+        if self.ao_verificar:
+            for personagem_id, quebrada, conquistado in gravados:
+                self.ao_verificar(personagem_id, quebrada, conquistado)
+        return resultados
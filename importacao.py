@@ -0,0 +1,226 @@
+"""Importação e exportação em lote do catálogo de personagens.
+
+Uso pela linha de comando (com o bot desligado, ou reinicie-o depois para ele enxergar os novos personagens):
+    python importacao.py importar personagens.csv [--banco eros.db]
+    python importacao.py exportar personagens.jsonl [--banco eros.db]
+
+Formatos aceitos: CSV com cabeçalho (`nome`, `imagem` e, opcionalmente, `vantagem`),
+JSON Lines (um objeto por linha) e JSON (uma lista de objetos), todos lidos e escritos aos poucos.
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+from urllib.parse import urlsplit
+from armazenamento import ArmazenamentoSQLite
+from banco import BancoDeDados
+from indices import chave_nome
+from migracoes import migrar
+
+# Linhas gravadas por transação; entre um lote e outro o escritor fica livre para os comandos
+TAMANHO_LOTE = 5000
+
+# Limite do Discord para o nome de uma opção do autocompletar
+TAMANHO_MAXIMO_NOME = 100
+
+# Quantas linhas inválidas são descritas no resumo
+ERROS_NO_RESUMO = 10
+
+FORMATOS = ("csv", "jsonl", "json")
+
+
+class ResumoImportacao:
+    """Contagem de linhas inseridas, ignoradas (já existentes ou repetidas) e inválidas."""
+    __slots__ = ("inseridos", "ignorados", "invalidos", "erros")
+
+    def __init__(self):
+        self.inseridos = 0
+        self.ignorados = 0
+        self.invalidos = 0
+        self.erros = []  # (linha, motivo) das primeiras linhas inválidas
+
+    def invalida(self, linha, motivo):
+        self.invalidos += 1
+        if len(self.erros) < ERROS_NO_RESUMO:
+            self.erros.append((linha, motivo))
+
+    def __str__(self):
+        texto = f"{self.inseridos} inseridos, {self.ignorados} ignorados, {self.invalidos} inválidos"
+        return "\n".join([texto, *(f"linha {linha}: {motivo}" for linha, motivo in self.erros)])
+
+
+def formato_do_arquivo(nome_arquivo):
+    """Deduz o formato pela extensão do arquivo."""
+    extensao = os.path.splitext(nome_arquivo)[1].lower().lstrip(".")
+    if extensao not in FORMATOS:
+        raise ValueError(f"Formato não suportado: use {', '.join('.' + formato for formato in FORMATOS)}")
+    return extensao
+
+
+def _objetos_json(arquivo, tamanho_bloco=65536):
+    """Percorre uma lista JSON de objetos sem carregar o arquivo inteiro na memória."""
+    decodificador = json.JSONDecoder()
+    buffer = arquivo.read(tamanho_bloco).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("O JSON deve ser uma lista de objetos")
+    posicao = 1
+    fim_do_arquivo = False
+    while True:
+        # Pula espaços e a vírgula entre os elementos
+        while posicao < len(buffer) and buffer[posicao] in " \t\r\n,":
+            posicao += 1
+        if buffer.startswith("]", posicao):
+            return
+        try:
+            objeto, posicao = decodificador.raw_decode(buffer, posicao)
+        except json.JSONDecodeError:
+            # Elemento cortado no fim do bloco: descarta o que já foi lido, lê mais e tenta de novo
+            if fim_do_arquivo:
+                raise
+            bloco = arquivo.read(tamanho_bloco)
+            fim_do_arquivo = not bloco
+            buffer = buffer[posicao:] + bloco
+            posicao = 0
+            continue
+        yield objeto
+
+
+def ler_registros(arquivo, formato):
+    """Gera `(número da linha, registro)` a partir de um arquivo de texto aberto."""
+    if formato == "csv":
+        leitor = csv.DictReader(arquivo)
+        for registro in leitor:
+            yield leitor.line_num, registro
+    elif formato == "jsonl":
+        for numero, linha in enumerate(arquivo, start=1):
+            if linha.strip():
+                try:
+                    yield numero, json.loads(linha)
+                except json.JSONDecodeError as erro:
+                    yield numero, erro
+    else:
+        yield from enumerate(_objetos_json(arquivo), start=1)
+
+
+def validar(registro):
+    """Retorna `(nome, imagem, vantagem)` normalizados, ou levanta ValueError com o motivo."""
+    if isinstance(registro, json.JSONDecodeError):
+        raise ValueError(f"JSON inválido ({registro.msg})")
+    if not isinstance(registro, dict):
+        raise ValueError("o registro deve ser um objeto")
+    nome = str(registro.get("nome") or "").strip()
+    imagem = str(registro.get("imagem") or "").strip()
+    if not nome:
+        raise ValueError("nome vazio")
+    if len(nome) > TAMANHO_MAXIMO_NOME:
+        raise ValueError(f"nome com mais de {TAMANHO_MAXIMO_NOME} caracteres")
+    partes = urlsplit(imagem)
+    if partes.scheme not in ("http", "https") or not partes.netloc:
+        raise ValueError("a URL da imagem deve começar com 'http://' ou 'https://'")
+    vantagem = registro.get("vantagem")
+    if vantagem in (None, ""):
+        vantagem = 2  # Mesmo padrão da tabela
+    else:
+        try:
+            vantagem = int(vantagem)
+        except (TypeError, ValueError):
+            raise ValueError("vantagem deve ser um número inteiro") from None
+    return nome, imagem, vantagem
+
+
+async def _gravar_lote(armazenamento, lote, resumo):
+    # O armazenamento também descarta nomes que já existiam com outra caixa
+    inseridos = await armazenamento.adicionar_personagens(lote)
+    resumo.inseridos += inseridos
+    resumo.ignorados += len(lote) - inseridos
+
+
+async def importar(armazenamento, arquivo, formato):
+    """Importa personagens de um arquivo de texto aberto para o `Armazenamento`, em lotes de TAMANHO_LOTE linhas
+    (uma transação por lote no SQLite)."""
+    resumo = ResumoImportacao()
+    vistos = {chave_nome(nome) for _, nome, _ in await armazenamento.catalogo()}
+    lote = []
+    try:
+        for numero, registro in ler_registros(arquivo, formato):
+            try:
+                nome, imagem, vantagem = validar(registro)
+            except ValueError as erro:
+                resumo.invalida(numero, str(erro))
+                continue
+            chave = chave_nome(nome)
+            if chave in vistos:
+                resumo.ignorados += 1
+                continue
+            vistos.add(chave)
+            lote.append((nome, imagem, vantagem))
+            if len(lote) >= TAMANHO_LOTE:
+                await _gravar_lote(armazenamento, lote, resumo)
+                lote = []
+    except (csv.Error, ValueError, UnicodeDecodeError) as erro:
+        # Arquivo malformado: o que já foi lido é gravado e o resto é abandonado
+        resumo.invalida("?", f"leitura interrompida: {erro}")
+    if lote:
+        await _gravar_lote(armazenamento, lote, resumo)
+    return resumo
+
+
+async def exportar(armazenamento, arquivo, formato, tamanho_pagina=1000):
+    """Escreve todos os personagens no arquivo de texto aberto, página por página em ordem de ID."""
+    escritor = csv.writer(arquivo) if formato == "csv" else None
+    if escritor:
+        escritor.writerow(("nome", "imagem", "vantagem"))
+    elif formato == "json":
+        arquivo.write("[")
+    ultimo_id = 0
+    primeiro = True
+    while True:
+        linhas = await armazenamento.personagens_apos(ultimo_id, tamanho_pagina)
+        if not linhas:
+            break
+        ultimo_id = linhas[-1][0]
+        for _, nome, imagem, vantagem in linhas:
+            if escritor:
+                escritor.writerow((nome, imagem, vantagem))
+                continue
+            objeto = json.dumps({"nome": nome, "imagem": imagem, "vantagem": vantagem}, ensure_ascii=False)
+            if formato == "jsonl":
+                arquivo.write(objeto + "\n")
+            else:
+                arquivo.write(("" if primeiro else ",\n") + objeto)
+                primeiro = False
+    if formato == "json":
+        arquivo.write("]\n")
+
+
+def abrir_texto(dados_binarios):
+    """Envolve um arquivo binário (ex.: anexo baixado) para leitura como texto UTF-8."""
+    return io.TextIOWrapper(dados_binarios, encoding="utf-8-sig", newline="")
+
+
+async def _principal(argumentos):
+    banco = BancoDeDados(argumentos.banco, leitores=1)
+    await banco.abrir()
+    try:
+        await migrar(banco)
+        armazenamento = ArmazenamentoSQLite(banco)
+        formato = formato_do_arquivo(argumentos.arquivo)
+        if argumentos.acao == "importar":
+            with open(argumentos.arquivo, encoding="utf-8-sig", newline="") as arquivo:
+                print(await importar(armazenamento, arquivo, formato))
+        else:
+            with open(argumentos.arquivo, "w", encoding="utf-8", newline="") as arquivo:
+                await exportar(armazenamento, arquivo, formato)
+            print(f"Personagens exportados para {argumentos.arquivo}")
+    finally:
+        await banco.fechar()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa ou exporta o catálogo de personagens.")
+    parser.add_argument("acao", choices=("importar", "exportar"))
+    parser.add_argument("arquivo", help="Arquivo .csv, .jsonl ou .json")
+    parser.add_argument("--banco", default="eros.db", help="Arquivo do banco de dados (padrão: eros.db)")
+    asyncio.run(_principal(parser.parse_args()))
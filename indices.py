@@ -0,0 +1,137 @@
+import bisect
+import random
+import string
+
+# Chave de ordenação e unicidade dos nomes, igual ao COLLATE NOCASE: só as letras ASCII são igualadas
+_MINUSCULAS = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def chave_nome(nome):
+    """Chave do nome como o COLLATE NOCASE do SQLite a compara: "Élise" e "élise" são nomes diferentes."""
+    return nome.translate(_MINUSCULAS)
+
+
+class IndiceDisponiveis:
+    """Conjunto de IDs com sorteio uniforme em O(1) (vetor denso com remoção por troca)."""
+
+    def __init__(self, ids=()):
+        self._ids = []
+        self._posicoes = {}
+        self.reconstruir(ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, id_):
+        return id_ in self._posicoes
+
+    def reconstruir(self, ids):
+        """Substitui todo o conteúdo do índice."""
+        self._ids = list(dict.fromkeys(ids))
+        self._posicoes = {id_: posicao for posicao, id_ in enumerate(self._ids)}
+
+    def adicionar(self, id_):
+        """Adiciona um ID ao final do vetor."""
+        if id_ in self._posicoes:
+            return
+        self._posicoes[id_] = len(self._ids)
+        self._ids.append(id_)
+
+    def remover(self, id_):
+        """Remove um ID movendo o último elemento para a posição liberada."""
+        posicao = self._posicoes.pop(id_, None)
+        if posicao is None:
+            return
+        ultimo = self._ids.pop()
+        if posicao < len(self._ids):
+            self._ids[posicao] = ultimo
+            self._posicoes[ultimo] = posicao
+
+    def sortear(self):
+        """Retorna um ID aleatório ou `None` se o índice estiver vazio."""
+        return random.choice(self._ids) if self._ids else None
+
+
+class IndicePrefixos:
+    """Nomes ordenados sem diferenciar maiúsculas/minúsculas ASCII (como o NOCASE), com busca por prefixo em O(log n)."""
+
+    def __init__(self, nomes=()):
+        self._chaves = []
+        self._nomes = []
+        self.reconstruir(nomes)
+
+    def __len__(self):
+        return len(self._nomes)
+
+    def reconstruir(self, nomes):
+        """Substitui todo o conteúdo do índice."""
+        pares = sorted((chave_nome(nome), nome) for nome in nomes)
+        self._chaves = [chave for chave, _ in pares]
+        self._nomes = [nome for _, nome in pares]
+
+    def adicionar(self, nome):
+        chave = chave_nome(nome)
+        posicao = bisect.bisect_left(self._chaves, chave)
+        if posicao < len(self._chaves) and self._chaves[posicao] == chave:
+            return
+        self._chaves.insert(posicao, chave)
+        self._nomes.insert(posicao, nome)
+
+    def remover(self, nome):
+        chave = chave_nome(nome)
+        posicao = bisect.bisect_left(self._chaves, chave)
+        if posicao < len(self._chaves) and self._chaves[posicao] == chave:
+            del self._chaves[posicao]
+            del self._nomes[posicao]
+
+    def buscar(self, prefixo, limite=25):
+        """Retorna até `limite` nomes que começam com `prefixo`, em ordem alfabética."""
+        chave = chave_nome(prefixo)
+        posicao = bisect.bisect_left(self._chaves, chave)
+        resultado = []
+        while posicao < len(self._chaves) and len(resultado) < limite and self._chaves[posicao].startswith(chave):
+            resultado.append(self._nomes[posicao])
+            posicao += 1
+        return resultado
+
+
+class Ranking:
+    """Saldos de Eritos mantidos em ordem decrescente, com consulta de posição em O(log n)."""
+
+    def __init__(self, saldos=()):
+        self._saldos = {}
+        self._ordem = []  # Pares (-eritos, usuario_id) em ordem crescente
+        self.reconstruir(saldos)
+
+    def __len__(self):
+        return len(self._ordem)
+
+    def reconstruir(self, saldos):
+        """Substitui todo o conteúdo a partir de pares (usuario_id, eritos)."""
+        self._saldos = dict(saldos)
+        self._ordem = sorted((-eritos, usuario_id) for usuario_id, eritos in self._saldos.items())
+
+    def atualizar(self, usuario_id, eritos):
+        """Registra o novo saldo de um usuário, reposicionando-o no ranking."""
+        anterior = self._saldos.get(usuario_id)
+        if anterior == eritos:
+            return
+        if anterior is not None:
+            posicao = bisect.bisect_left(self._ordem, (-anterior, usuario_id))
+            del self._ordem[posicao]
+        self._saldos[usuario_id] = eritos
+        bisect.insort(self._ordem, (-eritos, usuario_id))
+
+    def saldo(self, usuario_id):
+        return self._saldos.get(usuario_id)
+
+    def posicao(self, usuario_id):
+        """Retorna a posição do usuário (começando em 1), ou None se ele não tiver saldo registrado."""
+        eritos = self._saldos.get(usuario_id)
+        if eritos is None:
+            return None
+        return bisect.bisect_left(self._ordem, (-eritos, usuario_id)) + 1
+
+    def pagina(self, inicio, quantidade):
+        """Retorna pares (usuario_id, eritos) a partir da posição `inicio` (começando em 0)."""
+        return [(usuario_id, -negativo) for negativo, usuario_id in self._ordem[inicio:inicio + quantidade]]
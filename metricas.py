@@ -0,0 +1,394 @@
+import asyncio
+import bisect
+import contextlib
+import contextvars
+import logging
+import os
+import time
+import discord
+from discord import app_commands
+
+log = logging.getLogger(__name__)
+
+# Instruções SQL mais lentas que isto são registradas no log com o SQL e os parâmetros
+LIMITE_CONSULTA_LENTA = 0.1  # segundos
+
+# Arquivo no formato texto do Prometheus, regravado a cada INTERVALO_ARQUIVO segundos
+ARQUIVO_METRICAS = "metricas.prom"
+INTERVALO_ARQUIVO = 60
+
+# Intervalo da amostragem do atraso do event loop
+INTERVALO_ATRASO = 0.5
+
+# Prazo do Discord para a primeira resposta a uma interação; depois dele o usuário vê "O aplicativo não respondeu"
+PRAZO_RESPOSTA = 3.0  # segundos
+
+# Um callback que ainda não respondeu depois deste tempo tem a interação adiada (defer) automaticamente
+ORCAMENTO_RESPOSTA = 2.0  # segundos; None desativa
+
+# Limites superiores dos baldes dos histogramas, em segundos
+BALDES = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Medição da execução em andamento (comando ou botão), vista pela camada de banco
+medicao_atual = contextvars.ContextVar("medicao_atual", default=None)
+
+
+def slot_da_resposta(classe):
+    """Atributo em que `classe.response` guarda a resposta em cache, que `responder_no_prazo` substitui.
+
+    O `response` do discord.py é uma propriedade com cache em slot; se uma versão nova mudar isso,
+    falha aqui em vez de deixar de adiar as interações lentas sem aviso."""
+    slot = getattr(getattr(classe, "response", None), "name", None)
+    if not isinstance(slot, str):
+        raise RuntimeError(f"{classe.__name__}.response não é uma propriedade com cache em slot; "
+                           "o adiamento automático precisa ser revisto para esta versão do discord.py")
+    return slot
+
+
+# Conferido ao importar: o slot tem de existir em `discord.Interaction`, que usa __slots__
+SLOT_RESPOSTA = slot_da_resposta(discord.Interaction)
+if SLOT_RESPOSTA not in discord.Interaction.__slots__:
+    raise RuntimeError(f"discord.Interaction não tem mais o slot {SLOT_RESPOSTA}; "
+                       "o adiamento automático precisa ser revisto para esta versão do discord.py")
+
+
+class Histograma:
+    """Histograma de baldes fixos: registrar custa uma busca binária e um incremento."""
+    __slots__ = ("contagens", "soma", "total")
+
+    def __init__(self):
+        self.contagens = [0] * (len(BALDES) + 1)  # O último balde é o +Inf
+        self.soma = 0.0
+        self.total = 0
+
+    def registrar(self, valor):
+        self.contagens[bisect.bisect_left(BALDES, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def percentil(self, q):
+        """Estimativa do percentil `q` (0 a 1): o limite superior do balde que o contém."""
+        if not self.total:
+            return 0.0
+        alvo = q * self.total
+        acumulado = 0
+        for limite, contagem in zip(BALDES, self.contagens):
+            acumulado += contagem
+            if acumulado >= alvo:
+                return limite
+        return float("inf")
+
+
+class Medicao:
+    """Consultas e tempo de banco de uma única execução de comando."""
+    __slots__ = ("inicio", "consultas", "tempo_banco", "erro", "primeira_resposta", "adiada", "adiada_automaticamente")
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.consultas = 0
+        self.tempo_banco = 0.0
+        self.erro = False  # Marcado pelos tratadores de erro, que recebem a exceção no lugar do bloco
+        self.primeira_resposta = None  # Segundos até a primeira resposta, quando houve uma
+        self.adiada = False  # A primeira resposta foi um defer
+        self.adiada_automaticamente = False
+
+
+class EstatisticasComando:
+    """Valores acumulados de um comando ou botão."""
+    __slots__ = ("duracao", "consultas", "tempo_banco", "erros", "imediatas", "adiadas", "automaticas", "atrasadas",
+                 "primeira_resposta", "menor_folga")
+
+    def __init__(self):
+        self.duracao = Histograma()
+        self.consultas = 0
+        self.tempo_banco = 0.0
+        self.erros = 0
+        self.imediatas = 0  # Respostas enviadas direto
+        self.adiadas = 0  # Respostas que começaram com um defer, do callback ou automático
+        self.automaticas = 0  # Adiamentos feitos por RespostaNoPrazo
+        self.atrasadas = 0  # Primeiras respostas depois do PRAZO_RESPOSTA
+        self.primeira_resposta = Histograma()  # A folga em relação ao prazo é PRAZO_RESPOSTA menos este tempo
+        self.menor_folga = PRAZO_RESPOSTA  # Negativa se alguma resposta passou do prazo
+
+
+class Metricas:
+    """Métricas do bot: latência por comando, consultas ao banco, consultas lentas e atraso do event loop."""
+
+    def __init__(self):
+        self.comandos = {}
+        self.atraso_loop = Histograma()
+        self.maior_atraso = 0.0
+        self.consultas_lentas = 0
+        self.orcamento_resposta = ORCAMENTO_RESPOSTA
+        self._tarefas = []
+
+    @contextlib.contextmanager
+    def medir(self, nome):
+        """Mede a duração do bloco e as consultas ao banco feitas dentro dele."""
+        medicao = Medicao()
+        token = medicao_atual.set(medicao)
+        try:
+            yield medicao
+        except BaseException:
+            medicao.erro = True
+            raise
+        finally:
+            medicao_atual.reset(token)
+            estatisticas = self.comandos.get(nome)
+            if estatisticas is None:
+                estatisticas = self.comandos[nome] = EstatisticasComando()
+            estatisticas.duracao.registrar(time.perf_counter() - medicao.inicio)
+            estatisticas.consultas += medicao.consultas
+            estatisticas.tempo_banco += medicao.tempo_banco
+            estatisticas.erros += medicao.erro
+            if medicao.primeira_resposta is not None:
+                if medicao.adiada:
+                    estatisticas.adiadas += 1
+                else:
+                    estatisticas.imediatas += 1
+                estatisticas.automaticas += medicao.adiada_automaticamente
+                estatisticas.atrasadas += medicao.primeira_resposta > PRAZO_RESPOSTA
+                estatisticas.primeira_resposta.registrar(medicao.primeira_resposta)
+                estatisticas.menor_folga = min(estatisticas.menor_folga, PRAZO_RESPOSTA - medicao.primeira_resposta)
+
+    @contextlib.contextmanager
+    def responder_no_prazo(self, nome, interaction):
+        """Como `medir`, e troca `interaction.response` por uma RespostaNoPrazo durante o bloco."""
+        with self.medir(nome) as medicao:
+            slot = slot_da_resposta(type(interaction))
+            resposta = RespostaNoPrazo(interaction, medicao, self.orcamento_resposta)
+            setattr(interaction, slot, resposta)
+            try:
+                yield medicao
+            finally:
+                resposta.encerrar()
+                setattr(interaction, slot, resposta.original)
+
+    def observar_consulta(self, sql, parametros, duracao):
+        """Observador instalado na camada de banco; chamado após cada instrução."""
+        medicao = medicao_atual.get()
+        if medicao is not None:
+            medicao.consultas += 1
+            medicao.tempo_banco += duracao
+        if duracao > LIMITE_CONSULTA_LENTA:
+            self.consultas_lentas += 1
+            log.warning("Consulta lenta (%.1f ms): %s %r", duracao * 1000, " ".join(sql.split()), parametros)
+
+    def iniciar(self):
+        """Inicia a amostragem do atraso do event loop e a gravação periódica do arquivo."""
+        if not self._tarefas:
+            self._tarefas = [asyncio.create_task(self._medir_atraso()), asyncio.create_task(self._gravar_periodicamente())]
+
+    def parar(self):
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        self._tarefas = []
+
+    async def _medir_atraso(self):
+        while True:
+            esperado = time.perf_counter() + INTERVALO_ATRASO
+            await asyncio.sleep(INTERVALO_ATRASO)
+            atraso = max(0.0, time.perf_counter() - esperado)
+            self.atraso_loop.registrar(atraso)
+            self.maior_atraso = max(self.maior_atraso, atraso)
+
+    async def _gravar_periodicamente(self):
+        while True:
+            await asyncio.sleep(INTERVALO_ARQUIVO)
+            try:
+                await asyncio.to_thread(self.gravar, ARQUIVO_METRICAS, self.formato_prometheus())
+            except OSError:
+                log.exception("Falha ao gravar %s", ARQUIVO_METRICAS)
+
+    @staticmethod
+    def gravar(caminho, texto):
+        """Grava o arquivo de forma atômica, para o coletor nunca ler um arquivo pela metade."""
+        temporario = f"{caminho}.tmp"
+        with open(temporario, "w", encoding="utf-8") as arquivo:
+            arquivo.write(texto)
+        os.replace(temporario, caminho)
+
+    def formato_prometheus(self):
+        """Exporta as métricas no formato texto do Prometheus."""
+        linhas = [
+            "# HELP eros_comando_duracao_segundos Duração de cada comando ou botão.",
+            "# TYPE eros_comando_duracao_segundos histogram",
+        ]
+        for nome, estatisticas in sorted(self.comandos.items()):
+            linhas += _linhas_histograma("eros_comando_duracao_segundos", estatisticas.duracao, f'comando="{nome}"')
+        for metrica, tipo, descricao, valor in (
+            ("eros_comando_consultas_total", "counter", "Instruções SQL executadas pelo comando.", lambda e: e.consultas),
+            ("eros_comando_tempo_banco_segundos_total", "counter", "Tempo gasto no banco pelo comando.", lambda e: e.tempo_banco),
+            ("eros_comando_erros_total", "counter", "Execuções que terminaram com exceção.", lambda e: e.erros),
+            ("eros_comando_adiamentos_automaticos_total", "counter", "Respostas adiadas por passarem do orçamento.",
+             lambda e: e.automaticas),
+            ("eros_comando_respostas_atrasadas_total", "counter", "Primeiras respostas depois do prazo do Discord.",
+             lambda e: e.atrasadas),
+        ):
+            linhas += [f"# HELP {metrica} {descricao}", f"# TYPE {metrica} {tipo}"]
+            linhas += [f'{metrica}{{comando="{nome}"}} {valor(e)}' for nome, e in sorted(self.comandos.items())]
+        linhas += [
+            "# HELP eros_comando_respostas_total Primeiras respostas enviadas direto (imediata) ou com defer (adiada).",
+            "# TYPE eros_comando_respostas_total counter",
+        ]
+        for nome, estatisticas in sorted(self.comandos.items()):
+            linhas.append(f'eros_comando_respostas_total{{comando="{nome}",tipo="imediata"}} {estatisticas.imediatas}')
+            linhas.append(f'eros_comando_respostas_total{{comando="{nome}",tipo="adiada"}} {estatisticas.adiadas}')
+        linhas += [
+            "# HELP eros_comando_primeira_resposta_segundos Tempo até a primeira resposta (o prazo do Discord é de 3 s).",
+            "# TYPE eros_comando_primeira_resposta_segundos histogram",
+        ]
+        for nome, estatisticas in sorted(self.comandos.items()):
+            if estatisticas.primeira_resposta.total:
+                linhas += _linhas_histograma("eros_comando_primeira_resposta_segundos", estatisticas.primeira_resposta,
+                                             f'comando="{nome}"')
+        linhas += [
+            "# HELP eros_event_loop_atraso_segundos Atraso do event loop em relação ao agendado.",
+            "# TYPE eros_event_loop_atraso_segundos histogram",
+            *_linhas_histograma("eros_event_loop_atraso_segundos", self.atraso_loop),
+            "# HELP eros_consultas_lentas_total Instruções SQL acima do limite de consulta lenta.",
+            "# TYPE eros_consultas_lentas_total counter",
+            f"eros_consultas_lentas_total {self.consultas_lentas}",
+        ]
+        return "\n".join(linhas) + "\n"
+
+
+def _linhas_histograma(metrica, histograma, rotulos=""):
+    separador = "," if rotulos else ""
+    linhas = []
+    acumulado = 0
+    for limite, contagem in zip((*BALDES, "+Inf"), histograma.contagens):
+        acumulado += contagem
+        linhas.append(f'{metrica}_bucket{{{rotulos}{separador}le="{limite}"}} {acumulado}')
+    sufixo = f"{{{rotulos}}}" if rotulos else ""
+    linhas.append(f"{metrica}_sum{sufixo} {histograma.soma}")
+    linhas.append(f"{metrica}_count{sufixo} {histograma.total}")
+    return linhas
+
+
+class RespostaNoPrazo:
+    """Substitui `interaction.response` durante um callback: se ele não responder em `orcamento` segundos,
+    adia a interação (defer) e entrega as respostas seguintes como followup ou editando a original.
+
+    Um comando adiado mostra "pensando..." no canal; se a resposta for efêmera, essa mensagem é apagada
+    e a resposta vai em uma mensagem efêmera nova. Depois do adiamento, modais não podem mais ser abertos.
+    """
+
+    def __init__(self, interaction, medicao, orcamento):
+        self.original = interaction.response
+        self._interaction = interaction
+        self._medicao = medicao
+        self._trava = asyncio.Lock()  # Uma resposta e o adiamento automático nunca correm juntos
+        self._adiada_automaticamente = False
+        self._temporizador = asyncio.create_task(self._adiar(orcamento)) if orcamento is not None else None
+
+    def __getattr__(self, nome):
+        return getattr(self.original, nome)
+
+    def encerrar(self):
+        if self._temporizador:
+            self._temporizador.cancel()
+
+    def _registrar(self, adiada):
+        medicao = self._medicao
+        if medicao.primeira_resposta is None:
+            medicao.primeira_resposta = time.perf_counter() - medicao.inicio
+            medicao.adiada = adiada
+
+    def _comando(self):
+        return self._interaction.type is discord.InteractionType.application_command
+
+    async def _adiar(self, orcamento):
+        await asyncio.sleep(orcamento)
+        async with self._trava:
+            if self.original.is_done():
+                return
+            try:
+                await self.original.defer()
+            except discord.HTTPException as erro:
+                log.warning("Falha ao adiar a interação %s: %s", self._interaction.id, erro)
+                return
+            self._adiada_automaticamente = self._medicao.adiada_automaticamente = True
+            self._registrar(adiada=True)
+
+    async def defer(self, **kwargs):
+        async with self._trava:
+            if not self._adiada_automaticamente:
+                resposta = await self.original.defer(**kwargs)
+                self._registrar(adiada=True)
+                return resposta
+        if kwargs.get("ephemeral") and self._comando():
+            # Sem o "pensando..." público, os followups efêmeros do callback viram mensagens novas
+            await self._interaction.delete_original_response()
+
+    async def send_message(self, content=None, **kwargs):
+        async with self._trava:
+            if not self._adiada_automaticamente:
+                resposta = await self.original.send_message(content, **kwargs)
+                self._registrar(adiada=False)
+                return resposta
+        delete_after = kwargs.pop("delete_after", None)
+        if kwargs.get("ephemeral") and self._comando():
+            await self._interaction.delete_original_response()
+        mensagem = await self._interaction.followup.send(content, wait=True, **kwargs)
+        if delete_after is not None:
+            await mensagem.delete(delay=delete_after)
+        return mensagem
+
+    async def edit_message(self, **kwargs):
+        async with self._trava:
+            if not self._adiada_automaticamente:
+                resposta = await self.original.edit_message(**kwargs)
+                self._registrar(adiada=False)
+                return resposta
+        delete_after = kwargs.pop("delete_after", None)
+        mensagem = await self._interaction.edit_original_response(**kwargs)
+        if delete_after is not None:
+            await mensagem.delete(delay=delete_after)
+        return mensagem
+
+    async def send_modal(self, modal):
+        async with self._trava:
+            resposta = await self.original.send_modal(modal)
+            self._registrar(adiada=False)
+            return resposta
+
+
+class ArvoreInstrumentada(app_commands.CommandTree):
+    """Árvore de comandos que mede cada comando e autocompletar e adia os comandos que demoram a responder."""
+
+    async def _call(self, interaction):
+        nome = interaction.data.get("name", "?")
+        if interaction.type is discord.InteractionType.autocomplete:
+            with self.client.metricas.medir(f"/{nome}:autocompletar"):
+                await super()._call(interaction)
+            return
+        with self.client.metricas.responder_no_prazo(f"/{nome}", interaction):
+            await super()._call(interaction)
+
+    async def on_error(self, interaction, error):
+        _marcar_erro()
+        await super().on_error(interaction, error)
+
+
+class ItemDinamicoInstrumentado:
+    """Para itens dinâmicos (DynamicItem): mede cada clique e adia os que demoram a responder.
+    As subclasses implementam `clicar` em vez de `callback`."""
+
+    async def callback(self, interaction):
+        with interaction.client.metricas.responder_no_prazo(type(self).__name__, interaction):
+            await self.clicar(interaction)
+
+
+class ModalInstrumentado:
+    """Para modais: mede cada envio e adia os que demoram a responder. As subclasses implementam `enviar` em vez de `on_submit`."""
+
+    async def on_submit(self, interaction):
+        with interaction.client.metricas.responder_no_prazo(type(self).__name__, interaction):
+            await self.enviar(interaction)
+
+
+def _marcar_erro():
+    medicao = medicao_atual.get()
+    if medicao is not None:
+        medicao.erro = True
@@ -0,0 +1,293 @@
+import logging
+from datetime import datetime
+import aiosqlite
+
+log = logging.getLogger(__name__)
+
+
+async def _tabelas_iniciais(db):
+    """Esquema original do bot; usa IF NOT EXISTS para adotar bancos criados antes das migrações."""
+    # Cria a tabela de personagens, se não existir
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS personagens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL COLLATE NOCASE UNIQUE,
+            imagem TEXT NOT NULL,
+            conquistado INTEGER DEFAULT 0,
+            vantagem INTEGER DEFAULT 2  -- Vantagem padrão é +2
+        )
+    """)
+    # Cria a tabela de amores, se não existir
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS amores (
+            usuario_id INTEGER NOT NULL,
+            personagem TEXT NOT NULL COLLATE NOCASE UNIQUE
+        )
+    """)
+    # Cria a tabela de cooldowns, se não existir
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS cooldowns (
+            usuario_id INTEGER PRIMARY KEY,
+            tentativas INTEGER DEFAULT 0,
+            tempo TEXT,
+            ultimo_casamento TEXT,
+            ultimo_coletar TEXT  -- Nova coluna para armazenar o último uso do comando /coletar
+        )
+    """)
+    # Adiciona a coluna `vantagem` em bancos antigos que ainda não a possuem
+    try:
+        await db.execute("ALTER TABLE personagens ADD COLUMN vantagem INTEGER DEFAULT 2")
+    except aiosqlite.OperationalError:
+        pass  # A coluna já existe, não faz nada
+    # Cria a tabela de moedas, se não existir
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS moedas (
+            usuario_id INTEGER PRIMARY KEY,
+            eritos INTEGER DEFAULT 0
+        )
+    """)
+    # Cria a tabela de trocas, se não existir
+    await db.execute("""
+        CREATE TABLE IF NOT EXISTS trocas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ofertante_id INTEGER NOT NULL,
+            personagem TEXT NOT NULL,
+            destinatario_id INTEGER NOT NULL,
+            quantidade_eritos INTEGER NOT NULL
+        )
+    """)
+
+
+async def _personagem_id_e_indices(db):
+    """Troca o nome do personagem por uma chave estrangeira inteira em `amores` e `trocas`."""
+    # Amores: um dono por personagem, removido junto com o personagem
+    await db.execute("""
+        CREATE TABLE amores_nova (
+            usuario_id INTEGER NOT NULL,
+            personagem_id INTEGER NOT NULL UNIQUE REFERENCES personagens(id) ON DELETE CASCADE
+        )
+    """)
+    await db.execute("""
+        INSERT INTO amores_nova (usuario_id, personagem_id)
+        SELECT a.usuario_id, p.id FROM amores a JOIN personagens p ON p.nome = a.personagem
+    """)
+    await db.execute("DROP TABLE amores")
+    await db.execute("ALTER TABLE amores_nova RENAME TO amores")
+    # /meus_amores, /ver_amores e a contagem de amores filtram por usuário
+    await db.execute("CREATE INDEX idx_amores_usuario ON amores (usuario_id)")
+
+    # Trocas: propostas de personagens excluídos deixam de existir
+    await db.execute("""
+        CREATE TABLE trocas_nova (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ofertante_id INTEGER NOT NULL,
+            personagem_id INTEGER NOT NULL REFERENCES personagens(id) ON DELETE CASCADE,
+            destinatario_id INTEGER NOT NULL,
+            quantidade_eritos INTEGER NOT NULL
+        )
+    """)
+    await db.execute("""
+        INSERT INTO trocas_nova (id, ofertante_id, personagem_id, destinatario_id, quantidade_eritos)
+        SELECT t.id, t.ofertante_id, p.id, t.destinatario_id, t.quantidade_eritos
+        FROM trocas t JOIN personagens p ON p.nome = t.personagem
+    """)
+    await db.execute("DROP TABLE trocas")
+    await db.execute("ALTER TABLE trocas_nova RENAME TO trocas")
+    # Evita varrer `trocas` no ON DELETE CASCADE de cada personagem excluído
+    await db.execute("CREATE INDEX idx_trocas_personagem ON trocas (personagem_id)")
+
+    # `conquistado` passa a ser mantido pelo próprio banco a partir de `amores`
+    await db.execute("UPDATE personagens SET conquistado = EXISTS (SELECT 1 FROM amores WHERE personagem_id = personagens.id)")
+    await db.execute("""
+        CREATE TRIGGER amores_conquista AFTER INSERT ON amores BEGIN
+            UPDATE personagens SET conquistado = 1 WHERE id = NEW.personagem_id;
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER amores_divorcio AFTER DELETE ON amores BEGIN
+            UPDATE personagens SET conquistado = 0 WHERE id = OLD.personagem_id;
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER amores_troca_personagem AFTER UPDATE OF personagem_id ON amores BEGIN
+            UPDATE personagens SET conquistado = 0 WHERE id = OLD.personagem_id;
+            UPDATE personagens SET conquistado = 1 WHERE id = NEW.personagem_id;
+        END
+    """)
+
+
+async def _metadados(db):
+    """Tabela chave/valor para estado interno do bot (ex.: assinatura dos comandos sincronizados)."""
+    await db.execute("""
+        CREATE TABLE metadados (
+            chave TEXT PRIMARY KEY,
+            valor TEXT NOT NULL
+        )
+    """)
+
+
+async def _saude_das_imagens(db):
+    """Resultado da última verificação da URL da imagem de cada personagem."""
+    await db.execute("ALTER TABLE personagens ADD COLUMN imagem_status INTEGER")  # Código HTTP; 0 = falha de conexão
+    await db.execute("ALTER TABLE personagens ADD COLUMN imagem_tipo TEXT")  # Content-Type devolvido
+    await db.execute("ALTER TABLE personagens ADD COLUMN imagem_verificada_em INTEGER")  # Segundos desde a época
+    await db.execute("ALTER TABLE personagens ADD COLUMN imagem_quebrada INTEGER NOT NULL DEFAULT 0")
+    # O verificador percorre as imagens nunca verificadas (NULL) e depois as mais antigas
+    await db.execute("CREATE INDEX idx_personagens_verificacao ON personagens (imagem_verificada_em)")
+    # Uma imagem nova volta a ser considerada válida até a próxima verificação
+    await db.execute("""
+        CREATE TRIGGER personagens_nova_imagem AFTER UPDATE OF imagem ON personagens
+        WHEN NEW.imagem IS NOT OLD.imagem BEGIN
+            UPDATE personagens
+            SET imagem_status = NULL, imagem_tipo = NULL, imagem_verificada_em = NULL, imagem_quebrada = 0
+            WHERE id = NEW.id;
+        END
+    """)
+
+
+async def _validade_das_trocas(db):
+    """Data de criação das trocas, para descartar propostas que ninguém respondeu."""
+    await db.execute("ALTER TABLE trocas ADD COLUMN criada_em INTEGER")  # Segundos desde a época
+    # Propostas anteriores à migração contam a partir de agora
+    await db.execute("UPDATE trocas SET criada_em = CAST(strftime('%s', 'now') AS INTEGER)")
+    await db.execute("CREATE INDEX idx_trocas_criada_em ON trocas (criada_em)")
+
+
+async def _extrato_de_eritos(db):
+    """Extrato só de inserção com cada movimentação de Eritos e fotografias periódicas dos saldos."""
+    await db.execute("""
+        CREATE TABLE extrato (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ts INTEGER NOT NULL,  -- Segundos desde a época
+            usuario_id INTEGER NOT NULL,
+            delta INTEGER NOT NULL,
+            motivo TEXT NOT NULL,  -- abertura, correcao, coleta, ajuste, troca ou reset
+            referencia INTEGER  -- ID relacionado ao motivo (ex.: a troca ou o dono que fez o ajuste)
+        )
+    """)
+    # /extrato pagina o histórico de um usuário e o recálculo soma os lançamentos após a fotografia
+    await db.execute("CREATE INDEX idx_extrato_usuario ON extrato (usuario_id, id)")
+    # Saldo de cada usuário até o lançamento `ate_id`, inclusive
+    await db.execute("""
+        CREATE TABLE saldos_snapshot (
+            usuario_id INTEGER PRIMARY KEY,
+            ate_id INTEGER NOT NULL,
+            saldo INTEGER NOT NULL
+        )
+    """)
+    # Os saldos existentes abrem o extrato; os negativos deixados pelo antigo /gerenciar_eritos são zerados
+    agora = "CAST(strftime('%s', 'now') AS INTEGER)"
+    await db.execute(f"""
+        INSERT INTO extrato (ts, usuario_id, delta, motivo)
+        SELECT {agora}, usuario_id, eritos, 'abertura' FROM moedas WHERE eritos != 0 ORDER BY usuario_id
+    """)
+    await db.execute(f"""
+        INSERT INTO extrato (ts, usuario_id, delta, motivo)
+        SELECT {agora}, usuario_id, -eritos, 'correcao' FROM moedas WHERE eritos < 0 ORDER BY usuario_id
+    """)
+    await db.execute("UPDATE moedas SET eritos = 0 WHERE eritos < 0")
+    await db.execute("""
+        INSERT INTO saldos_snapshot (usuario_id, ate_id, saldo)
+        SELECT e.usuario_id, MAX(e.id), m.eritos FROM extrato e JOIN moedas m ON m.usuario_id = e.usuario_id
+        GROUP BY e.usuario_id
+    """)
+    await db.execute("INSERT INTO metadados (chave, valor) SELECT 'extrato_snapshot_ate', COALESCE(MAX(id), 0) FROM extrato")
+    # Última barreira contra saldos negativos; os débitos do bot já são condicionais
+    for evento in ("INSERT", "UPDATE OF eritos"):
+        nome = evento.split()[0].lower()
+        await db.execute(f"""
+            CREATE TRIGGER moedas_sem_saldo_negativo_{nome} BEFORE {evento} ON moedas
+            WHEN NEW.eritos < 0 BEGIN
+                SELECT RAISE(ABORT, 'saldo de Eritos negativo');
+            END
+        """)
+
+
+async def _tarefas_em_lote(db):
+    """Resets em lote feitos aos poucos em segundo plano, retomados se o bot reiniciar no meio."""
+    await db.execute("""
+        CREATE TABLE tarefas (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            tipo TEXT NOT NULL,  -- Tabela resetada: amores, moedas ou cooldowns
+            ultimo_rowid INTEGER NOT NULL DEFAULT 0,  -- Até onde a tabela já foi processada
+            ate_rowid INTEGER NOT NULL,  -- Maior rowid da tabela quando a tarefa foi criada
+            ate_extrato INTEGER NOT NULL,  -- Último lançamento do extrato quando a tarefa foi criada
+            referencia INTEGER,  -- Quem pediu o reset
+            processadas INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL,  -- Linhas da tabela quando a tarefa foi criada (para o progresso)
+            criada_em INTEGER NOT NULL,
+            concluida_em INTEGER
+        )
+    """)
+    # Tarefa de reset de cooldowns mais recente quando a linha foi gravada: o reset só apaga as linhas
+    # gravadas antes dele, mesmo que o bot reinicie no meio
+    await db.execute("ALTER TABLE cooldowns ADD COLUMN geracao_reset INTEGER NOT NULL DEFAULT 0")
+
+
+async def _busca_de_personagens(db):
+    """Índice FTS5 de trigramas sobre os nomes dos personagens, para a busca aproximada."""
+    # Tabela de conteúdo externo: guarda só o índice, e os nomes continuam em `personagens`
+    await db.execute("""
+        CREATE VIRTUAL TABLE personagens_busca USING fts5(
+            nome, content = 'personagens', content_rowid = 'id', tokenize = 'trigram'
+        )
+    """)
+    await db.execute("INSERT INTO personagens_busca (personagens_busca) VALUES ('rebuild')")
+    await db.execute("""
+        CREATE TRIGGER personagens_busca_insert AFTER INSERT ON personagens BEGIN
+            INSERT INTO personagens_busca (rowid, nome) VALUES (NEW.id, NEW.nome);
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER personagens_busca_delete AFTER DELETE ON personagens BEGIN
+            INSERT INTO personagens_busca (personagens_busca, rowid, nome) VALUES ('delete', OLD.id, OLD.nome);
+        END
+    """)
+    await db.execute("""
+        CREATE TRIGGER personagens_busca_update AFTER UPDATE OF nome ON personagens BEGIN
+            INSERT INTO personagens_busca (personagens_busca, rowid, nome) VALUES ('delete', OLD.id, OLD.nome);
+            INSERT INTO personagens_busca (rowid, nome) VALUES (NEW.id, NEW.nome);
+        END
+    """)
+
+
+# Migrações em ordem; uma versão aplicada nunca deve ser alterada, apenas seguida de outra
+MIGRACOES = [
+    (1, "Tabelas iniciais", _tabelas_iniciais),
+    (2, "personagem_id inteiro em amores e trocas, índices e gatilhos de conquistado", _personagem_id_e_indices),
+    (3, "Tabela de metadados", _metadados),
+    (4, "Verificação das URLs das imagens", _saude_das_imagens),
+    (5, "Data de criação das trocas", _validade_das_trocas),
+    (6, "Extrato de Eritos e fotografias dos saldos", _extrato_de_eritos),
+    (7, "Tarefas de reset em lote", _tarefas_em_lote),
+    (8, "Índice de trigramas para a busca de personagens", _busca_de_personagens),
+]
+
+
+async def versao_atual(banco):
+    """Retorna a versão do esquema registrada no banco (0 para um banco sem migrações)."""
+    try:
+        (versao,) = await banco.consultar_um("SELECT MAX(versao) FROM schema_version")
+    except aiosqlite.OperationalError:
+        return 0  # A tabela schema_version ainda não existe
+    return versao or 0
+
+
+async def migrar(banco):
+    """Aplica as migrações pendentes, cada uma em sua própria transação."""
+    versao = await versao_atual(banco)
+    for numero, descricao, aplicar in MIGRACOES:
+        if numero <= versao:
+            continue
+        async with banco.transacao() as db:
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    versao INTEGER PRIMARY KEY,
+                    descricao TEXT NOT NULL,
+                    aplicada_em TEXT NOT NULL
+                )
+            """)
+            await aplicar(db)
+            await db.execute("INSERT INTO schema_version (versao, descricao, aplicada_em) VALUES (?, ?, ?)",
+                             (numero, descricao, datetime.now().isoformat()))
+        log.info("Migração %d aplicada: %s", numero, descricao)
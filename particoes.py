@@ -0,0 +1,49 @@
+import contextvars
+from caches import CacheRespostas
+from indices import IndiceDisponiveis, IndicePrefixos, Ranking
+
+# Partição usada pela interação em andamento; None significa a partição padrão do bot
+particao_atual = contextvars.ContextVar("particao_atual", default=None)
+
+
+class Particao:
+    """Banco de dados e estado em memória de um servidor (ou do bot inteiro, sem particionamento)."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.banco = None
+        self.armazenamento = None
+        self.cooldowns = None
+        self.verificador_imagens = None
+        self.extrato = None
+        self.tarefas = None
+        self.copias = None
+        self.disponiveis = IndiceDisponiveis()  # IDs dos personagens que podem aparecer no /paquerar
+        self.nomes = IndicePrefixos()  # Nomes de todos os personagens, para o autocompletar
+        self.ranking = Ranking()  # Saldos de Eritos em ordem, para o /rank
+        self.contagem_amores = {}  # Total de amores por usuário, para a paginação
+        self.respostas = CacheRespostas()  # Consultas dos comandos de leitura, invalidadas pelas escritas
+
+
+class DaParticao:
+    """Atributo do bot que é lido e gravado na partição da interação em andamento."""
+
+    def __set_name__(self, dono, nome):
+        self.nome = nome
+
+    def __get__(self, bot, dono=None):
+        if bot is None:
+            return self
+        return getattr(bot.particao, self.nome)
+
+    def __set__(self, bot, valor):
+        setattr(bot.particao, self.nome, valor)
+
+
+class RoteiaParticao:
+    """Para árvores de comandos, views e modais: ativa a partição do servidor antes de cada callback."""
+
+    async def interaction_check(self, interaction):
+        # Chamado pelo discord.py na mesma tarefa do callback, então a partição vale até o fim dela
+        await interaction.client.entrar_particao(interaction.guild_id)
+        return await super().interaction_check(interaction)
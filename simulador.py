@@ -0,0 +1,194 @@
+"""Simulador do equilíbrio do jogo, para calibrar a vantagem dos personagens.
+
+Modela M jogadores ao longo de D dias contra o catálogo real. O tempo avança em rodadas de
+18 horas (a janela de tentativas e o cooldown de casamento e de coleta): em cada rodada, cada
+jogador aparece com probabilidade `atividade`, coleta Eritos (randint(0, 100)) e faz até
+`tentativas` paqueras, cada uma contra um personagem disponível sorteado. A paquera acerta
+quando randint(1, 20) >= randint(1, 20) + vantagem; quem casa fica em cooldown até a próxima
+rodada, e dois acertos no mesmo personagem na mesma tentativa ficam com um só jogador.
+
+Uso pela linha de comando (com o bot ligado ou não):
+    python simulador.py [--banco eros.db] [--jogadores 100000] [--dias 30] [--atividade 1] [--todos]
+
+A simulação requer NumPy (`pip install numpy`); as chances exatas de `chance_de_sucesso` não.
+"""
+import argparse
+import asyncio
+import time
+from fractions import Fraction
+from banco import BancoDeDados
+from migracoes import migrar
+
+try:
+    import numpy as np
+except ImportError:  # Opcional: só o simulador precisa dele
+    np = None
+
+# Faces do dado rolado pelo jogador e pelo personagem
+FACES = 20
+
+# Eritos máximos de um /coletar
+COLETA_MAXIMA = 100
+
+# Duração de uma rodada da simulação, igual aos cooldowns do bot (18 horas)
+HORAS_POR_RODADA = 18
+
+# Vantagem padrão dos personagens (coluna `vantagem`)
+VANTAGEM_PADRAO = 2
+
+
+def chance_de_sucesso(vantagem):
+    """Chance exata de randint(1, 20) >= randint(1, 20) + vantagem, como fração.
+
+    A diferença entre os dados vale k com (20 - |k|) / 400 de chance, então para vantagem v >= 1
+    os casos favoráveis somam (20 - v)(21 - v) / 2; para v <= 0 vale o complemento simétrico."""
+    v = max(-(FACES - 1), min(vantagem, FACES))
+    if v >= 1:
+        casos = (FACES - v) * (FACES + 1 - v) // 2
+    else:
+        casos = FACES * FACES - (FACES - 1 + v) * (FACES + v) // 2
+    return Fraction(casos, FACES * FACES)
+
+
+class ResultadoSimulacao:
+    """Evolução do catálogo por rodada e totais de casamentos e Eritos por jogador."""
+    __slots__ = ("jogadores", "dias", "atividade", "vantagens", "restantes", "casamentos", "eritos", "duracao")
+
+    def __init__(self, jogadores, dias, atividade, vantagens, restantes, casamentos, eritos, duracao):
+        self.jogadores = jogadores
+        self.dias = dias
+        self.atividade = atividade
+        self.vantagens = vantagens  # Vantagem de cada personagem do catálogo simulado
+        self.restantes = restantes  # Personagens disponíveis ao fim de cada rodada
+        self.casamentos = casamentos  # Casamentos de cada jogador
+        self.eritos = eritos  # Eritos coletados por cada jogador
+        self.duracao = duracao
+
+    def dia_em_que_restam(self, fracao):
+        """Dia (fracionário) em que o catálogo chegou a `fracao` do tamanho inicial, ou None se não chegou."""
+        if not len(self.vantagens):
+            return None
+        rodadas = np.flatnonzero(self.restantes <= fracao * len(self.vantagens))
+        return (rodadas[0] + 1) * HORAS_POR_RODADA / 24 if rodadas.size else None
+
+    def secoes(self):
+        """Relatório em seções `(título, texto)`, usado pelo /simular e pela linha de comando."""
+        valores, quantidades = np.unique(self.vantagens, return_counts=True)
+        chances = []
+        for vantagem, quantidade in zip(valores.tolist(), quantidades.tolist()):
+            chance = chance_de_sucesso(vantagem)
+            tentativas = f"{1 / float(chance):.1f}" if chance else "∞"
+            chances.append(f"{vantagem:+d}: {float(chance):.2%} ({chance.numerator}/{chance.denominator}), "
+                           f"~{tentativas} tentativas, {quantidade} personagens")
+
+        catalogo = len(self.vantagens)
+        marcos = []
+        for fracao, rotulo in ((0.5, "metade"), (0.1, "90%"), (0, "todo")):
+            dia = self.dia_em_que_restam(fracao)
+            marcos.append(f"{rotulo} conquistado: " + (f"dia {dia:.1f}" if dia is not None else "não chegou"))
+        final = int(self.restantes[-1]) if self.restantes.size else catalogo
+        esgotamento = [f"{catalogo} personagens; {final} ainda disponíveis no fim", *marcos]
+
+        jogadores_dia = self.jogadores * self.dias
+        casaram = np.count_nonzero(self.casamentos)
+        p50, p90, p99 = np.percentile(self.casamentos, (50, 90, 99))
+        casamentos = [
+            f"{self.casamentos.sum() / jogadores_dia:.3f} por jogador por dia",
+            f"{casaram / self.jogadores:.1%} dos jogadores casaram ao menos uma vez",
+            f"por jogador: p50 {p50:g}, p90 {p90:g}, p99 {p99:g}, máximo {self.casamentos.max()}",
+        ]
+
+        p10, p50, p90, p99 = np.percentile(self.eritos, (10, 50, 90, 99))
+        eritos = [
+            f"média {self.eritos.mean():.0f}; p10 {p10:.0f}, p50 {p50:.0f}, p90 {p90:.0f}, p99 {p99:.0f}",
+            f"mínimo {self.eritos.min()}, máximo {self.eritos.max()}",
+        ]
+
+        return [
+            ("🎲 Chances exatas por vantagem", "\n".join(chances) or "Catálogo vazio."),
+            ("📉 Esgotamento do catálogo", "\n".join(esgotamento)),
+            ("💍 Casamentos", "\n".join(casamentos)),
+            ("💰 Eritos coletados", "\n".join(eritos)),
+        ]
+
+    def __str__(self):
+        cabecalho = (f"{self.jogadores} jogadores × {self.dias} dias (atividade {self.atividade:.0%}) "
+                     f"em {self.duracao:.2f}s")
+        return "\n\n".join([cabecalho, *(f"{titulo}\n{texto}" for titulo, texto in self.secoes())])
+
+
+def simular(vantagens, jogadores, dias, tentativas=5, atividade=1.0, semente=None):
+    """Simula `jogadores` por `dias` contra os personagens com as `vantagens` dadas; retorna um ResultadoSimulacao.
+
+    Cada passo sorteia um alvo e o resultado de todos os jogadores de uma vez (vetorizado com
+    NumPy), usando as chances exatas em vez de rolar os dois dados."""
+    if np is None:
+        raise RuntimeError("O simulador requer NumPy: pip install numpy")
+    inicio = time.perf_counter()
+    gerador = np.random.default_rng(semente)
+    vantagens = np.asarray(vantagens, dtype=np.int64)
+    tabela = np.array([float(chance_de_sucesso(v)) for v in range(-(FACES - 1), FACES + 1)])
+    chances = tabela[np.clip(vantagens, -(FACES - 1), FACES) + FACES - 1]
+
+    rodadas = -(-dias * 24 // HORAS_POR_RODADA)
+    conquistado = np.zeros(len(vantagens), dtype=bool)
+    disponiveis = np.arange(len(vantagens))
+    restantes = np.empty(rodadas, dtype=np.int64)
+    casamentos = np.zeros(jogadores, dtype=np.int64)
+    eritos = np.zeros(jogadores, dtype=np.int64)
+
+    for rodada in range(rodadas):
+        ativos = gerador.random(jogadores) < atividade if atividade < 1 else np.ones(jogadores, dtype=bool)
+        eritos += gerador.integers(0, COLETA_MAXIMA + 1, jogadores) * ativos
+        livres = np.flatnonzero(ativos)  # Ativos que ainda não casaram nesta rodada
+        for _ in range(tentativas):
+            if not livres.size or not disponiveis.size:
+                break
+            alvos = disponiveis[gerador.integers(0, disponiveis.size, livres.size)]
+            acertos = np.flatnonzero(gerador.random(livres.size) < chances[alvos])
+            if not acertos.size:
+                continue
+            # Em ordem aleatória, só o primeiro acerto em cada personagem casa; os outros encontram
+            # o personagem já em um relacionamento e perdem a tentativa
+            acertos = gerador.permutation(acertos)
+            _, primeiros = np.unique(alvos[acertos], return_index=True)
+            casaram = acertos[primeiros]
+            conquistado[alvos[casaram]] = True
+            casamentos[livres[casaram]] += 1
+            disponiveis = disponiveis[~conquistado[disponiveis]]
+            livres = np.delete(livres, casaram)
+        restantes[rodada] = disponiveis.size
+
+    return ResultadoSimulacao(jogadores, dias, atividade, vantagens, restantes, casamentos, eritos,
+                              time.perf_counter() - inicio)
+
+
+async def vantagens_do_catalogo(banco, todos=False):
+    """Vantagens dos personagens disponíveis (ou de todos, como depois de um /resetar_status)."""
+    filtro = "" if todos else "WHERE conquistado = 0 AND imagem_quebrada = 0"
+    linhas = await banco.consultar_todos(f"SELECT COALESCE(vantagem, ?) FROM personagens {filtro}", (VANTAGEM_PADRAO,))
+    return [vantagem for (vantagem,) in linhas]
+
+
+async def _principal(argumentos):
+    banco = BancoDeDados(argumentos.banco, leitores=1)
+    await banco.abrir()
+    try:
+        await migrar(banco)
+        vantagens = await vantagens_do_catalogo(banco, argumentos.todos)
+    finally:
+        await banco.fechar()
+    print(simular(vantagens, argumentos.jogadores, argumentos.dias, argumentos.tentativas,
+                  argumentos.atividade, argumentos.semente))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simula o equilíbrio do jogo contra o catálogo de personagens.")
+    parser.add_argument("--banco", default="eros.db", help="Arquivo do banco de dados (padrão: eros.db)")
+    parser.add_argument("--jogadores", type=int, default=100000)
+    parser.add_argument("--dias", type=int, default=30)
+    parser.add_argument("--tentativas", type=int, default=5, help="Tentativas de /paquerar por rodada (padrão: 5)")
+    parser.add_argument("--atividade", type=float, default=1.0, help="Chance de um jogador jogar em cada rodada")
+    parser.add_argument("--todos", action="store_true", help="Simula com o catálogo inteiro, como após um reset")
+    parser.add_argument("--semente", type=int, default=None)
+    asyncio.run(_principal(parser.parse_args()))
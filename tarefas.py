@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import time
+from extrato import zerar_saldos
+
+log = logging.getLogger(__name__)
+
+# Linhas por transação; entre um bloco e outro o escritor fica livre para os comandos
+TAMANHO_BLOCO = 500
+PAUSA_ENTRE_BLOCOS = 0.02
+
+# Páginas devolvidas ao sistema por transação no vácuo incremental
+PAGINAS_POR_PASSO = 1000
+
+# Espera antes de tentar de novo uma tarefa que falhou
+ESPERA_APOS_FALHA = 30
+
+class Tarefa:
+    """Reset de uma tabela, processado em blocos de rowid a partir de `ultimo_rowid`."""
+    __slots__ = ("id", "tipo", "ultimo_rowid", "ate_rowid", "ate_extrato", "referencia", "processadas", "total")
+
+    def __init__(self, id, tipo, ultimo_rowid, ate_rowid, ate_extrato, referencia, processadas, total):
+        self.id = id
+        self.tipo = tipo
+        self.ultimo_rowid = ultimo_rowid
+        self.ate_rowid = ate_rowid
+        self.ate_extrato = ate_extrato
+        self.referencia = referencia
+        self.processadas = processadas
+        self.total = total
+
+
+async def _bloco_amores(db, tarefa, fim):
+    cursor = await db.execute("DELETE FROM amores WHERE rowid > ? AND rowid <= ? RETURNING usuario_id, personagem_id",
+                              (tarefa.ultimo_rowid, fim))
+    return await cursor.fetchall()
+
+
+async def _bloco_moedas(db, tarefa, fim):
+    return await zerar_saldos(db, tarefa.ultimo_rowid, fim, tarefa.ate_extrato, "reset", tarefa.referencia)
+
+
+async def _bloco_cooldowns(db, tarefa, fim):
+    cursor = await db.execute("""
+        UPDATE cooldowns SET tentativas = 0, tempo = NULL, ultimo_casamento = NULL, ultimo_coletar = NULL
+        WHERE rowid > ? AND rowid <= ? AND geracao_reset < ? RETURNING usuario_id
+    """, (tarefa.ultimo_rowid, fim, tarefa.id))
+    return await cursor.fetchall()
+
+
+# Processa um bloco na transação e retorna as linhas alteradas, repassadas a `ao_processar`
+BLOCOS = {"amores": _bloco_amores, "moedas": _bloco_moedas, "cooldowns": _bloco_cooldowns}
+
+
+class TarefasEmLote:
+    """Executa em segundo plano, uma de cada vez, as tarefas de reset gravadas na tabela `tarefas`.
+
+    Cada bloco é uma transação curta que também grava até onde a tarefa chegou, então um reset
+    interrompido por um reinício continua de onde parou. Linhas inseridas depois da criação da
+    tarefa (rowid acima de `ate_rowid`) já pertencem ao período pós-reset e não são tocadas; nas
+    tabelas cuja chave é o ID do usuário, cada bloco preserva o que mudou depois do pedido."""
+
+    def __init__(self, banco, ao_processar=None):
+        self.banco = banco
+        self.ao_processar = ao_processar  # `ao_processar(tipo, linhas)`, chamado após cada bloco
+        self._tarefas = {}  # Progresso das tarefas desta execução do bot, por ID
+        self._conclusoes = {}
+        self._pendente = asyncio.Event()
+        self._tarefa = None
+
+    async def retomar(self):
+        """Inicia a execução em segundo plano, começando pelas tarefas interrompidas por um reinício."""
+        for tarefa in await self._pendentes():
+            self._registrar(tarefa)
+            self._pendente.set()
+        if self._tarefa is None:
+            self._tarefa = asyncio.create_task(self._executar_pendentes())
+
+    async def parar(self):
+        if self._tarefa is not None:
+            self._tarefa.cancel()
+            self._tarefa = None
+
+    async def criar(self, tipos, referencia=None):
+        """Registra um reset de cada tabela em `tipos`, na ordem dada, e retorna os IDs das tarefas."""
+        totais = {}
+        for tipo in tipos:
+            (totais[tipo],) = await self.banco.consultar_um(f"SELECT COUNT(*) FROM {tipo}")
+        ids = []
+        async with self.banco.transacao() as db:
+            # Os limites são lidos na mesma transação, então todas as tabelas partem do mesmo instante
+            cursor = await db.execute("SELECT COALESCE(MAX(id), 0) FROM extrato")
+            (ate_extrato,) = await cursor.fetchone()
+            for tipo in tipos:
+                cursor = await db.execute(f"""
+                    INSERT INTO tarefas (tipo, ate_rowid, ate_extrato, referencia, total, criada_em)
+                    SELECT ?, COALESCE(MAX(rowid), 0), ?, ?, ?, ? FROM {tipo}
+                    RETURNING id, tipo, ultimo_rowid, ate_rowid, ate_extrato, referencia, processadas, total
+                """, (tipo, ate_extrato, referencia, totais[tipo], int(time.time())))
+                tarefa = Tarefa(*await cursor.fetchone())
+                self._registrar(tarefa)
+                ids.append(tarefa.id)
+        self._pendente.set()
+        return ids
+
+    def progresso(self, ids):
+        """Retorna `(processadas, total)` somados das tarefas."""
+        tarefas = [self._tarefas[tarefa_id] for tarefa_id in ids if tarefa_id in self._tarefas]
+        return sum(tarefa.processadas for tarefa in tarefas), sum(tarefa.total for tarefa in tarefas)
+
+    async def aguardar(self, ids, tempo_limite=None):
+        """Espera as tarefas terminarem por até `tempo_limite` segundos; retorna True se todas terminaram."""
+        conclusoes = [self._conclusoes[tarefa_id] for tarefa_id in ids if tarefa_id in self._conclusoes]
+        if conclusoes:
+            await asyncio.wait(conclusoes, timeout=tempo_limite)
+        return all(conclusao.done() for conclusao in conclusoes)
+
+    def _registrar(self, tarefa):
+        self._tarefas[tarefa.id] = tarefa
+        if tarefa.id not in self._conclusoes:
+            self._conclusoes[tarefa.id] = asyncio.get_running_loop().create_future()
+
+    async def _pendentes(self):
+        linhas = await self.banco.consultar_todos("""
+            SELECT id, tipo, ultimo_rowid, ate_rowid, ate_extrato, referencia, processadas, total
+            FROM tarefas WHERE concluida_em IS NULL ORDER BY id
+        """)
+        return [Tarefa(*linha) for linha in linhas]
+
+    async def _executar_pendentes(self):
+        while True:
+            await self._pendente.wait()
+            self._pendente.clear()
+            try:
+                tarefas = await self._pendentes()
+                for tarefa in tarefas:
+                    self._registrar(tarefa)
+                    await self._executar(tarefa)
+                if tarefas:
+                    log.info("Vácuo incremental: %d páginas liberadas", await self.liberar_paginas())
+            except Exception:
+                log.exception("Falha em uma tarefa em lote; nova tentativa em %d s", ESPERA_APOS_FALHA)
+                await asyncio.sleep(ESPERA_APOS_FALHA)
+                self._pendente.set()
+
+    async def _executar(self, tarefa):
+        """Processa a tarefa bloco a bloco, cedendo o escritor aos comandos entre um bloco e outro."""
+        processar = BLOCOS[tarefa.tipo]
+        while True:
+            async with self.banco.transacao() as db:
+                cursor = await db.execute(
+                    f"SELECT rowid FROM {tarefa.tipo} WHERE rowid > ? AND rowid <= ? ORDER BY rowid LIMIT ?",
+                    (tarefa.ultimo_rowid, tarefa.ate_rowid, TAMANHO_BLOCO)
+                )
+                rowids = await cursor.fetchall()
+                fim = rowids[-1][0] if rowids else tarefa.ultimo_rowid
+                linhas = await processar(db, tarefa, fim) if rowids else []
+                concluida = len(rowids) < TAMANHO_BLOCO
+                await db.execute("UPDATE tarefas SET ultimo_rowid = ?, processadas = processadas + ?, concluida_em = ? WHERE id = ?",
+                                 (fim, len(rowids), int(time.time()) if concluida else None, tarefa.id))
+            tarefa.ultimo_rowid = fim
+            tarefa.processadas += len(rowids)
+            if linhas and self.ao_processar:
+                self.ao_processar(tarefa.tipo, linhas)
+            if concluida:
+                conclusao = self._conclusoes[tarefa.id]
+                if not conclusao.done():
+                    conclusao.set_result(None)
+                log.info("Reset de %s concluído: %d linhas", tarefa.tipo, tarefa.processadas)
+                return
+            await asyncio.sleep(PAUSA_ENTRE_BLOCOS)
+
+    async def liberar_paginas(self):
+        """Devolve ao sistema as páginas livres aos poucos (vácuo incremental); retorna quantas foram liberadas.
+
+        Só tem efeito em bancos com `auto_vacuum = INCREMENTAL`; veja `BancoDeDados.abrir`."""
+        (modo,) = await self.banco.consultar_um("PRAGMA auto_vacuum")
+        if modo != 2:
+            return 0
+        (livres,) = await self.banco.consultar_um("PRAGMA freelist_count")
+        iniciais = livres
+        while livres:
+            async with self.banco.transacao() as db:
+                cursor = await db.execute(f"PRAGMA incremental_vacuum({PAGINAS_POR_PASSO})")
+                await cursor.fetchall()  # Cada passo da instrução libera uma página
+            anteriores = livres
+            (livres,) = await self.banco.consultar_um("PRAGMA freelist_count")
+            if livres >= anteriores:
+                break
+            await asyncio.sleep(PAUSA_ENTRE_BLOCOS)
+        return iniciais - livres
+
+
+class TarefasImediatas:
+    """As operações de TarefasEmLote para o ArmazenamentoMemoria, que zera uma tabela inteira de uma vez:
+    cada reset termina dentro de `criar`, e não há nada para retomar depois de um reinício."""
+
+    def __init__(self, armazenamento, ao_processar=None):
+        self.armazenamento = armazenamento
+        self.ao_processar = ao_processar  # `ao_processar(tipo, linhas)`, chamado após cada reset
+        self._processadas = {}  # Linhas alteradas por ID de tarefa
+        self._proximo_id = 1
+
+    async def retomar(self):
+        pass
+
+    async def parar(self):
+        pass
+
+    async def criar(self, tipos, referencia=None):
+        """Zera cada tabela em `tipos`, na ordem dada, e retorna os IDs das tarefas (já concluídas)."""
+        ids = []
+        for tipo in tipos:
+            linhas = await self.armazenamento.resetar(tipo, referencia)
+            tarefa_id = self._proximo_id
+            self._proximo_id += 1
+            self._processadas[tarefa_id] = len(linhas)
+            ids.append(tarefa_id)
+            if linhas and self.ao_processar:
+                self.ao_processar(tipo, linhas)
+            log.info("Reset de %s concluído: %d linhas", tipo, len(linhas))
+        return ids
+
+    def progresso(self, ids):
+        processadas = sum(self._processadas.get(tarefa_id, 0) for tarefa_id in ids)
+        return processadas, processadas
+
+    async def aguardar(self, ids, tempo_limite=None):
+        return True